@@ -21,7 +21,10 @@ release = 'kryptonite'
 
 import os
 import sys
+import time
+import itertools
 import traceback
+import multiprocessing
 try:
     from imp import reload
 except ImportError:
@@ -31,13 +34,20 @@ except ImportError:
 from datetime import datetime
 import random
 
-from lettuce.core import Feature, TotalResult
+from lettuce.core import Feature, TotalResult, TotalBindResult
+from lettuce.core import read_feature_file_or_error
+from lettuce.cache import ParseCache
+from lettuce.tag_index import TagIndex
+from lettuce.history import History, Outcomes
+from lettuce.result_cache import ResultCache
+from lettuce.loop import EventLoop
 
 from lettuce.terrain import after
 from lettuce.terrain import before
 from lettuce.terrain import world
 
 from lettuce.decorators import step
+from lettuce.fixtures import fixture
 from lettuce.registry import call_hook
 from lettuce.registry import STEP_REGISTRY
 from lettuce.registry import CALLBACK_REGISTRY
@@ -45,9 +55,17 @@ from lettuce.exceptions import StepLoadingError
 from lettuce.plugins import (
     xunit_output,
     autopdb,
-    lxc_isolator
+    lxc_isolator,
+    dry_run_output
 )
 from lettuce import fs
+from lettuce import parallel
+from lettuce import threads
+from lettuce import distributed
+from lettuce import sharding
+from lettuce import result_cache
+from lettuce import watch
+from lettuce import daemon
 from lettuce import exceptions
 
 try:
@@ -78,6 +96,7 @@ __all__ = [
     'after',
     'before',
     'step',
+    'fixture',
     'world',
     'STEP_REGISTRY',
     'CALLBACK_REGISTRY',
@@ -130,7 +149,11 @@ class Runner(object):
     def __init__(self, base_path, scenarios=None, verbosity=0, random=False,
                  enable_xunit=False, xunit_filename=None, tags=None,
                  failfast=False, auto_pdb=False, files_to_load=None,
-                 excluded_files=None):
+                 excluded_files=None, dry_run=False, parse_cache=False,
+                 parse_processes=None, processes=1, by_scenario=False,
+                 threads=1, coordinator=None, history=True, shard=None,
+                 results_file=None, last_failed=False, failed_first=False,
+                 reuse_results=False, shard_durations=None):
         """ lettuce.Runner will try to find a terrain.py file and
         import it from within `base_path`
         """
@@ -149,6 +172,29 @@ class Runner(object):
         self.verbosity = verbosity
         self.scenarios = scenarios and map(int, scenarios.split(",")) or None
         self.failfast = failfast
+        self.dry_run = dry_run
+        if parse_cache:
+            self.parse_cache = ParseCache()
+        else:
+            self.parse_cache = None
+        self.parse_processes = parse_processes
+        self.processes = processes
+        self.by_scenario = by_scenario
+        self.threads = threads
+        self.coordinator = coordinator
+        self.shard = shard
+        self.shard_durations = shard_durations
+        self.results_file = results_file
+        self.last_failed = last_failed
+        self.failed_first = failed_first
+        self.loop = EventLoop()
+        self.tag_index = TagIndex(directory=None if parse_cache else False)
+        self.history = History(directory=None if history else False)
+        self.outcomes = Outcomes(directory=None if history else False)
+        self.result_cache = reuse_results and ResultCache() or None
+        # when the last worker should be done, set by the parallel modes
+        # from how long features and scenarios took on past runs
+        self.predicted_makespan = None
         if auto_pdb:
             autopdb.enable(self)
 
@@ -174,43 +220,203 @@ class Runner(object):
 
         self.output = output
 
-    def run(self):
+    def find_feature_files(self):
+        if self.single_feature:
+            return [self.single_feature]
+
+        return self.loader.find_feature_files()
+
+    def list_tags(self):
+        """ Print how many scenarios and features are tagged with each
+        tag found on the feature files, without parsing them
+        """
+        tagged = self.tag_index.tagged(self.find_feature_files())
+        plural = lambda count, name: "%d %s%s" % (
+            count, name, count != 1 and "s" or "")
+
+        for tag in sorted(tagged):
+            scenarios = tagged[tag]
+            features = set([filename for filename, position in scenarios])
+            print "@%s: %s in %s" % (tag,
+                                     plural(len(scenarios), "scenario"),
+                                     plural(len(features), "feature"))
+
+        return tagged
+
+    def load_feature(self, filename):
+        return Feature.from_file(filename, cache=self.parse_cache)
+
+    def parse_features(self, features_files):
+        """ Parse all the given feature files before running any of
+        them, in a pool of `parse_processes` processes (one per CPU when
+        0), reporting the syntax errors of every file at once
+        """
+        arguments = [(filename, self.parse_cache)
+                     for filename in features_files]
+        if self.parse_processes == 1 or len(arguments) < 2:
+            parsed = map(read_feature_file_or_error, arguments)
+        else:
+            pool = multiprocessing.Pool(self.parse_processes or None)
+            try:
+                parsed = pool.map(read_feature_file_or_error, arguments)
+            finally:
+                pool.close()
+                pool.join()
+
+        errors = [error for feature, error in parsed if error]
+        if errors:
+            sys.stderr.write("".join(errors))
+            raise SystemExit(2)
+
+        return [Feature.from_parsed_file(feature) for feature, error in parsed]
+
+    def bind(self, features_files, timings):
+        """ Parse the given feature files and bind each of their steps
+        to step definitions, without calling any hook or step definition
+        """
+        started_at = datetime.now()
+        features = self.parse_features(features_files)
+
+        parsed_at = datetime.now()
+        results = [feature.bind(self.scenarios, tags=self.tags)
+                   for feature in features]
+        bound_at = datetime.now()
+
+        timings = timings + [
+            ('parsing features', parsed_at - started_at),
+            ('binding steps', bound_at - parsed_at),
+        ]
+        total = TotalBindResult(results, timings)
+        dry_run_output.print_end(total)
+        return total
+
+    def select_scenarios(self, features_files, features):
+        """ Narrow the scenarios of each feature down to those selected
+        by `scenarios` and `tags`, then put those that failed last time
+        first with `failed_first`, or keep only them with `last_failed`,
+        and keep those of the `shard` to run. Returns the feature files
+        and the features left
+        """
+        features = list(features)
+        for feature in features:
+            feature.scenarios = feature.select_scenarios(self.scenarios,
+                                                         self.tags)
+
+        if self.last_failed or self.failed_first:
+            only_failed = self.last_failed and \
+                self.outcomes.any_failed(features_files)
+            kept = []
+            for filename, feature in zip(features_files, features):
+                feature.scenarios = self.outcomes.select(feature, only_failed)
+                if feature.scenarios or not only_failed:
+                    kept.append((filename, feature))
+
+            features_files = [filename for filename, feature in kept]
+            features = [feature for filename, feature in kept]
+
+        if self.shard:
+            features_files, features = sharding.select_shard(
+                self, features_files, features)
+
+        return features_files, features
+
+    def run(self, features_files=None, load_steps=True):
         """ Find and load step definitions, and them find and load
         features under `base_path` specified on constructor
+
+        Only the given `features_files` are run when any, and the step
+        definitions loaded already are used as they are unless
+        `load_steps`
         """
         started_at = datetime.now()
-        try:
-            self.loader.find_and_load_step_definitions()
-        except StepLoadingError, e:
-            print "Error loading step definitions:\n", e
-            return
+        # what earlier runs of this runner reported is not reported again
+        parallel.detach_reports()
+        if load_steps:
+            try:
+                self.loader.find_and_load_step_definitions()
+            except StepLoadingError, e:
+                print "Error loading step definitions:\n", e
+                return
 
         results = []
-        if self.single_feature:
-            features_files = [self.single_feature]
-        else:
-            features_files = self.loader.find_feature_files()
-            if self.random:
-                random.shuffle(features_files)
+        if features_files is None:
+            features_files = self.find_feature_files()
+
+        if self.random and not self.single_feature:
+            random.shuffle(features_files)
 
         if not features_files:
             self.output.print_no_features_found(self.loader.base_dir)
             return
 
+        if self.tags:
+            # only the feature files with matching scenarios are parsed
+            features_files = self.tag_index.select(features_files, self.tags)
+
+        if self.last_failed or self.failed_first:
+            features_files = self.outcomes.order(
+                features_files, only_failed=self.last_failed and
+                self.outcomes.any_failed(features_files))
+
+        if self.dry_run:
+            loaded = ('loading step definitions', datetime.now() - started_at)
+            return self.bind(features_files, [loaded])
+
+        if self.parse_processes is None:
+            features = itertools.imap(self.load_feature, features_files)
+        else:
+            features = self.parse_features(features_files)
+
+        self.loop.install()
         call_hook('before', 'all')
 
         failed = False
+        running_at = time.time()
+        scenarios = self.scenarios
         try:
-            for filename in features_files:
-                feature = Feature.from_file(filename)
-                results.append(
-                    feature.run(self.scenarios,
-                                tags=self.tags,
-                                random=self.random,
-                                failfast=self.failfast))
+            if (self.shard or self.last_failed or self.failed_first) and \
+                    not self.coordinator:
+                features_files, features = self.select_scenarios(
+                    features_files, features)
+                # the features now only hold the selected scenarios
+                scenarios = None
+
+            result_cache.current = self.result_cache
+
+            if self.coordinator:
+                results.extend(distributed.coordinate(
+                    self, features_files, features))
+            elif self.processes > 1 and self.by_scenario:
+                results.extend(parallel.run_scenarios(
+                    self, features, scenarios))
+            elif self.processes > 1:
+                parsed = isinstance(features, list)
+                results.extend(parallel.run_features(
+                    self, features_files, scenarios,
+                    parsed and features or None))
+            elif self.threads > 1:
+                results.extend(threads.run_scenarios(
+                    self, features, scenarios))
+            else:
+                for feature in features:
+                    results.append(
+                        feature.run(scenarios,
+                                    tags=self.tags,
+                                    random=self.random,
+                                    failfast=self.failfast))
 
         except exceptions.LettuceSyntaxError, e:
             sys.stderr.write(e.msg)
+            failed = True
+        except parallel.WorkerFailed, e:
+            if not self.failfast:
+                print "Died with %s" % str(e)
+                sys.stderr.write(e.traceback)
+            else:
+                print
+                print ("Lettuce aborted running any more tests "
+                       "because was called with the `--failfast` option")
+
             failed = True
         except:
             if not self.failfast:
@@ -225,8 +431,21 @@ class Runner(object):
             failed = True
 
         finally:
+            ran_for = time.time() - running_at
+            if not self.shard:
+                # every shard has to split the run by the same durations,
+                # merge-results records them instead
+                self.history.record(results)
+
+            self.outcomes.record(results)
+            result_cache.current = None
+            if self.result_cache:
+                self.result_cache.record(results)
             total = TotalResult(results)
             call_hook('after', 'all', total)
+            self.loop.close()
+            if self.results_file:
+                sharding.save_results(self.results_file, results)
 
             if failed:
                 raise SystemExit(2)
@@ -246,4 +465,16 @@ class Runner(object):
             elif seconds:
                 print "(finished within %d seconds)" % seconds
 
+            reused = len([result for feature_result in results
+                          for result in feature_result.scenario_results
+                          if result.cached])
+            if reused:
+                print "(%d scenario%s passed before and did not change, " \
+                    "not run again)" % (reused, reused > 1 and "s" or "")
+
+            if self.predicted_makespan is not None:
+                print "(predicted to run within %.1f seconds, ran within " \
+                    "%.1f seconds)" % (self.predicted_makespan,
+                                       ran_for)
+
             return total
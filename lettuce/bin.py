@@ -22,6 +22,7 @@ import optparse
 import lettuce
 from fs import FeatureLoader
 from core import Language
+from cache import ParseCache
 
 FILES_TO_LOAD_HEADER = 'Using step definitions from:'
 
@@ -55,7 +56,61 @@ def find_files_to_load(path):
     return result
 
 
+def merge_results(args):
+    parser = optparse.OptionParser(
+        usage="%prog merge-results [options] RESULTS_FILE...",
+        version=lettuce.version)
+
+    parser.add_option("-v", "--verbosity",
+                      dest="verbosity",
+                      default=1,
+                      type="int",
+                      help='The verbosity level of the summary')
+
+    parser.add_option("--with-xunit",
+                      dest="enable_xunit",
+                      action="store_true",
+                      default=False,
+                      help='Output JUnit XML test results to a file')
+
+    parser.add_option("--xunit-file",
+                      dest="xunit_file",
+                      default=None,
+                      type="string",
+                      help='Write JUnit XML to this file. Defaults to '
+                      'lettucetests.xml')
+
+    parser.add_option("--no-history",
+                      dest="history",
+                      default=True,
+                      action="store_false",
+                      help='Do not record how long the scenarios took, nor '
+                      'whether they passed')
+
+    options, filenames = parser.parse_args(args)
+    if not filenames:
+        parser.error('no results file given')
+
+    # sets the output plugins up, without running anything
+    runner = lettuce.Runner(os.curdir,
+                            verbosity=options.verbosity,
+                            enable_xunit=options.enable_xunit,
+                            xunit_filename=options.xunit_file,
+                            history=options.history)
+    try:
+        total = lettuce.sharding.merge_results(
+            filenames, [runner.history, runner.outcomes])
+    except (IOError, ValueError), e:
+        sys.stderr.write("%s\n" % e)
+        raise SystemExit(2)
+
+    raise SystemExit(int(total.steps != total.steps_passed))
+
+
 def main(args=sys.argv[1:]):
+    if args and args[0] == 'merge-results':
+        merge_results(args[1:])
+
     base_path = os.path.join(os.path.dirname(os.curdir), 'features')
     parser = optparse.OptionParser(
         usage="%prog or type %prog -h (--help) for help",
@@ -105,6 +160,179 @@ def main(args=sys.argv[1:]):
                       action="store_true",
                       help='Stop running in the first failure')
 
+    parser.add_option("--list-tags",
+                      dest="list_tags",
+                      default=False,
+                      action="store_true",
+                      help='Print how many scenarios and features are tagged '
+                      'with each tag, without running anything')
+
+    parser.add_option("--dry-run",
+                      dest="dry_run",
+                      default=False,
+                      action="store_true",
+                      help='Parse features and bind their steps to step '
+                      'definitions, reporting undefined and ambiguous steps '
+                      'without running anything')
+
+    parser.add_option("--parse-cache",
+                      dest="parse_cache",
+                      default=False,
+                      action="store_true",
+                      help='Reuse the syntax trees of unchanged feature '
+                      'files cached under .lettuce_cache/, instead of '
+                      'parsing them again')
+
+    parser.add_option("--no-parse-cache",
+                      dest="parse_cache",
+                      action="store_false",
+                      help='Parse every feature file, without reading nor '
+                      'writing the cache (the default)')
+
+    parser.add_option("--processes",
+                      dest="processes",
+                      default=1,
+                      type="int",
+                      help='Run features in that many processes at once')
+
+    parser.add_option("--by-scenario",
+                      dest="by_scenario",
+                      default=False,
+                      action="store_true",
+                      help='With --processes, run the scenarios of each '
+                      'feature at once in many processes, instead of whole '
+                      'features')
+
+    parser.add_option("--threads",
+                      dest="threads",
+                      default=1,
+                      type="int",
+                      help='Run the scenarios of each feature in that many '
+                      'threads at once, each of them with its own world')
+
+    parser.add_option("--no-history",
+                      dest="history",
+                      default=True,
+                      action="store_false",
+                      help='Neither record how long scenarios take and '
+                      'whether they pass under .lettuce_cache/, nor use it '
+                      'to schedule or pick scenarios')
+
+    parser.add_option("--last-failed",
+                      dest="last_failed",
+                      default=False,
+                      action="store_true",
+                      help='Only run the scenarios, and outline examples, '
+                      'that failed last time, or all of them if none did')
+
+    parser.add_option("--failed-first",
+                      dest="failed_first",
+                      default=False,
+                      action="store_true",
+                      help='Run the scenarios that failed last time before '
+                      'the others')
+
+    parser.add_option("--reuse-results",
+                      dest="reuse_results",
+                      default=False,
+                      action="store_true",
+                      help='Do not run again the scenarios that passed, as '
+                      'long as neither they, their step definitions nor the '
+                      'terrain changed (scenarios tagged @nocache always run)')
+
+    parser.add_option("--watch",
+                      dest="watch",
+                      default=False,
+                      action="store_true",
+                      help='Keep running, and run again the features that '
+                      'change, or whose step definitions change')
+
+    parser.add_option("--daemon",
+                      dest="daemon",
+                      default=False,
+                      action="store_true",
+                      help='Load the terrain and step definitions once, then '
+                      'run features as asked by lettuce --client, each run '
+                      'in a fresh process forked from this one')
+
+    parser.add_option("--client",
+                      dest="client",
+                      default=False,
+                      action="store_true",
+                      help='Have the daemon started with lettuce --daemon '
+                      'run features with the other options given, instead '
+                      'of loading everything again')
+
+    parser.add_option("--socket",
+                      dest="socket",
+                      default=None,
+                      type="string",
+                      help='The Unix socket the daemon waits for runs on, '
+                      '.lettuce_cache/daemon.sock by default, or '
+                      '$LETTUCE_SOCKET if set')
+
+    parser.add_option("--shard",
+                      dest="shard",
+                      default=None,
+                      type="string",
+                      help='Run only the K-th of N shards of the scenarios, '
+                      'given as K/N, to split a run across N invocations')
+
+    parser.add_option("--shard-durations",
+                      dest="shard_durations",
+                      default=None,
+                      type="string",
+                      help='Split the shards so that each should take about '
+                      'as long, by the durations in this file, which every '
+                      'shard has to be given, such as a copy of '
+                      '.lettuce_cache/durations.pickle')
+
+    parser.add_option("--results-file",
+                      dest="results_file",
+                      default=None,
+                      type="string",
+                      help='Save the results to this file, for '
+                      '"lettuce merge-results" to sum them up with others')
+
+    parser.add_option("--coordinator",
+                      dest="coordinator",
+                      default=False,
+                      action="store_true",
+                      help='Hand the scenarios out to workers started with '
+                      '--worker, on this or other machines, and print what '
+                      'they report')
+
+    parser.add_option("--listen",
+                      dest="listen",
+                      default="localhost:%d" % lettuce.distributed.PORT,
+                      type="string",
+                      help='The HOST:PORT the coordinator waits for workers '
+                      'on (default: %default). Unless it is a loopback '
+                      'address, LETTUCE_AUTHKEY must be set to a secret '
+                      'shared with the workers')
+
+    parser.add_option("--worker",
+                      dest="worker",
+                      default=None,
+                      type="string",
+                      help='Run the scenarios handed out by the coordinator '
+                      'listening on HOST:PORT, with the same LETTUCE_AUTHKEY '
+                      'as the coordinator unless it is a loopback address')
+
+    parser.add_option("--parse-processes",
+                      dest="parse_processes",
+                      default=None,
+                      type="int",
+                      help='Parse every feature file before running any of '
+                      'them, using that many processes (0 for one per CPU), '
+                      'and report all syntax errors at once')
+
+    parser.add_option("--clear-parse-cache",
+                      dest="clear_parse_cache",
+                      default=False,
+                      action="store_true",
+                      help='Remove the cache of parsed feature files and exit')
+
     parser.add_option("--pdb",
                       dest="auto_pdb",
                       default=False,
@@ -147,7 +375,34 @@ def main(args=sys.argv[1:]):
                       'Use either this option, or --files-to-load, '
                       'but not them both.')
 
+    given = list(args)
     options, args = parser.parse_args(args)
+    if options.client:
+        raise SystemExit(lettuce.daemon.ask(
+            options.socket or lettuce.daemon.default_address(),
+            [arg for arg in given if arg != '--client']))
+
+    shard = None
+    if options.shard:
+        try:
+            shard = lettuce.sharding.parse_shard(options.shard)
+        except ValueError, e:
+            parser.error('--shard takes K/N: %s' % e)
+
+    if options.coordinator or options.worker:
+        try:
+            lettuce.distributed.check_address(
+                lettuce.distributed.parse_address(
+                    options.worker or options.listen))
+        except lettuce.distributed.UnsafeAddress, e:
+            parser.error(str(e))
+
+    if options.clear_parse_cache:
+        cache = ParseCache()
+        if cache.clear():
+            print "Removed %s" % cache.directory
+        raise SystemExit(0)
+
     if args:
         base_path = os.path.abspath(args[0])
 
@@ -187,6 +442,19 @@ def main(args=sys.argv[1:]):
     else:
         files_to_load = find_files_to_load(base_path)
 
+    if options.daemon:
+        raise SystemExit(lettuce.daemon.serve(
+            options.socket or lettuce.daemon.default_address(),
+            FeatureLoader(feature_dir, files_to_load, excluded_files),
+            main))
+
+    if options.worker:
+        raise SystemExit(lettuce.distributed.work(
+            lettuce.distributed.parse_address(options.worker),
+            base_path,
+            files_to_load=files_to_load,
+            excluded_files=excluded_files))
+
     # Create and run lettuce runner instance
     runner = lettuce.Runner(
         base_path,
@@ -200,10 +468,35 @@ def main(args=sys.argv[1:]):
         tags=tags,
         files_to_load=files_to_load,
         excluded_files=excluded_files,
+        dry_run=options.dry_run,
+        parse_cache=options.parse_cache,
+        parse_processes=options.parse_processes,
+        processes=options.processes,
+        by_scenario=options.by_scenario,
+        threads=options.threads,
+        coordinator=options.coordinator and
+        lettuce.distributed.parse_address(options.listen) or None,
+        history=options.history,
+        shard=shard,
+        shard_durations=options.shard_durations,
+        results_file=options.results_file,
+        last_failed=options.last_failed,
+        failed_first=options.failed_first,
+        reuse_results=options.reuse_results,
     )
 
-    result = runner.run()
-    failed = result is None or result.steps != result.steps_passed
+    if options.list_tags:
+        runner.list_tags()
+        raise SystemExit(0)
+
+    if options.watch:
+        lettuce.watch.Watcher(runner).watch()
+
+    result = runner.run(load_steps=not lettuce.daemon.loaded)
+    if options.dry_run:
+        failed = result is None or not result.passed
+    else:
+        failed = result is None or result.steps != result.steps_passed
     raise SystemExit(int(failed))
 
 if __name__ == '__main__':
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import hashlib
+import tempfile
+import cPickle as pickle
+
+import lettuce
+
+# bump whenever lettuce.parser changes what it builds or rejects
+FORMAT = 3
+DIRECTORY = '.lettuce_cache'
+
+
+def default_directory():
+    return os.environ.get('LETTUCE_CACHE_DIR', DIRECTORY)
+
+
+def digest(string):
+    if isinstance(string, unicode):
+        string = string.encode('utf-8')
+
+    return hashlib.sha1(string).hexdigest()
+
+
+class ParseCache(object):
+    """On-disk cache of parsed feature files.
+
+    Keeps one pickled syntax tree per feature file, found by its
+    absolute path and valid only while the size, modification time and
+    contents of the file, the lettuce version and the language it was
+    parsed with are all the same. Any problem reading or writing the
+    cache is treated as a miss, it never breaks a run.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or default_directory()
+
+    def path_for(self, filename):
+        name = digest(os.path.abspath(filename)) + '.pickle'
+        return os.path.join(self.directory, 'parse', name)
+
+    def key_for(self, filename, string, language):
+        stat = os.stat(filename)
+        return (os.path.abspath(filename), stat.st_size, stat.st_mtime,
+                digest(string), lettuce.version, FORMAT, language)
+
+    def get(self, filename, string, language):
+        """Returns the cached syntax tree of `filename`, or None"""
+        try:
+            key = self.key_for(filename, string, language)
+            cached = open(self.path_for(filename), 'rb')
+            try:
+                cached_key, node = pickle.load(cached)
+            finally:
+                cached.close()
+        except Exception:
+            return None
+
+        if cached_key != key:
+            return None
+
+        node.filename = filename
+        return node
+
+    def set(self, filename, string, language, node):
+        path = self.path_for(filename)
+        try:
+            key = self.key_for(filename, string, language)
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            # write aside and rename, so that concurrent runs never
+            # read half written entries
+            fd, temporary = tempfile.mkstemp(dir=directory)
+            stream = os.fdopen(fd, 'wb')
+            try:
+                pickle.dump((key, node), stream, pickle.HIGHEST_PROTOCOL)
+            finally:
+                stream.close()
+
+            os.rename(temporary, path)
+        except (IOError, OSError):
+            pass
+
+    def clear(self):
+        """Removes the cache directory, returns whether there was one"""
+        if not os.path.isdir(self.directory):
+            return False
+
+        shutil.rmtree(self.directory)
+        return True
+
+
+class Store(object):
+    """A dict of what past runs found about each feature file, kept under
+    the cache directory by path of feature file, as features describe
+    it, for as long as the version of lettuce stays the same"""
+    filename = None
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = default_directory()
+
+        self.directory = directory
+        self.entries = None
+        self.changed = False
+
+    @property
+    def path(self):
+        return self.directory and \
+            os.path.join(self.directory, self.filename)
+
+    def load(self):
+        self.entries = {}
+        if not self.path:
+            return
+
+        try:
+            stream = open(self.path, 'rb')
+            try:
+                version, entries = pickle.load(stream)
+            finally:
+                stream.close()
+        except Exception:
+            return
+
+        if version == lettuce.version:
+            self.entries = entries
+
+    def save(self):
+        if not (self.path and self.changed):
+            return
+
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            fd, temporary = tempfile.mkstemp(dir=self.directory)
+            stream = os.fdopen(fd, 'wb')
+            try:
+                pickle.dump((lettuce.version, self.entries),
+                            stream, pickle.HIGHEST_PROTOCOL)
+            finally:
+                stream.close()
+
+            os.rename(temporary, self.path)
+            self.changed = False
+        except (IOError, OSError):
+            pass
+
+    def scenarios(self, path):
+        """Returns what is known about the scenarios of the feature
+        described at `path`"""
+        if self.entries is None:
+            self.load()
+
+        return self.entries.get(path, {})
@@ -17,15 +17,21 @@
 
 
 import re
+import time
 import codecs
+import threading
 import unicodedata
 
-from copy import deepcopy
+from copy import copy
 from fuzzywuzzy import fuzz
 from itertools import chain
 from random import shuffle
 
 from lettuce import strings
+from lettuce import loop
+from lettuce import result_cache
+from lettuce import isolation
+from lettuce import parser
 from lettuce import languages
 from lettuce.fs import FileSystem
 from lettuce.registry import STEP_REGISTRY
@@ -36,6 +42,16 @@ from lettuce.exceptions import LettuceSyntaxError
 
 fs = FileSystem()
 
+# features tagged so run their background only once, see
+# Feature.enter_background
+BACKGROUND_ONCE = 'background_once'
+
+# held while a background runs once, so that scenarios running in other
+# threads wait for the world it leaves
+background_lock = threading.Lock()
+# held while a scenario builds what it left for later, see Scenario
+body_lock = threading.RLock()
+
 
 class REP(object):
     "RegEx Pattern"
@@ -142,6 +158,7 @@ class StepDefinition(object):
         """
         try:
             ret = self.function(self.step, *args, **kw)
+            ret = loop.complete(self.function, ret)
             self.step.passed = True
         except Exception, e:
             self.step.failed = True
@@ -168,9 +185,11 @@ class ScenarioDescription(object):
     """A simple object that holds filename and line number of a scenario
     description (scenario within feature file)"""
 
-    def __init__(self, scenario, filename, string, language):
+    def __init__(self, scenario, filename, string, language, line=None):
         self.file = fs.relpath(filename)
-        self.line = None
+        self.line = line
+        if line is not None:
+            return
 
         for pline, part in enumerate(string.splitlines()):
             part = part.strip()
@@ -183,10 +202,15 @@ class FeatureDescription(object):
     """A simple object that holds filename and line number of a feature
     description"""
 
-    def __init__(self, feature, filename, string, language):
-        lines = [l.strip() for l in string.splitlines()]
+    def __init__(self, feature, filename, string, language, line=None,
+                 description_at=None):
         self.file = fs.relpath(filename)
-        self.line = None
+        self.line = line
+        if line is not None:
+            self.description_at = tuple(description_at or ())
+            return
+
+        lines = [l.strip() for l in string.splitlines()]
         described_at = []
         description_lines = strings.get_stripped_lines(feature.description)
 
@@ -256,27 +280,34 @@ class Step(object):
         return method_name, sentence
 
     def solve_and_clone(self, data):
-        sentence = self.sentence
-        hashes = self.hashes[:]  # deep copy
-        for k, v in data.items():
-
-            def evaluate(stuff):
-                return stuff.replace(u'<%s>' % unicode(k), unicode(v))
-
-            def evaluate_hash_value(hash_row):
-                new_row = {}
-                for rkey, rvalue in hash_row.items():
-                    new_row[rkey] = evaluate(rvalue)
-                return new_row
-
-            sentence = evaluate(sentence)
-            hashes = map(evaluate_hash_value, hashes)
-
-        new = deepcopy(self)
-        new.sentence = sentence
-        new.hashes = hashes
+        sentence, hashes = self._outline_templates(data.keys())
+
+        # the clone shares the tables and metadata of this step, only its
+        # sentence and hashes are its own
+        new = copy(self)
+        del new._templates
+        new.sentence = strings.render_template(sentence, data)
+        new.hashes = [
+            dict([(key, strings.render_template(value, data))
+                  for key, value in row])
+            for row in hashes]
         return new
 
+    def _outline_templates(self, keys):
+        """Returns the sentence and the hash values of this step compiled
+        into templates for the given outline keys, compiling them only
+        once"""
+        keys = tuple(sorted(keys))
+        templates = self.__dict__.setdefault('_templates', {})
+        if keys not in templates:
+            templates[keys] = (
+                strings.compile_template(self.sentence, keys),
+                [[(key, strings.compile_template(value, keys))
+                  for key, value in row.items()]
+                 for row in self.hashes])
+
+        return templates[keys]
+
     def _calc_list_length(self, lst):
         length = self.table_indentation + 2
         for item in lst:
@@ -337,15 +368,10 @@ class Step(object):
         return keys, hashes, multiline
 
     def _get_match(self, ignore_case, custom_sentence=None):
-        matched, func = None, lambda: None
-
         sentence = custom_sentence or self.sentence
-        for regex, func in STEP_REGISTRY.items():
-            matched = re.search(regex, sentence, ignore_case and re.I or 0)
-            if matched:
-                break
+        matched, func = STEP_REGISTRY.match(sentence, ignore_case)
 
-        return matched, StepDefinition(self, func)
+        return matched, StepDefinition(self, func or (lambda: None))
 
     def pre_run(self, ignore_case, with_outline=None):
         matched, step_definition = self._get_match(ignore_case)
@@ -360,6 +386,18 @@ class Step(object):
 
         return matched, step_definition
 
+    def bind(self, ignore_case=True):
+        """Resolves the step definitions that match this step, without
+        running it. Returns a list of (regex, function) tuples in the
+        order they would be tried, the first one being the definition
+        the step would run"""
+        definitions = STEP_REGISTRY.match_all(self.sentence, ignore_case)
+        if definitions:
+            self.has_definition = True
+            self.defined_at = StepDefinition(self, definitions[0][1])
+
+        return definitions
+
     def given(self, string):
         return self.behave_as(string)
 
@@ -407,7 +445,11 @@ class Step(object):
     def run(self, ignore_case):
         """Runs a step, trying to resolve it on available step
         definitions"""
-        matched, step_definition = self.pre_run(ignore_case)
+        return self.run_matched(*self.pre_run(ignore_case))
+
+    def run_matched(self, matched, step_definition):
+        """Runs a step already resolved by pre_run, which returned
+        `matched` and `step_definition`"""
         self.ran = True
         kw = matched.groupdict()
 
@@ -449,13 +491,13 @@ class Step(object):
                 step = step.solve_and_clone(outline)
 
             try:
-                step.pre_run(ignore_case, with_outline=outline)
+                matched = step.pre_run(ignore_case, with_outline=outline)
 
                 if run_callbacks:
                     call_hook('before_each', 'step', step)
 
                 if not steps_failed and not steps_undefined:
-                    step.run(ignore_case)
+                    step.run_matched(*matched)
                     steps_passed.append(step)
 
             except NoDefinitionFound, e:
@@ -539,6 +581,72 @@ class Step(object):
                    filename=with_file)
 
 
+    @classmethod
+    def from_node(cls, node, with_file=None):
+        """Creates a new step from a lettuce.parser.StepNode"""
+        return cls(node.sentence,
+                   remaining_lines=node.lines,
+                   line=with_file and node.line or None,
+                   filename=with_file)
+
+
+def matches_tags(scenario_tags, tags):
+    """Tells whether a scenario tagged with `scenario_tags` is selected
+    by the `tags` given to the runner, see Scenario.matches_tags"""
+    if tags is None:
+        return True
+
+    has_exclusionary_tags = any([t.startswith('-') for t in tags])
+
+    if not scenario_tags and not has_exclusionary_tags:
+        return False
+
+    scenario_tags = scenario_tags or []
+    matched = []
+
+    match = False
+    for tag in tags:
+        if tag.startswith('-') and tag[1:] in scenario_tags:
+            return False
+        if tag in scenario_tags:
+            match = True
+    if match:
+        return True
+
+    for tag in tags:
+        exclude = tag.startswith('-')
+        if exclude:
+            tag = tag[1:]
+
+        fuzzable = tag.startswith('~')
+        if fuzzable:
+            tag = tag[1:]
+
+        result = tag in scenario_tags
+        if fuzzable:
+            fuzzed = []
+            for internal_tag in scenario_tags:
+                ratio = fuzz.ratio(tag, internal_tag)
+                if exclude:
+                    fuzzed.append(ratio <= 80)
+                else:
+                    fuzzed.append(ratio > 80)
+
+            result = any(fuzzed)
+        elif exclude:
+            result = tag not in scenario_tags
+
+        matched.append(result)
+
+    return all(matched)
+
+
+def outline_row(outline):
+    """Returns a hashable form of the values of an outline row, that
+    stays the same while other rows change"""
+    return tuple(sorted(outline.items()))
+
+
 class Scenario(object):
     """ Object that represents each scenario on feature files."""
     described_at = None
@@ -549,7 +657,10 @@ class Scenario(object):
                  with_file=None,
                  original_string=None,
                  language=None,
-                 tags=None):
+                 tags=None,
+                 steps=None,
+                 described_at=None,
+                 body=None):
 
         self.feature = None
         if not language:
@@ -559,23 +670,63 @@ class Scenario(object):
         self.language = language
         self.tags = tags
         self.remaining_lines = remaining_lines
-        self.steps = self._parse_remaining_lines(remaining_lines,
-                                                 with_file,
-                                                 original_string)
-        self.keys = keys
-        self.outlines = outlines
         self.with_file = with_file
         self.original_string = original_string
 
-        if with_file and original_string:
+        # a scenario given a `body` callable only builds its steps and
+        # examples, returned by it, once something needs them
+        self._body = body
+        if body is None:
+            if steps is None:
+                steps = self._parse_remaining_lines(remaining_lines,
+                                                    with_file,
+                                                    original_string)
+            self.steps = steps
+            self.keys = keys
+            self.outlines = outlines
+            self._add_myself_to_steps()
+
+        if described_at:
+            self._set_definition(described_at)
+        elif with_file and original_string:
             scenario_definition = ScenarioDescription(self, with_file,
                                                       original_string,
                                                       language)
             self._set_definition(scenario_definition)
 
-        self.solved_steps = list(self._resolve_steps(
-            self.steps, self.outlines, with_file, original_string))
-        self._add_myself_to_steps()
+    def __getattr__(self, attr):
+        if '_body' not in self.__dict__:
+            # not initialized yet, e.g. while being copied
+            raise AttributeError(attr)
+
+        # threads may both ask for them, e.g. when one plans the
+        # scenarios of another, so they are only built once
+        if attr in ('steps', 'keys', 'outlines') and self._body:
+            with body_lock:
+                if self._body:
+                    steps, keys, outlines = self._body()
+                    self.keys, self.outlines = keys, outlines
+                    self.steps = steps
+                    self._body = None
+                    self._add_myself_to_steps()
+
+            return getattr(self, attr)
+
+        if attr == 'solved_steps':
+            with body_lock:
+                if 'solved_steps' not in self.__dict__:
+                    solved_steps = list(self._resolve_steps(
+                        self.steps, self.outlines,
+                        self.with_file, self.original_string))
+
+                    for step in solved_steps:
+                        step.scenario = self
+
+                    self.solved_steps = solved_steps
+
+            return self.solved_steps
+
+        raise AttributeError(attr)
 
     @property
     def max_length(self):
@@ -622,54 +773,10 @@ class Scenario(object):
         return u'<Scenario: "%s">' % self.name
 
     def matches_tags(self, tags):
-        if tags is None:
-            return True
-
-        has_exclusionary_tags = any([t.startswith('-') for t in tags])
-
-        if not self.tags and not has_exclusionary_tags:
-            return False
-
-        matched = []
-
-        if isinstance(self.tags, list):
-            match = False
-            for tag in tags:
-                if tag.startswith('-') and tag[1:] in self.tags:
-                    return False
-                if tag in self.tags:
-                    match = True
-            if match:
-                return True
-        else:
+        if tags is not None and not isinstance(self.tags, list):
             self.tags = []
 
-        for tag in tags:
-            exclude = tag.startswith('-')
-            if exclude:
-                tag = tag[1:]
-
-            fuzzable = tag.startswith('~')
-            if fuzzable:
-                tag = tag[1:]
-
-            result = tag in self.tags
-            if fuzzable:
-                fuzzed = []
-                for internal_tag in self.tags:
-                    ratio = fuzz.ratio(tag, internal_tag)
-                    if exclude:
-                        fuzzed.append(ratio <= 80)
-                    else:
-                        fuzzed.append(ratio > 80)
-
-                result = any(fuzzed)
-            elif exclude:
-                result = tag not in self.tags
-
-            matched.append(result)
-
-        return all(matched)
+        return matches_tags(self.tags, tags)
 
     @property
     def evaluated(self):
@@ -702,12 +809,21 @@ class Scenario(object):
         results = []
         call_hook('before_each', 'scenario', self)
 
+        isolator = isolation.isolator_for(self)
+        if isolator:
+            run_all = lambda *args, **kw: isolator.run_all(self, *args, **kw)
+        else:
+            run_all = Step.run_all
+
         def run_scenario(almost_self, order=-1, outline=None, run_callbacks=False):
             try:
                 if self.background:
-                    self.background.run(ignore_case)
+                    if self.feature and self.feature.background_once:
+                        self.feature.enter_background(ignore_case)
+                    else:
+                        self.background.run(ignore_case)
 
-                all_steps, steps_passed, steps_failed, steps_undefined, reasons_to_fail = Step.run_all(self.steps, outline, run_callbacks, ignore_case, failfast=failfast)
+                all_steps, steps_passed, steps_failed, steps_undefined, reasons_to_fail = run_all(self.steps, outline, run_callbacks, ignore_case, failfast=failfast)
             except:
                 if failfast:
                     call_hook('after_each', 'scenario', self)
@@ -720,13 +836,17 @@ class Scenario(object):
                 call_hook('outline', 'scenario', self, order, outline,
                         reasons_to_fail)
 
-            return ScenarioResult(
+            result = ScenarioResult(
                 self,
                 steps_passed,
                 steps_failed,
                 steps_skipped,
                 steps_undefined
             )
+            if outline:
+                result.row = outline_row(outline)
+
+            return result
 
         if self.outlines:
             first = True
@@ -739,13 +859,21 @@ class Scenario(object):
         call_hook('after_each', 'scenario', self)
         return results
 
+    def bind(self, ignore_case=True):
+        """Binds each step of the scenario, or of each of its outline
+        rows, to step definitions. Returns a list of (step, definitions)
+        tuples, see Step.bind"""
+        if self.outlines:
+            steps = chain(*[steps for outline, steps in self.evaluated])
+        else:
+            steps = self.steps
+
+        return [(step, step.bind(ignore_case)) for step in steps]
+
     def _add_myself_to_steps(self):
         for step in self.steps:
             step.scenario = self
 
-        for step in self.solved_steps:
-            step.scenario = self
-
     def _resolve_steps(self, steps, outlines, with_file, original_string):
         for outline in outlines:
             for step in steps:
@@ -843,15 +971,52 @@ class Scenario(object):
         return scenario
 
 
+    @classmethod
+    def from_node(new_scenario, node,
+                  with_file=None,
+                  original_string=None,
+                  language=None):
+        """Creates a new scenario from a lettuce.parser.ScenarioNode,
+        leaving its steps and examples to be built when first needed"""
+        def body():
+            keys, outlines = [], []
+            if node.examples:
+                keys, outlines = strings.parse_hashes(node.examples)
+
+            steps = [Step.from_node(step, with_file) for step in node.steps]
+            return steps, keys, outlines
+
+        described_at = None
+        if with_file and original_string:
+            described_at = ScenarioDescription(
+                None, with_file, original_string, language, line=node.line)
+
+        return new_scenario(
+            name=node.name,
+            remaining_lines=node.lines,
+            keys=None,
+            outlines=None,
+            with_file=with_file,
+            original_string=original_string,
+            language=language,
+            tags=node.tags,
+            described_at=described_at,
+            body=body,
+        )
+
+
 class Background(object):
     indentation = 2
 
     def __init__(self, lines, feature,
                  with_file=None,
                  original_string=None,
-                 language=None):
-        self.steps = map(self.add_self_to_step, Step.many_from_lines(
-            lines, with_file, original_string))
+                 language=None,
+                 steps=None):
+        if steps is None:
+            steps = Step.many_from_lines(lines, with_file, original_string)
+
+        self.steps = map(self.add_self_to_step, steps)
 
         self.feature = feature
         self.original_string = original_string
@@ -861,6 +1026,13 @@ class Background(object):
         step.background = self
         return step
 
+    def clone(self):
+        """Returns a copy of this background, with copies of its steps,
+        that can run while this one is running in another thread"""
+        new = copy(self)
+        new.steps = [new.add_self_to_step(copy(step)) for step in self.steps]
+        return new
+
     def run(self, ignore_case):
         call_hook('before_each', 'background', self)
         results = []
@@ -869,7 +1041,7 @@ class Background(object):
             matched, step_definition = step.pre_run(ignore_case)
             call_hook('before_each', 'step', step)
             try:
-                results.append(step.run(ignore_case))
+                results.append(step.run_matched(matched, step_definition))
             except Exception, e:
                 print e
                 pass
@@ -908,13 +1080,62 @@ class Background(object):
             original_string=original_string,
             language=language)
 
+    @classmethod
+    def from_node(new_background, node,
+                  feature,
+                  with_file=None,
+                  original_string=None,
+                  language=None):
+        """Creates a new background from a lettuce.parser.BackgroundNode"""
+        return new_background(
+            [],
+            feature,
+            with_file=with_file,
+            original_string=original_string,
+            language=language,
+            steps=[Step.from_node(step, with_file) for step in node.steps])
+
+
+def read_feature_file(filename, cache=None):
+    """Reads and parses the feature file `filename`, reusing its syntax
+    tree from `cache`, a ParseCache, when given.
+
+    Returns a tuple (node, string), made only of picklable plain data,
+    so that feature files can be parsed in other processes.
+    """
+    f = codecs.open(filename, "r", "utf-8")
+    string = f.read()
+    f.close()
+    language = Language.guess_from_string(string)
+    node = cache and cache.get(filename, string, language.code) or None
+    if node is None:
+        node = parser.parse(string, language, filename)
+        if cache:
+            cache.set(filename, string, language.code, node)
+
+    return node, string
+
+
+def read_feature_file_or_error(arguments):
+    """Calls read_feature_file(*arguments), returning a tuple (parsed,
+    error message) instead of raising LettuceSyntaxError"""
+    try:
+        return read_feature_file(*arguments), None
+    except LettuceSyntaxError, e:
+        return None, e.msg
+
 
 class Feature(object):
     """ Object that represents a feature."""
     described_at = None
+    # how the background changed the world, in background once mode
+    background_changes = None
+    # the scenarios being run by Feature.run
+    scheduled = None
 
     def __init__(self, name, remaining_lines, with_file, original_string,
-                 language=None):
+                 language=None, background=None, scenarios=None,
+                 description=None, tags=None, described_at=None):
 
         if not language:
             language = language()
@@ -923,21 +1144,33 @@ class Feature(object):
         self.language = language
         self.original_string = original_string
 
-        (self.background,
-         self.scenarios,
-         self.description) = self._parse_remaining_lines(
-            remaining_lines,
-            original_string,
-            with_file)
+        if scenarios is None:
+            (background,
+             scenarios,
+             description) = self._parse_remaining_lines(
+                remaining_lines,
+                original_string,
+                with_file)
 
-        if with_file:
+        self.background = background
+        self.scenarios = scenarios
+        self.description = description
+
+        if background:
+            background.feature = self
+
+        if described_at:
+            self._set_definition(described_at)
+        elif with_file:
             feature_definition = FeatureDescription(self,
                                                     with_file,
                                                     original_string,
                                                     language)
             self._set_definition(feature_definition)
 
-        if original_string and '@' in self.original_string:
+        if tags is not None:
+            self.tags = tags
+        elif original_string and '@' in self.original_string:
             self.tags = self._find_tags_in(original_string)
         else:
             self.tags = None
@@ -1021,48 +1254,65 @@ class Feature(object):
     @classmethod
     def from_string(new_feature, string, with_file=None, language=None):
         """Creates a new feature from string"""
-
-        lines = strings.get_stripped_lines(
-            string,
-            ignore_lines_starting_with='#',
-        )
         if not language:
             language = Language()
 
-        found = len(re.findall(r'(?:%s):[ ]*\w+' % language.feature, "\n".join(lines), re.U))
+        node = parser.parse(string, language, with_file)
+        return new_feature.from_node(node, string, language)
 
-        if found > 1:
-            raise LettuceSyntaxError(with_file,
-                'A feature file must contain ONLY ONE feature!')
+    @classmethod
+    def from_node(new_feature, node, original_string=None, language=None):
+        """Creates a new feature from a lettuce.parser.FeatureNode"""
+        if not language:
+            language = Language(node.language)
 
-        elif found == 0:
-            raise LettuceSyntaxError(with_file,
-                'Features must have a name. e.g: "Feature: This is my name"')
+        with_file = node.filename
+        kw = dict(
+            with_file=with_file,
+            original_string=original_string,
+            language=language,
+        )
 
-        while lines:
-            matched = re.search(r'(?:%s):(.*)' % language.feature, lines[0], re.I)
-            if matched:
-                name = matched.groups()[0].strip()
-                break
+        background = None
+        if node.background:
+            background = Background.from_node(node.background, None, **kw)
 
-            lines.pop(0)
+        scenarios = []
+        for scenario_node in node.scenarios:
+            scenario = Scenario.from_node(scenario_node, **kw)
+            scenario.background = background
+            scenarios.append(scenario)
 
-        feature = new_feature(name=name,
-                              remaining_lines=lines,
-                              with_file=with_file,
-                              original_string=string,
-                              language=language)
-        return feature
+        described_at = None
+        if with_file:
+            described_at = FeatureDescription(
+                None, with_file, original_string, language,
+                line=node.line,
+                description_at=[line for line, text in node.description])
+
+        return new_feature(
+            name=node.name,
+            remaining_lines=None,
+            background=background,
+            scenarios=scenarios,
+            description=u"\n".join(
+                [text for line, text in node.description]),
+            tags=node.tags,
+            described_at=described_at,
+            **kw)
+
+    @classmethod
+    def from_file(new_feature, filename, cache=None):
+        """Creates a new feature from filename, reusing its syntax tree
+        from `cache`, a ParseCache, when given"""
+        return new_feature.from_parsed_file(read_feature_file(filename, cache))
 
     @classmethod
-    def from_file(new_feature, filename):
-        """Creates a new feature from filename"""
-        f = codecs.open(filename, "r", "utf-8")
-        string = f.read()
-        f.close()
-        language = Language.guess_from_string(string)
-        feature = new_feature.from_string(string, with_file=filename, language=language)
-        return feature
+    def from_parsed_file(new_feature, parsed):
+        """Creates a new feature from the (node, string) tuple returned
+        by read_feature_file"""
+        node, string = parsed
+        return new_feature.from_node(node, string, Language(node.language))
 
     def _set_definition(self, definition):
         self.described_at = definition
@@ -1180,24 +1430,12 @@ class Feature(object):
         if random:
             shuffle(self.scenarios)
 
-        if isinstance(scenarios, (tuple, list)):
-            if all(map(lambda x: isinstance(x, int), scenarios)):
-                scenarios_to_run = scenarios
-        else:
-            scenarios_to_run = range(1, len(self.scenarios) + 1)
-
+        self.background_changes = None
+        self.scheduled = self.select_scenarios(scenarios, tags)
         try:
-            for index, scenario in enumerate(self.scenarios):
-                if scenarios_to_run and (index + 1) not in scenarios_to_run:
-                    continue
-
-                if not scenario.matches_tags(tags):
-                    continue
-
-                if self.background:
-                    self.background.run(ignore_case)
-
-                scenario_run_results = scenario.run(ignore_case, failfast=failfast)
+            for scenario in self.scheduled:
+                scenario_run_results = self.run_scenario(
+                    scenario, ignore_case, failfast=failfast)
                 scenarios_ran.extend(scenario_run_results)
                 any_outline_failed = any(s.steps_failed for s in scenario_run_results)
                 if failfast and any_outline_failed:
@@ -1211,6 +1449,102 @@ class Feature(object):
             call_hook('after_each', 'feature', self)
             return FeatureResult(self, *scenarios_ran)
 
+    def select_scenarios(self, scenarios=None, tags=None):
+        """Returns the scenarios selected by their 1-based indices in
+        `scenarios` (all of them when None) and by `tags`"""
+        return [scenario for index, scenario in enumerate(self.scenarios)
+                if (not scenarios or (index + 1) in scenarios) and
+                scenario.matches_tags(tags)]
+
+    def run_scenario(self, scenario, ignore_case=True, failfast=False,
+                     background=None):
+        """Runs the background and then one scenario of this feature,
+        returning the results of each of its outlines, which share the
+        time it took as their duration. `background` stands for the one
+        of this feature when given. Scenarios found in the current
+        result cache are not run, their results are reused instead"""
+        key = None
+        cache = result_cache.current
+        if cache is not None:
+            key = cache.key(self, scenario, ignore_case)
+            reused = cache.get(self, scenario, key)
+            if reused is not None:
+                return reused
+
+        started = time.time()
+        background = background or self.background
+        if background and not self.background_once:
+            background.run(ignore_case)
+
+        results = scenario.run(ignore_case, failfast=failfast)
+        duration = time.time() - started
+        for result in results:
+            result.duration = duration / len(results)
+            result.cache_key = key
+
+        return results
+
+    @property
+    def background_once(self):
+        return BACKGROUND_ONCE in (self.tags or [])
+
+    def enter_background(self, ignore_case=True):
+        """Runs the background of this feature the first time, keeping
+        the attributes of the world it changed, and changes them the
+        same way every other time, leaving alone what the scenario hooks
+        set. A background that did not pass runs again for the next
+        scenario, as without @background_once"""
+        with background_lock:
+            if self.background_changes is None:
+                references = {}
+                before = isolation.snapshot(references)
+                results = self.background.run(ignore_case)
+                if len(results) < len(self.background.steps):
+                    return
+
+                self.background_changes = (
+                    isolation.changes(before, references), references)
+            else:
+                isolation.apply(*self.background_changes)
+
+    def bind(self, scenarios=None, ignore_case=True, tags=None):
+        """Binds the steps of the background and of the selected
+        scenarios to step definitions, without calling any hooks nor
+        step definitions"""
+        selected = self.select_scenarios(scenarios, tags)
+        bindings = []
+        for scenario in selected:
+            bindings.extend(scenario.bind(ignore_case))
+
+        if selected and self.background:
+            bindings[:0] = [(step, step.bind(ignore_case))
+                            for step in self.background.steps]
+
+        return BindResult(self, selected, bindings)
+
+
+class BindResult(object):
+    """Object that holds the step definitions bound to each step of a
+    feature, when binding it without running"""
+    def __init__(self, feature, scenarios, bindings):
+        self.feature = feature
+        self.scenarios = scenarios
+        self.bindings = bindings
+
+    @property
+    def steps_undefined(self):
+        return [step for step, definitions in self.bindings
+                if not definitions]
+
+    @property
+    def steps_ambiguous(self):
+        return [(step, definitions) for step, definitions in self.bindings
+                if len(definitions) > 1]
+
+    @property
+    def passed(self):
+        return not self.steps_undefined
+
 
 class FeatureResult(object):
     """Object that holds results of each scenario ran from within a feature"""
@@ -1238,6 +1572,15 @@ class ScenarioResult(object):
         all_lists = [steps_passed + steps_skipped + steps_undefined + steps_failed]
         self.total_steps = sum(map(len, all_lists))
 
+        # seconds taken to run, set by Feature.run_scenario
+        self.duration = None
+        # the outline row it ran, set by Scenario.run
+        self.row = None
+        # the key of the result cache it ran with, and whether it was
+        # reused from there instead, see lettuce.result_cache
+        self.cache_key = None
+        self.cached = False
+
     @property
     def passed(self):
         return self.total_steps is len(self.steps_passed)
@@ -1289,3 +1632,39 @@ class TotalResult(object):
     @property
     def scenarios_passed(self):
         return len([result for result in self.scenario_results if result.passed])
+
+
+class TotalBindResult(object):
+    """Object that holds the results of binding many features, along
+    with the time taken by each phase of the binding"""
+    def __init__(self, bind_results, timings=None):
+        self.bind_results = bind_results
+        self.timings = timings or []
+        self.scenarios = 0
+        self.steps = 0
+        self.steps_undefined = []
+        self.steps_ambiguous = []
+        for bind_result in self.bind_results:
+            self.scenarios += len(bind_result.scenarios)
+            self.steps += len(bind_result.bindings)
+            self.steps_undefined.extend(bind_result.steps_undefined)
+            self.steps_ambiguous.extend(bind_result.steps_ambiguous)
+
+    @property
+    def features(self):
+        return len(self.bind_results)
+
+    @property
+    def passed(self):
+        return not self.steps_undefined
+
+    @property
+    def proposed_definitions(self):
+        sentences = []
+        proposed = []
+        for step in self.steps_undefined:
+            if step.proposed_sentence not in sentences:
+                sentences.append(step.proposed_sentence)
+                proposed.append(step)
+
+        return proposed
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running features from a process that has everything loaded already.
+
+A daemon, started with `lettuce --daemon`, imports the terrain and the
+step definitions once, then waits for runs on a Unix socket. For each
+run asked by `lettuce --client`, with the same arguments a plain lettuce
+command would take, it forks a child, which runs them from the working
+directory and with the environment of the client, without loading the
+step definitions again, and sends what it prints back to the client,
+along with its exit status. Runs start from the state the daemon was in
+before the first one, so nothing they do is seen by the next ones.
+
+Messages are pickled, over connections authenticated with the key in
+the LETTUCE_AUTHKEY environment variable.
+"""
+import os
+import sys
+import signal
+import traceback
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+from lettuce.cache import default_directory
+from lettuce.distributed import authkey
+from lettuce.exceptions import StepLoadingError
+
+SOCKET = 'daemon.sock'
+
+# whether the step definitions were loaded by a daemon, before forking
+# the process running features
+loaded = False
+
+
+def default_address():
+    return os.environ.get('LETTUCE_SOCKET',
+                          os.path.join(default_directory(), SOCKET))
+
+
+class Forward(object):
+    """File-like object sending what is written to it over `connection`,
+    tagged with `name`"""
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+
+    def write(self, string):
+        self.connection.send((self.name, string))
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def exit_status(code):
+    """Returns the exit status of a process exiting with `code`, as given
+    to SystemExit, printing it when it is a message"""
+    if code is None:
+        return 0
+
+    if isinstance(code, (int, long)):
+        return code
+
+    sys.stderr.write("%s\n" % code)
+    return 1
+
+
+def run(connection, request, main):
+    """Runs `main` with the arguments of `request`, in a child of the
+    daemon, sending what it prints and its exit status over `connection`.
+    Never returns"""
+    status = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        os.environ.clear()
+        os.environ.update(request['environ'])
+        os.chdir(request['cwd'])
+        sys.stdout = Forward(connection, 'stdout')
+        sys.stderr = Forward(connection, 'stderr')
+        try:
+            main(request['args'])
+            status = 0
+        except SystemExit, e:
+            status = exit_status(e.code)
+        except:
+            traceback.print_exc()
+    finally:
+        try:
+            connection.send(('exit', status))
+            connection.close()
+        finally:
+            os._exit(status)
+
+
+def serve(address, loader, main):
+    """Loads the step definitions found by `loader`, then forks a child
+    running `main` for each run asked on `address`, until interrupted.
+    Returns the exit status of the daemon"""
+    global loaded
+    try:
+        loader.find_and_load_step_definitions()
+    except StepLoadingError, e:
+        print "Error loading step definitions:\n", e
+        return 1
+
+    loaded = True
+    directory = os.path.dirname(address)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    if os.path.exists(address):
+        # left behind by a daemon that did not stop cleanly
+        os.remove(address)
+
+    listener = Listener(address, family='AF_UNIX', authkey=authkey())
+    # children are reaped as they exit
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    print "Waiting for runs on %s, press Ctrl-C to stop" % address
+    try:
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, IOError):
+                continue
+
+            try:
+                request = connection.recv()
+            except (EOFError, IOError):
+                connection.close()
+                continue
+
+            if os.fork() == 0:
+                run(connection, request, main)
+
+            connection.close()
+    except KeyboardInterrupt:
+        print
+    finally:
+        listener.close()
+
+    return 0
+
+
+def ask(address, args):
+    """Asks the daemon listening on `address` to run lettuce with `args`,
+    printing what the run prints. Returns its exit status"""
+    try:
+        connection = Client(address, family='AF_UNIX', authkey=authkey())
+    except (IOError, EOFError, AuthenticationError), e:
+        sys.stderr.write("Could not reach the daemon at %s: %s\n" % (
+            address, e))
+        return 2
+
+    try:
+        connection.send({
+            'args': args,
+            'cwd': os.getcwd(),
+            'environ': dict(os.environ),
+        })
+        while True:
+            name, value = connection.recv()
+            if name == 'exit':
+                return value
+
+            getattr(sys, name).write(value)
+    except (EOFError, IOError):
+        sys.stderr.write("The daemon at %s went away\n" % address)
+        return 2
+    finally:
+        connection.close()
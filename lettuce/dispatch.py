@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+
+WORD = re.compile(r'[A-Za-z0-9_]+')
+INLINE_FLAGS = re.compile(r'\(\?[iLmsux]+\)')
+METACHARS = u'.^$*+?{}[]|()'
+QUANTIFIERS = u'*+?{'
+
+
+def compile_both(regex):
+    """Returns a (case sensitive, case insensitive) pair of compiled
+    patterns, or None if `regex` does not compile"""
+    try:
+        return re.compile(regex), re.compile(regex, re.I)
+    except re.error:
+        return None
+
+
+def _as_ascii(string):
+    if isinstance(string, str):
+        try:
+            return string.decode('ascii')
+        except UnicodeDecodeError:
+            return u''
+
+    return string
+
+
+def analyse(regex):
+    """Returns a tuple (literal, starts, ends) describing `regex`:
+
+    * literal: text that any sentence matched by `regex` must contain
+    * starts: True if `literal` is anchored to the start of the sentence
+    * ends: True if `literal` is anchored to the end of the sentence
+    """
+    if INLINE_FLAGS.search(regex):
+        # flags such as (?x) or (?i) change the meaning of the whole
+        # pattern, wherever they appear
+        return u'', False, False
+
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in regex:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return u'', False, False
+
+    starts = regex.startswith('^')
+    position = starts and 1 or 0
+    literal = []
+    while position < len(regex):
+        char = regex[position]
+        if char == '\\':
+            following = regex[position + 1:position + 2]
+            if not following or following.isalnum():
+                break
+
+            literal.append(following)
+            position += 2
+            continue
+
+        if char in METACHARS:
+            if char in QUANTIFIERS and literal:
+                literal.pop()
+            break
+
+        literal.append(char)
+        position += 1
+
+    literal = _as_ascii(u''.join(literal))
+    ends = regex[position:] == '$' and bool(literal)
+    return literal, starts and bool(literal), ends
+
+
+def keywords(literal, starts=False, ends=False):
+    """Returns the words of `literal` that are whole words of any
+    sentence containing it: those surrounded by other characters of
+    `literal`, or by the boundaries of the sentence when `literal` is
+    anchored to them"""
+    found = []
+    for matched in WORD.finditer(literal.lower()):
+        if (matched.start() > 0 or starts) and \
+           (matched.end() < len(literal) or ends):
+            found.append(matched.group())
+
+    return found
+
+
+class StepIndex(object):
+    """Dispatch index over step definitions.
+
+    Keeps every definition in registry order, bucketed by a keyword
+    that any matching sentence must contain, so that only a handful of
+    precompiled patterns have to be tried for a given sentence. The
+    first definition, in registry order, whose pattern is found on the
+    sentence wins, exactly like a linear scan of the registry would.
+    """
+    def __init__(self, items, compiled):
+        self.entries = []
+        self.buckets = {}
+        self.wildcards = []
+
+        for position, (regex, func) in enumerate(items):
+            literal, starts, ends = analyse(regex)
+            self.entries.append(
+                (regex, func, compiled.get(regex), literal, literal.lower()))
+
+            words = keywords(literal, starts, ends)
+            if words:
+                rarest = max(words, key=len)
+                self.buckets.setdefault(rarest, []).append(position)
+            else:
+                self.wildcards.append(position)
+
+    def candidates(self, sentence):
+        lowered = sentence.lower()
+        positions = set(self.wildcards)
+        for word in set(WORD.findall(lowered)):
+            positions.update(self.buckets.get(word, ()))
+
+        return sorted(positions)
+
+    def iter_matches(self, sentence, ignore_case):
+        """Yields a tuple (matched, regex, function) for each step
+        definition found on `sentence`, in registry order"""
+        if isinstance(sentence, str):
+            # that's how the re module sees a byte string anyway
+            sentence = sentence.decode('latin-1')
+
+        lowered = sentence.lower()
+        for position in self.candidates(sentence):
+            regex, func, compiled, literal, lowered_literal = \
+                self.entries[position]
+
+            if ignore_case:
+                if lowered_literal not in lowered:
+                    continue
+            elif literal not in sentence:
+                continue
+
+            if compiled:
+                matched = compiled[ignore_case and 1 or 0].search(sentence)
+            else:
+                matched = re.search(regex, sentence, ignore_case and re.I or 0)
+
+            if matched:
+                yield matched, regex, func
+
+    def match(self, sentence, ignore_case):
+        """Returns a tuple (matched, function) for the first step
+        definition found on `sentence`, or (None, None)"""
+        for matched, regex, func in self.iter_matches(sentence, ignore_case):
+            return matched, func
+
+        return None, None
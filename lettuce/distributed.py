@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running scenarios on many machines.
+
+A coordinator, started with `lettuce --coordinator`, parses the feature
+files, selects the scenarios to run and hands them out to workers,
+started with `lettuce --worker HOST:PORT` on any machine holding a copy
+of the same features and step definitions. Each worker runs the
+scenarios it gets with a local Runner, set up with the options of the
+coordinator, and sends back what it printed along with its results and
+reports, which the coordinator prints in order, as if everything ran in
+a single process.
+
+Scenarios are queued by feature, longest first, by how long they took
+on past runs. A worker keeps taking the scenarios of the feature it is
+running, so that the feature hooks run as few times as possible, then
+starts the longest feature no worker started yet. Once there is none
+left, it steals scenarios from the back of the feature with the most
+scenarios still queued, so that slow workers end up with less to do. Scenarios handed out to a worker that went away are queued again.
+
+Messages are pickled, over connections authenticated with the key in
+the LETTUCE_AUTHKEY environment variable, so whoever knows the key can
+run code on the coordinator and the workers. Unless it is set, they
+refuse to listen on, or connect to, anything but a loopback address, as
+the key they use then is no secret.
+"""
+import os
+import sys
+import time
+import socket
+import threading
+import traceback
+from collections import deque
+from StringIO import StringIO
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+from lettuce import result_cache
+from lettuce.core import FeatureResult, TotalResult
+from lettuce.registry import call_hook
+from lettuce.exceptions import StepLoadingError
+from lettuce.history import longest_first
+from lettuce.plugins import xunit_output
+from lettuce.parallel import detach_scenario_result, detach_reports
+from lettuce.parallel import select_scenarios, merge_scenarios
+
+PORT = 7788
+AUTHKEY = 'lettuce'
+
+
+def parse_address(string, host='localhost'):
+    """Returns a tuple (host, port) from a string 'HOST:PORT', 'HOST'
+    or 'PORT'"""
+    name, colon, port = string.rpartition(':')
+    if not colon:
+        if string.isdigit():
+            return host, int(string)
+
+        return string, PORT
+
+    return name or host, int(port)
+
+
+def authkey():
+    return os.environ.get('LETTUCE_AUTHKEY', AUTHKEY)
+
+
+class UnsafeAddress(Exception):
+    """Raised when listening on, or connecting to, an address other
+    machines may reach, without a key of one's own"""
+
+
+def is_loopback(host):
+    if not host:
+        # listens on every interface
+        return False
+
+    try:
+        found = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return False
+
+    return all(address[0].startswith('127.') or address[0] == '::1'
+               for family, kind, protocol, name, address in found)
+
+
+def check_address(address):
+    """Raises UnsafeAddress unless the (host, port) `address` is a
+    loopback one or LETTUCE_AUTHKEY is set"""
+    if 'LETTUCE_AUTHKEY' not in os.environ and not is_loopback(address[0]):
+        raise UnsafeAddress(
+            'Set LETTUCE_AUTHKEY to a secret shared by the coordinator and '
+            'the workers to use %s:%d: messages are pickled, so anyone '
+            'knowing the key can run code on them' % address)
+
+
+def connect(address, timeout=60):
+    """Connects to the coordinator listening on `address`, retrying for
+    `timeout` seconds, as workers may start before the coordinator"""
+    check_address(address)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return Client(address, authkey=authkey())
+        except socket.error:
+            if time.time() > deadline:
+                raise
+
+            time.sleep(0.5)
+
+
+class StealingQueue(object):
+    """The queue of units to run, as returned by
+    `parallel.select_scenarios`, grouped by feature. Given how long each
+    unit should take, features start longest first, and so do the units
+    of each feature"""
+    def __init__(self, units, estimates=None):
+        if estimates is None:
+            estimates = [0] * len(units)
+
+        self.queues = {}
+        totals = {}
+        for number in longest_first(estimates):
+            index = units[number][0]
+            self.queues.setdefault(index, deque()).append(number)
+            totals[index] = totals.get(index, 0) + estimates[number]
+
+        self.unstarted = deque(sorted(
+            self.queues, key=lambda index: (-totals[index], index)))
+
+        self.pending = len(units)
+        self.condition = threading.Condition()
+
+    def next(self, feature):
+        queue = self.queues.get(feature)
+        if queue:
+            return queue.popleft()
+
+        while self.unstarted:
+            queue = self.queues[self.unstarted.popleft()]
+            if queue:
+                return queue.popleft()
+
+        busiest = max(self.queues.values(), key=len)
+        if busiest:
+            return busiest.pop()
+
+    def take(self, feature):
+        """Returns the number of the next unit for a worker that last ran
+        a unit of `feature`. Waits while the last units are still running
+        elsewhere, as they may be queued again, and returns None once all
+        of them are done"""
+        self.condition.acquire()
+        try:
+            while self.pending:
+                number = self.next(feature)
+                if number is not None:
+                    return number
+
+                self.condition.wait(0.5)
+        finally:
+            self.condition.release()
+
+    def give_back(self, number, feature):
+        """Queues again a unit whose worker went away"""
+        self.condition.acquire()
+        try:
+            self.queues[feature].appendleft(number)
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def finish(self, count=1):
+        self.condition.acquire()
+        try:
+            self.pending = max(self.pending - count, 0)
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+
+class Coordinator(object):
+    """Hands out the selected scenarios of `features` to the workers
+    connecting to `runner.coordinator`"""
+    def __init__(self, runner, features_files, features):
+        self.runner = runner
+        self.features = list(features)
+        base_dir = runner.loader.base_dir
+        self.filenames = [os.path.relpath(os.path.abspath(filename), base_dir)
+                          for filename in features_files]
+        # workers parse the features again, in the order they were written
+        self.scenarios = [list(feature.scenarios) for feature in self.features]
+        self.selections, self.units = select_scenarios(
+            runner, self.features, runner.scenarios)
+        estimates = runner.history.estimate_units(
+            self.features, self.selections, self.units)[0]
+        self.queue = StealingQueue(self.units, estimates)
+        self.outcomes = [None] * len(self.units)
+        self.done = [threading.Event() for unit in self.units]
+        self.finished = False
+        self.config = {
+            'verbosity': runner.verbosity,
+            'failfast': runner.failfast,
+            'xunit': xunit_output.testsuite is not None,
+            'reuse_results': runner.result_cache is not None,
+        }
+
+    def message(self, number, running):
+        """Returns the message handing the unit `number` out to a worker
+        that last ran a unit of the feature at index `running`"""
+        index, position = self.units[number]
+        scenario = None
+        if position is not None:
+            scenario = self.scenarios[index].index(
+                self.selections[index][position])
+
+        # the output of the feature hooks is printed along with the
+        # first unit of each feature, so they run again for it
+        start = not position or index != running
+        scheduled = [self.scenarios[index].index(selected)
+                     for selected in self.selections[index]]
+        return number, self.filenames[index], scenario, start, scheduled
+
+    def serve(self, connection):
+        """Hands units out to the worker at the other end of
+        `connection`, until there is none left"""
+        running = number = None
+        try:
+            connection.send(self.config)
+            connection.recv()
+            while True:
+                number = self.queue.take(running)
+                if number is None:
+                    connection.send(None)
+                    break
+
+                connection.send(self.message(number, running))
+                self.outcomes[number] = connection.recv()
+                running = self.units[number][0]
+                self.done[number].set()
+                self.queue.finish()
+                number = None
+        except (EOFError, IOError):
+            if number is not None:
+                self.queue.give_back(number, self.units[number][0])
+        finally:
+            connection.close()
+
+    def accept(self, listener):
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, IOError):
+                continue
+
+            if self.finished:
+                connection.close()
+                break
+
+            thread = threading.Thread(target=self.serve, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def wait(self, number):
+        # waiting with a timeout lets KeyboardInterrupt through
+        while not self.done[number].wait(0.5):
+            pass
+
+        return self.outcomes[number]
+
+    def run(self):
+        """Yields the result of each feature, in order. Raises
+        WorkerFailed like running them in this process would"""
+        check_address(self.runner.coordinator)
+        listener = Listener(self.runner.coordinator, authkey=authkey())
+        acceptor = threading.Thread(target=self.accept, args=(listener,))
+        acceptor.daemon = True
+        acceptor.start()
+        try:
+            outcomes = (self.wait(number)
+                        for number in range(len(self.units)))
+            for result in merge_scenarios(self.runner, self.features,
+                                          self.selections, self.units,
+                                          outcomes):
+                yield result
+        finally:
+            self.finished = True
+            self.queue.finish(len(self.units))
+            try:
+                # wakes the acceptor up
+                Client(listener.address, authkey=authkey()).close()
+            except (socket.error, EOFError, AuthenticationError):
+                pass
+
+            acceptor.join(5)
+            listener.close()
+
+
+def coordinate(runner, features_files, features):
+    """Runs the scenarios of the given features on the workers connecting
+    to `runner.coordinator`, yielding the result of each feature in the
+    same order"""
+    return Coordinator(runner, features_files, features).run()
+
+
+class Worker(object):
+    """Runs the units a coordinator hands out over `connection`"""
+    def __init__(self, runner, connection):
+        self.runner = runner
+        self.connection = connection
+        self.features = {}
+        self.results = {}
+        self.running = None
+
+    def load_feature(self, filename):
+        if filename not in self.features:
+            self.features[filename] = self.runner.load_feature(
+                os.path.join(self.runner.loader.base_dir, filename))
+            self.results[filename] = []
+
+        return self.features[filename]
+
+    def finish_feature(self):
+        """Calls the after.each_feature hooks of the feature whose
+        scenarios this worker was running, discarding what they print"""
+        if self.running is None:
+            return
+
+        feature, self.running = self.features[self.running], None
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            call_hook('after_each', 'feature', feature)
+        finally:
+            sys.stdout = stdout
+            detach_reports()
+
+    def run_unit(self, filename, scenario, start, scheduled=()):
+        """Runs the scenario at index `scenario` of a feature file,
+        calling the hooks of that feature first when `start` is true.
+        `scheduled` are the indexes of the scenarios the coordinator
+        selected in that feature. Returns the same tuple as
+        `parallel.run_scenario`"""
+        header = StringIO()
+        captured = StringIO()
+        stdout = sys.stdout
+        results = error = None
+        try:
+            try:
+                feature = self.load_feature(filename)
+                feature.scheduled = [feature.scenarios[index]
+                                     for index in scheduled]
+                if start or self.running != filename:
+                    self.finish_feature()
+                    sys.stdout = header
+                    call_hook('before_each', 'feature', feature)
+                    self.running = filename
+
+                sys.stdout = captured
+                results = []
+                if scenario is not None:
+                    results = feature.run_scenario(
+                        feature.scenarios[scenario],
+                        failfast=self.runner.failfast)
+                    self.results[filename].extend(results)
+            except Exception, e:
+                error = (str(e), traceback.format_exc())
+        finally:
+            sys.stdout = stdout
+
+        return (header.getvalue(), captured.getvalue(),
+                map(detach_scenario_result, results or []),
+                detach_reports(), error)
+
+    def work(self):
+        self.connection.send('ready')
+        while True:
+            unit = self.connection.recv()
+            if unit is None:
+                break
+
+            number, filename, scenario, start, scheduled = unit
+            self.connection.send(
+                self.run_unit(filename, scenario, start, scheduled))
+
+    def total(self):
+        return TotalResult([
+            FeatureResult(self.features[filename], *self.results[filename])
+            for filename in sorted(self.features)])
+
+
+def work(address, base_path, **kw):
+    """Runs the units handed out by the coordinator listening on
+    `address`, with a Runner looking for step definitions under
+    `base_path`. Returns the exit status of the worker"""
+    from lettuce import Runner
+    try:
+        connection = connect(address)
+        config = connection.recv()
+    except UnsafeAddress, e:
+        sys.stderr.write("%s\n" % e)
+        return 1
+    except (socket.error, EOFError, AuthenticationError), e:
+        sys.stderr.write("Could not reach the coordinator at %s:%d: %s\n" % (
+            address[0], address[1], e))
+        return 1
+
+    runner = Runner(base_path,
+                    verbosity=config['verbosity'],
+                    failfast=config['failfast'],
+                    enable_xunit=config['xunit'],
+                    xunit_filename=os.devnull,
+                    reuse_results=config['reuse_results'],
+                    **kw)
+    try:
+        runner.loader.find_and_load_step_definitions()
+    except StepLoadingError, e:
+        print "Error loading step definitions:\n", e
+        connection.close()
+        return 1
+
+    runner.loop.install()
+    call_hook('before', 'all')
+    result_cache.current = runner.result_cache
+    worker = Worker(runner, connection)
+    try:
+        worker.work()
+    finally:
+        worker.finish_feature()
+        connection.close()
+        result_cache.current = None
+        total = worker.total()
+        call_hook('after', 'all', total)
+        runner.loop.close()
+        if runner.result_cache:
+            runner.result_cache.record(total.feature_results)
+
+    return 0
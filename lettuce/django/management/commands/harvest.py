@@ -25,6 +25,7 @@ from django.test.utils import teardown_test_environment
 
 from lettuce import Runner
 from lettuce import registry
+from lettuce.sharding import parse_shard
 
 from lettuce.django.server import Server
 from lettuce.django import harvest_lettuces
@@ -84,6 +85,9 @@ class Command(BaseCommand):
 
         make_option("--pdb", dest="auto_pdb", default=False,
                     action="store_true", help='Launches an interactive debugger upon error'),
+
+        make_option("--shard", dest="shard", default=None,
+                    help='Run only the K-th of N shards of the scenarios of each app, given as K/N'),
     )
 
     def stopserver(self, failed=False):
@@ -113,6 +117,13 @@ class Command(BaseCommand):
         tags = options.get('tags', None)
         failfast = options.get('failfast', False)
         auto_pdb = options.get('auto_pdb', False)
+        shard = options.get('shard', None)
+        if shard:
+            try:
+                shard = parse_shard(shard)
+            except ValueError, e:
+                sys.stderr.write("--shard takes K/N: %s\n" % e)
+                sys.exit(1)
 
         if test_database:
             migrate_south = getattr(settings, "SOUTH_TESTS_MIGRATE", True)
@@ -162,7 +173,8 @@ class Command(BaseCommand):
                 runner = Runner(path, options.get('scenarios'), verbosity,
                                 enable_xunit=options.get('enable_xunit'),
                                 xunit_filename=options.get('xunit_file'),
-                                tags=tags, failfast=failfast, auto_pdb=auto_pdb)
+                                tags=tags, failfast=failfast, auto_pdb=auto_pdb,
+                                shard=shard)
 
                 result = runner.run()
                 if app_module is not None:
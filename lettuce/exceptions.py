@@ -57,6 +57,12 @@ class LettuceSyntaxError(SyntaxError):
         self.msg = "Syntax error at: %s\n%s\n" % (filename, string)
 
 
+class LettuceSyntaxWarning(UserWarning):
+    """Warns about something in a feature file that is likely a mistake,
+    but is still valid"""
+    pass
+
+
 class StepLoadingError(Exception):
     """Raised when a step cannot be loaded."""
     pass
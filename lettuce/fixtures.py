@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Values set up the first time a step asks `world` for them.
+
+A function decorated with `fixture` is called the first time an
+attribute of `world` named after it is looked up, and its value is kept
+until its scope ends: the scenario, after the after.each_scenario hooks,
+the feature, after the after.each_feature hooks, or the session, after
+the after.all hooks. A fixture yielding its value, rather than returning
+it, is torn down by resuming it once its scope ends, after the fixtures
+set up later in that scope.
+
+Fixtures of a session are shared by the threads of a process, which set
+each of them up only once, while each thread has its own fixtures of a
+feature and of a scenario, as it has its own `world`. A process forked
+from another one, like a worker of --processes, uses what that one set
+up already, but only tears down what it set up itself. A child forked
+to run isolated steps tears down what it set up before it exits.
+"""
+import os
+import types
+import threading
+
+SESSION = 'session'
+FEATURE = 'feature'
+SCENARIO = 'scenario'
+SCOPES = (SESSION, FEATURE, SCENARIO)
+
+# the registered fixtures, by name
+FIXTURES = {}
+
+
+class Fixture(object):
+    def __init__(self, function, scope):
+        self.function = function
+        self.scope = scope
+
+    def set_up(self):
+        """Returns a tuple (value, function tearing it down or None)"""
+        value = self.function()
+        if not isinstance(value, types.GeneratorType):
+            return value, None
+
+        generator = value
+
+        def tear_down():
+            try:
+                generator.next()
+            except StopIteration:
+                return
+
+            raise RuntimeError('The fixture %s yields more than once' %
+                               self.function.__name__)
+
+        return generator.next(), tear_down
+
+
+class Scope(object):
+    """The values of the fixtures set up within one scope"""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.values = {}
+        # (pid, tear_down) in the order the fixtures were set up
+        self.set_up = []
+
+    def get(self, name, fixture):
+        with self.lock:
+            if name not in self.values:
+                value, tear_down = fixture.set_up()
+                self.values[name] = value
+                if tear_down:
+                    self.set_up.append((os.getpid(), tear_down))
+
+            return self.values[name]
+
+    def tear_down(self):
+        """Tears down what this process set up, latest first, raising the
+        first error once all of it was torn down"""
+        with self.lock:
+            set_up, self.set_up = self.set_up, []
+            self.values.clear()
+
+        errors = []
+        for pid, tear_down in reversed(set_up):
+            if pid != os.getpid():
+                continue
+
+            try:
+                tear_down()
+            except Exception, e:
+                errors.append(e)
+
+        if errors:
+            raise errors[0]
+
+
+session = Scope()
+local = threading.local()
+
+
+def current(name):
+    """Returns the current scope named `name`"""
+    if name == SESSION:
+        return session
+
+    found = getattr(local, name, None)
+    if found is None:
+        found = Scope()
+        setattr(local, name, found)
+
+    return found
+
+
+def fixture(function=None, scope=SCENARIO):
+    """Decorates a function, so that it will become a fixture named
+    after it, set up the first time a step looks up that name on `world`.
+
+    Example::
+
+        >>> from lettuce import fixture, step, world
+        >>>
+        >>> @fixture(scope='feature')
+        ... def database():
+        ...     connection = connect()
+        ...     yield connection
+        ...     connection.close()
+        >>>
+        >>> @step(u'I have (\d+) users')
+        ... def have_users(step, count):
+        ...     assert world.database.count('users') == int(count)
+
+    The value yielded is kept until the scope ends, then the function
+    goes on to tear it down. The scope may also come first, as in
+    ``@fixture('feature')``.
+    """
+    if isinstance(function, basestring):
+        function, scope = None, function
+
+    if scope not in SCOPES:
+        raise ValueError('The scope of a fixture is one of %s, not %r' % (
+            ', '.join(SCOPES), scope))
+
+    def wrap(function):
+        FIXTURES[function.__name__] = Fixture(function, scope)
+        return function
+
+    if function is not None:
+        return wrap(function)
+
+    return wrap
+
+
+def get(name):
+    """Returns the value of the fixture `name`, setting it up first unless
+    it was already in its current scope"""
+    fixture = FIXTURES[name]
+    return current(fixture.scope).get(name, fixture)
+
+
+def leave(name):
+    """Ends the current scope named `name`, tearing down its fixtures"""
+    if name == SESSION:
+        session.tear_down()
+    else:
+        found = getattr(local, name, None)
+        setattr(local, name, None)
+        if found is not None:
+            found.tear_down()
+
+
+def leave_all():
+    """Ends the scenario and feature scopes of this thread, then the
+    session, raising the first error once all of them were torn down"""
+    errors = []
+    for name in (SCENARIO, FEATURE, SESSION):
+        try:
+            leave(name)
+        except Exception, e:
+            errors.append(e)
+
+    if errors:
+        raise errors[0]
@@ -43,7 +43,7 @@ class FeatureLoader(object):
         elif excluded_files:
             self.excluded_files = _normalize_filenames(excluded_files)
 
-    def find_and_load_step_definitions(self):
+    def find_step_definitions(self):
         files = FileSystem.locate(self.base_dir, '*.py')
 
         def _matches_any(str_, pattern_list):
@@ -56,23 +56,32 @@ class FeatureLoader(object):
             is_file_wanted = lambda f: not _matches_any(f, self.excluded_files)
             files = filter(is_file_wanted, files)
 
-        for filename in files:
-            root = FileSystem.dirname(filename)
-            sys.path.insert(0, root)
-            to_load = FileSystem.filename(filename, with_extension=False)
+        return files
+
+    def find_and_load_step_definitions(self):
+        for filename in self.find_step_definitions():
+            self.load_step_definitions(filename)
+
+    def load_step_definitions(self, filename):
+        root = FileSystem.dirname(filename)
+        sys.path.insert(0, root)
+        to_load = FileSystem.filename(filename, with_extension=False)
+        try:
             try:
                 module = __import__(to_load)
             except ValueError, e:
                 import traceback
                 err_msg = traceback.format_exc(e)
                 if 'empty module name' in err_msg.lower():
-                    continue
+                    return
                 else:
                     e.args = ('{0} when importing {1}'
                               .format(e, filename)),
                     raise e
 
             reload(module)  # always take fresh meat :)
+            return module
+        finally:
             sys.path.remove(root)
 
     def find_feature_files(self):
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import heapq
+
+from lettuce.cache import Store
+from lettuce.core import outline_row
+from lettuce.fs import FileSystem
+
+
+def longest_first(estimates):
+    """Returns the indices of `estimates`, longest first, so that
+    handing them out in that order to whichever worker is free first
+    schedules them longest processing time first"""
+    return sorted(range(len(estimates)), key=lambda index: -estimates[index])
+
+
+def makespan(estimates, workers):
+    """Returns when the last of `workers` would be done, if handed
+    `estimates` longest first, each to the worker that is free first"""
+    loads = [0.0] * max(workers, 1)
+    for estimate in sorted(estimates, reverse=True):
+        heapq.heapreplace(loads, loads[0] + estimate)
+
+    return max(loads)
+
+
+class History(Store):
+    """Wall time of the features and scenarios of past runs.
+
+    Maps the name of each scenario that ran to a tuple (seconds, steps),
+    so that scenarios never run before can be estimated from their
+    number of steps. Each run replaces the durations of the scenarios it
+    ran.
+    """
+    filename = 'durations.pickle'
+
+    def record(self, feature_results):
+        """Stores the durations of the scenarios in `feature_results`"""
+        if not self.path:
+            return
+
+        if self.entries is None:
+            self.load()
+
+        for feature_result in feature_results:
+            ran = {}
+            for result in feature_result.scenario_results:
+                if result.duration is None:
+                    continue
+
+                seconds, steps = ran.get(result.scenario.name, (0.0, 0))
+                ran[result.scenario.name] = (seconds + result.duration,
+                                             steps + result.total_steps)
+
+            if ran:
+                path = feature_result.feature.described_at.file
+                self.entries.setdefault(path, {}).update(ran)
+                self.changed = True
+
+        self.save()
+
+    def seconds_per_step(self):
+        """Returns the mean time a step took in past runs, or None"""
+        if self.entries is None:
+            self.load()
+
+        seconds = steps = 0
+        for scenarios in self.entries.values():
+            for scenario_seconds, scenario_steps in scenarios.values():
+                seconds += scenario_seconds
+                steps += scenario_steps
+
+        return steps and float(seconds) / steps or None
+
+    def feature_seconds(self, filename):
+        """Returns how long all the scenarios of the feature file
+        `filename` took to run last time, or None"""
+        scenarios = self.scenarios(FileSystem.relpath(filename))
+        if not scenarios:
+            return None
+
+        return sum([seconds for seconds, steps in scenarios.values()])
+
+    def estimate(self, feature, scenario, per_step):
+        """Returns how long `scenario` of `feature` should take: its
+        last duration, or else its number of steps times `per_step`"""
+        recorded = self.scenarios(feature.described_at.file).get(scenario.name)
+        if recorded:
+            return recorded[0]
+
+        steps = len(scenario.steps) * max(len(scenario.outlines or []), 1)
+        if feature.background:
+            steps += len(feature.background.steps)
+
+        return steps * (per_step or 1)
+
+    def estimate_units(self, features, selections, units):
+        """Returns the estimate of each unit, as returned by
+        `parallel.select_scenarios`, and whether they are in seconds, as
+        they are in steps until any duration was recorded"""
+        per_step = self.seconds_per_step()
+        estimates = []
+        for index, position in units:
+            if position is None:
+                estimates.append(0.0)
+            else:
+                estimates.append(self.estimate(
+                    features[index], selections[index][position], per_step))
+
+        return estimates, per_step is not None
+
+    def estimate_files(self, filenames):
+        """Returns the estimate of each feature file and whether they are
+        in seconds. Files that never ran are estimated as the mean of
+        those that did"""
+        found = map(self.feature_seconds, filenames)
+        known = [seconds for seconds in found if seconds is not None]
+        if not known:
+            return [0.0] * len(filenames), False
+
+        mean = sum(known) / len(known)
+        return [seconds is None and mean or seconds
+                for seconds in found], True
+
+
+class Outcomes(Store):
+    """Whether the scenarios of past runs passed.
+
+    Maps a tuple (scenario name, outline row) to True when it passed, the
+    row being None for scenarios without examples. Each run replaces the
+    outcomes of the scenarios it ran.
+    """
+    filename = 'outcomes.pickle'
+
+    def record(self, feature_results):
+        """Stores whether the scenarios in `feature_results` passed"""
+        if not self.path:
+            return
+
+        if self.entries is None:
+            self.load()
+
+        for feature_result in feature_results:
+            path = feature_result.feature.described_at.file
+            for result in feature_result.scenario_results:
+                key = result.scenario.name, result.row
+                self.entries.setdefault(path, {})[key] = result.passed
+                self.changed = True
+
+        self.save()
+
+    def failed(self, path):
+        """Returns a dict mapping the name of each scenario of the feature
+        described at `path` that failed last time to its failed rows"""
+        failed = {}
+        for (name, row), passed in self.scenarios(path).items():
+            if not passed:
+                failed.setdefault(name, set()).add(row)
+
+        return failed
+
+    def any_failed(self, filenames):
+        return any(self.failed(FileSystem.relpath(filename))
+                   for filename in filenames)
+
+    def order(self, filenames, only_failed=False):
+        """Returns the feature files `filenames` where any scenario failed
+        last time first, or only those with `only_failed`"""
+        failing = [filename for filename in filenames
+                   if self.failed(FileSystem.relpath(filename))]
+        if only_failed:
+            return failing
+
+        return failing + [filename for filename in filenames
+                          if filename not in failing]
+
+    def select(self, feature, only_failed=False):
+        """Returns the scenarios of `feature` that failed last time first,
+        or only those with `only_failed`, keeping only the examples that
+        failed of a scenario outline"""
+        failed = self.failed(feature.described_at.file)
+        failing = []
+        others = []
+        for scenario in feature.scenarios:
+            rows = failed.get(scenario.name)
+            if not rows:
+                others.append(scenario)
+                continue
+
+            if only_failed and scenario.outlines:
+                outlines = [outline for outline in scenario.outlines
+                            if outline_row(outline) in rows]
+                # the examples may have changed since
+                scenario.outlines = outlines or scenario.outlines
+
+            failing.append(scenario)
+
+        if only_failed:
+            return failing
+
+        return failing + others
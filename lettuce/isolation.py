@@ -0,0 +1,516 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running the steps of a scenario away from the runner.
+
+The steps of a scenario tagged with the tag of a registered isolator,
+or in a feature tagged so, are run by that isolator instead of in the
+runner. The hooks of the scenario and its background still run in the
+runner, before and after the isolated steps.
+
+The isolator tagged @fork runs the steps in a child process forked from
+the runner, so whatever they do to the process is gone once they ran.
+The child sends back how each step went, what it printed, what the
+output plugins reported and the attributes of `world` it set or
+deleted, as long as they can be pickled, which the runner takes on as
+if the steps ran in it.
+
+The isolator tagged @share_prefixes plans the scenarios scheduled with
+the first one of a feature it gets to run as a tree, in which scenarios,
+and examples of outlines, beginning with the same steps share a path.
+It then runs, in a child of the runner, each step of the tree only once,
+forking the child again wherever paths part, so that each scenario goes
+on from the world the steps it shares left. Only the step definitions
+run there: each scenario then goes through the step hooks in the runner,
+which are told how each of its steps went, so that the scenarios are
+reported one by one as if they ran apart. When the scenarios of a
+feature are spread over threads, processes or distributed workers, each
+process runs the tree of all the scenarios scheduled in that feature
+the first time it gets one of them.
+"""
+import os
+import sys
+import weakref
+import threading
+import traceback
+import cPickle as pickle
+from StringIO import StringIO
+
+from lettuce import registry
+from lettuce import fixtures
+from lettuce.registry import world
+from lettuce.exceptions import ReasonToFail, NoDefinitionFound
+
+FORK = 'fork'
+SHARE_PREFIXES = 'share_prefixes'
+
+# the registered isolators, by tag
+ISOLATORS = {}
+
+
+class Isolator(object):
+    """Runs the steps of the scenarios tagged with `tag`, in the runner
+    unless overridden"""
+    tag = None
+
+    def run_all(self, scenario, steps, outline=None, run_callbacks=False,
+                ignore_case=True, failfast=False):
+        """Runs the given steps of `scenario`, taking the same arguments
+        as Step.run_all and returning the same tuple"""
+        from lettuce.core import Step
+        return Step.run_all(steps, outline, run_callbacks, ignore_case,
+                            failfast=failfast)
+
+
+def register(isolator):
+    ISOLATORS[isolator.tag] = isolator
+    return isolator
+
+
+def isolator_for(scenario):
+    """Returns the isolator for the tags of `scenario` or of its feature,
+    or None"""
+    tags = list(scenario.tags or [])
+    if scenario.feature:
+        tags.extend(scenario.feature.tags or [])
+
+    for tag in tags:
+        if tag in ISOLATORS:
+            return ISOLATORS[tag]
+
+    return None
+
+
+def pickled(value, references=None):
+    """Returns `value` pickled, or None if it cannot be. Given a dict of
+    `references`, the features, scenarios and steps `value` refers to are
+    kept there, and pickled by reference"""
+    stream = StringIO()
+    pickler = pickle.Pickler(stream, pickle.HIGHEST_PROTOCOL)
+    if references is not None:
+        def persistent_id(thing):
+            if type(thing).__module__ == 'lettuce.core':
+                references[id(thing)] = thing
+                return id(thing)
+
+        pickler.persistent_id = persistent_id
+
+    try:
+        pickler.dump(value)
+    except Exception:
+        return None
+
+    return stream.getvalue()
+
+
+def unpickled(string, references=None):
+    unpickler = pickle.Unpickler(StringIO(string))
+    if references is not None:
+        unpickler.persistent_load = references.__getitem__
+
+    return unpickler.load()
+
+
+def snapshot(references=None):
+    """Returns the attributes of `world` that can be pickled, pickled,
+    see `pickled`"""
+    found = {}
+    for name, value in vars(world).items():
+        found[name] = pickled(value, references)
+
+    return found
+
+
+def changes(before, references=None):
+    """Returns a tuple (attributes set, names deleted) telling how `world`
+    changed since the `before` snapshot, leaving out what cannot be
+    pickled, see `pickled`"""
+    after = snapshot(references)
+    updated = dict([(name, string) for name, string in after.items()
+                    if string is not None and before.get(name) != string])
+    deleted = [name for name in before if name not in after]
+    return updated, deleted
+
+
+def restore(saved, references=None):
+    """Puts `world` back as it was when the `saved` snapshot was taken,
+    but for the attributes that could not be pickled, which are left as
+    they are"""
+    current = snapshot(references)
+    for name, string in saved.items():
+        if string is not None and current.get(name) != string:
+            setattr(world, name, unpickled(string, references))
+
+    for name in current:
+        if name not in saved:
+            delattr(world, name)
+
+
+def apply(changed, references=None):
+    """Applies the `changed` attributes of `world`, see `changes`"""
+    updated, deleted = changed
+    for name, string in updated.items():
+        setattr(world, name, unpickled(string, references))
+
+    for name in deleted:
+        if hasattr(world, name):
+            delattr(world, name)
+
+
+def failure(reason):
+    exception = reason.exception
+    if pickled(exception) is None:
+        exception = Exception(getattr(reason, 'cause', str(exception)))
+
+    return exception, getattr(reason, 'cause', None), reason.traceback
+
+
+def settle(step, outcome, why):
+    """Marks `step` as having had the given outcome elsewhere, `why`
+    being what `failure` returned for it when it failed"""
+    step.ran = outcome != 'skipped'
+    if outcome == 'passed':
+        step.passed = True
+    elif outcome == 'failed':
+        step.failed = True
+        step.why = ReasonToFail.__new__(ReasonToFail)
+        step.why.step = step
+        step.why.exception, cause, step.why.traceback = why
+        if cause is not None:
+            step.why.cause = cause
+
+
+def in_child(description, function, *args):
+    """Calls `function` with `args` in a child process forked from this
+    one, returning what it returned, or raising what it raised, as long
+    as that can be pickled"""
+    # while scenarios run in threads, no other one may be in a hook when
+    # forking, or the child would wait forever for the lock it holds
+    lock = registry.hooks_lock
+    if lock:
+        lock.acquire()
+
+    try:
+        read, write = os.pipe()
+        pid = os.fork()
+    finally:
+        if lock:
+            lock.release()
+
+    if pid == 0:
+        os.close(read)
+        status = 0
+        try:
+            try:
+                try:
+                    message = ('ran', function(*args))
+                finally:
+                    # the fixtures set up here go away with this process
+                    fixtures.leave_all()
+            except Exception, e:
+                if pickled(e) is None:
+                    e = Exception(str(e))
+
+                message = ('died', (e, traceback.format_exc()))
+
+            stream = os.fdopen(write, 'wb')
+            pickle.dump(message, stream, pickle.HIGHEST_PROTOCOL)
+            stream.close()
+        except:
+            status = 1
+        finally:
+            os._exit(status)
+
+    os.close(write)
+    stream = os.fdopen(read, 'rb')
+    try:
+        data = stream.read()
+    finally:
+        stream.close()
+        os.waitpid(pid, 0)
+
+    if not data:
+        raise RuntimeError('%s died' % description)
+
+    kind, message = pickle.loads(data)
+    if kind == 'died':
+        exception, printed = message
+        sys.stderr.write(printed)
+        raise exception
+
+    return message
+
+
+class ForkIsolator(Isolator):
+    """Runs steps in a child process, forked for each scenario, or for
+    each example of an outline"""
+    tag = FORK
+
+    def child(self, steps, outline, run_callbacks, ignore_case, failfast):
+        """Runs the steps, returning what the runner has to know about it"""
+        from lettuce.core import Step
+        from lettuce.parallel import detach_reports
+        # only what these steps report is sent back
+        detach_reports()
+        before = snapshot()
+        captured = StringIO()
+        stdout, sys.stdout = sys.stdout, captured
+        try:
+            ran = Step.run_all(steps, outline, run_callbacks, ignore_case,
+                               failfast=failfast)
+        finally:
+            sys.stdout = stdout
+
+        all_steps, passed, failed, undefined, reasons = ran
+        outcomes = []
+        for step in all_steps:
+            if step in failed:
+                outcomes.append(('failed', failure(step.why)))
+            elif step in undefined:
+                outcomes.append(('undefined', None))
+            elif step in passed:
+                outcomes.append(('passed', None))
+            else:
+                outcomes.append(('skipped', None))
+
+        return (captured.getvalue(), outcomes, detach_reports(),
+                changes(before))
+
+    def run_all(self, scenario, steps, outline=None, run_callbacks=False,
+                ignore_case=True, failfast=False):
+        message = in_child('the isolated steps of %r' % scenario, self.child,
+                           steps, outline, run_callbacks, ignore_case,
+                           failfast)
+        return self.take_on(steps, outline, ignore_case, *message)
+
+    def take_on(self, steps, outline, ignore_case, printed, outcomes,
+                reports, changed):
+        """Applies the outcome of steps run in a child to the steps of
+        the runner, returning the same tuple as Step.run_all"""
+        from lettuce.parallel import attach_reports
+        sys.stdout.write(printed)
+        attach_reports(reports)
+        apply(changed)
+
+        ran = ([], [], [], [], [])
+        all_steps, passed, failed, undefined, reasons = ran
+        for step, (outcome, why) in zip(steps, outcomes):
+            if outline:
+                step = step.solve_and_clone(outline)
+
+            try:
+                step.pre_run(ignore_case, with_outline=outline)
+            except NoDefinitionFound:
+                pass
+
+            all_steps.append(step)
+            if outcome == 'undefined':
+                undefined.append(step)
+                continue
+
+            settle(step, outcome, why)
+            if outcome == 'passed':
+                passed.append(step)
+            elif outcome == 'failed':
+                failed.append(step)
+                reasons.append(step.why)
+
+        return ran
+
+
+class Node(object):
+    """A step of a prefix tree, standing for that step in each scenario
+    whose steps begin with the steps leading to it"""
+    def __init__(self, step=None, outline=None):
+        self.step = step
+        self.outline = outline
+        self.children = []
+        self.by_key = {}
+        # the scenarios, or examples, whose last step this is
+        self.ending = []
+
+    def add(self, name, steps, outline=None):
+        """Adds the path of `steps` under this node, naming its end `name`"""
+        node = self
+        for step in steps:
+            key = (step.sentence, repr(step.hashes), step.multiline)
+            if key not in node.by_key:
+                node.by_key[key] = Node(step, outline)
+                node.children.append(node.by_key[key])
+
+            node = node.by_key[key]
+
+        node.ending.append(name)
+
+
+def unit(scenario, outline=None):
+    """Returns the name of a scenario, or of one of its examples, in a
+    prefix tree"""
+    for row, candidate in enumerate(scenario.outlines):
+        if candidate is outline:
+            return id(scenario), row
+
+    return id(scenario), None
+
+
+def plan(scenarios):
+    """Returns the prefix tree of the steps of `scenarios`, each example
+    of an outline having a path of its own"""
+    root = Node()
+    for scenario in scenarios:
+        if scenario.outlines:
+            for outline in scenario.outlines:
+                steps = [step.solve_and_clone(outline)
+                         for step in scenario.steps]
+                root.add(unit(scenario, outline), steps, outline)
+        else:
+            root.add(unit(scenario), scenario.steps)
+
+    return root
+
+
+def run_definition(node, outcomes, ignore_case):
+    """Runs the step definition of `node` after the given `outcomes`,
+    returning a tuple (outcome, why, what it printed)"""
+    step = node.step
+    why = None
+    captured = StringIO()
+    stdout, sys.stdout = sys.stdout, captured
+    try:
+        matched = step.pre_run(ignore_case, with_outline=node.outline)
+        if any([outcome in ('failed', 'undefined')
+                for outcome, _, _ in outcomes]):
+            outcome = 'skipped'
+        else:
+            step.run_matched(*matched)
+            outcome = 'passed'
+    except NoDefinitionFound:
+        outcome = 'undefined'
+    except Exception:
+        outcome = 'failed'
+        why = failure(step.why)
+    finally:
+        sys.stdout = stdout
+
+    return outcome, why, captured.getvalue()
+
+
+def walk(node, outcomes, before, ignore_case):
+    """Runs the step definitions under `node`, once for all the paths
+    going through each of them, forking a child for every branch but
+    the last. Returns a dict of (outcomes, changes to world) by name of
+    the path ending"""
+    results = {}
+    while True:
+        for name in node.ending:
+            results[name] = (list(outcomes), changes(before))
+
+        if not node.children:
+            return results
+
+        for child in node.children[:-1]:
+            results.update(in_child('the steps of %r' % child.step, descend,
+                                    child, outcomes, before, ignore_case))
+
+        node = node.children[-1]
+        outcomes.append(run_definition(node, outcomes, ignore_case))
+
+
+def descend(node, outcomes, before, ignore_case):
+    outcomes = outcomes + [run_definition(node, outcomes, ignore_case)]
+    return walk(node, outcomes, before, ignore_case)
+
+
+def execute(root, ignore_case):
+    """Runs the step definitions of the prefix tree `root`, returning
+    how each path went, see `walk`"""
+    return walk(root, [], snapshot(), ignore_case)
+
+
+class PrefixSharer(Isolator):
+    """Runs the steps that the scenarios of a feature begin with only
+    once, forking where they part, so that each scenario goes on from
+    the world its first steps left. Step hooks, and so the output
+    plugins, are then called in the runner for each scenario as if its
+    steps ran in it"""
+    tag = SHARE_PREFIXES
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = weakref.WeakKeyDictionary()
+
+    def outcomes_of(self, scenario, outline, ignore_case):
+        """Returns the outcomes of the steps of `scenario`, or of one of
+        its examples, and the changes they made to the world, running
+        the prefix tree of the scenarios scheduled with it the first
+        time"""
+        name = unit(scenario, outline)
+        owner = scenario.feature or scenario
+        with self.lock:
+            results = self.results.get(owner, {})
+            if name not in results:
+                scheduled = getattr(scenario.feature, 'scheduled', None)
+                if scheduled and scenario in scheduled:
+                    scenarios = [candidate for candidate in scheduled
+                                 if isolator_for(candidate) is self]
+                else:
+                    scenarios = [scenario]
+
+                results = in_child('the steps of %r' % owner, execute,
+                                   plan(scenarios), ignore_case)
+                self.results[owner] = results
+
+            return results.pop(name)
+
+    def run_all(self, scenario, steps, outline=None, run_callbacks=False,
+                ignore_case=True, failfast=False):
+        from lettuce.registry import call_hook
+        outcomes, changed = self.outcomes_of(scenario, outline, ignore_case)
+
+        ran = ([], [], [], [], [])
+        all_steps, passed, failed, undefined, reasons = ran
+        for step, (outcome, why, printed) in zip(steps, outcomes):
+            if outline:
+                step = step.solve_and_clone(outline)
+
+            try:
+                step.pre_run(ignore_case, with_outline=outline)
+                if run_callbacks:
+                    call_hook('before_each', 'step', step)
+
+                sys.stdout.write(printed)
+                settle(step, outcome, why)
+                if outcome == 'passed':
+                    passed.append(step)
+                elif outcome == 'failed':
+                    failed.append(step)
+                    reasons.append(step.why)
+            except NoDefinitionFound, e:
+                undefined.append(e.step)
+            finally:
+                all_steps.append(step)
+                if run_callbacks:
+                    call_hook('after_each', 'step', step)
+
+            if failfast and outcome == 'failed':
+                break
+
+        apply(changed)
+        return ran
+
+
+register(ForkIsolator())
+register(PrefixSharer())
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running coroutine step definitions and hooks.
+
+Step definitions and hooks that are coroutine functions are run on an
+event loop owned by the runner. The loop runs in a thread of its own,
+so that scenarios running in many threads (see `lettuce.threads`) wait
+on it at once, and their coroutines overlap.
+
+Needs asyncio, or trollius under Python 2.
+"""
+import os
+import sys
+import threading
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+
+def iscoroutinefunction(function):
+    return asyncio is not None and asyncio.iscoroutinefunction(function)
+
+
+def in_world(coroutine, state):
+    """Drives `coroutine` with `state` as the contents of `world` each
+    time it resumes, so that from the thread of the loop it sees, and
+    changes, the world of the thread waiting for it"""
+    from lettuce.registry import world
+    value = error = None
+    while True:
+        own = world.__dict__.copy()
+        world.__dict__.clear()
+        world.__dict__.update(state)
+        try:
+            if error:
+                yielded = coroutine.throw(*error)
+            else:
+                yielded = coroutine.send(value)
+        finally:
+            state.clear()
+            state.update(world.__dict__)
+            world.__dict__.clear()
+            world.__dict__.update(own)
+
+        try:
+            value, error = (yield yielded), None
+        except GeneratorExit:
+            coroutine.close()
+            raise
+        except Exception:
+            value, error = None, sys.exc_info()
+
+
+class EventLoop(object):
+    """An event loop running in a thread of its own, started the first
+    time a coroutine runs on it"""
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.lock.acquire()
+        try:
+            # a forked worker gets the loop, but not the thread running it
+            if self.loop is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.serve)
+                self.thread.daemon = True
+                self.thread.start()
+        finally:
+            self.lock.release()
+
+    def serve(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coroutine):
+        """Runs `coroutine` on the loop, blocking the calling thread
+        until it finishes. Returns its result, or raises its exception"""
+        from lettuce.registry import world
+        coroutine = in_world(coroutine, world.__dict__)
+        self.start()
+        finished = threading.Event()
+        tasks = []
+
+        def schedule():
+            task = asyncio.ensure_future(coroutine, loop=self.loop)
+            task.add_done_callback(lambda task: finished.set())
+            tasks.append(task)
+
+        self.loop.call_soon_threadsafe(schedule)
+        # waiting with a timeout lets KeyboardInterrupt through
+        while not finished.wait(0.5):
+            pass
+
+        return tasks[0].result()
+
+    def close(self):
+        """Stops the loop, if it was started. It starts again, anew, when
+        another coroutine runs on it"""
+        self.lock.acquire()
+        try:
+            if self.loop is None:
+                return
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = self.thread = None
+        finally:
+            self.lock.release()
+
+    def install(self):
+        """Makes this the loop coroutine steps and hooks run on"""
+        global current
+        current = self
+
+
+# the loop coroutine steps and hooks run on, replaced by the one of each
+# Runner while it runs
+current = EventLoop()
+
+
+def complete(function, result):
+    """Returns `result`, what calling `function` returned, once run on
+    the current loop if `function` is a coroutine function"""
+    if iscoroutinefunction(function):
+        return current.run(result)
+
+    return result
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running features in many processes.
+
+Worker processes are forked from the runner once it has loaded step
+definitions and terrain, so each of them gets its own copy of `world`,
+of the hooks and of the step registry. Each worker runs whole features,
+with all their hooks, capturing what the output plugins print, and
+sends back a picklable report of each feature it ran. The main process
+prints those reports in the order the features were given, and merges
+their results into a single TotalResult.
+
+Features can also be split by scenario, so that the scenarios of a
+single feature run at once in many workers. Each worker then runs the
+feature hooks the first time it gets a scenario of that feature, and
+the background before each scenario, just like a single process would.
+
+Features and scenarios are handed out longest first, by how long they
+took on past runs, so that the longest ones do not start last.
+"""
+import sys
+import traceback
+import multiprocessing
+from multiprocessing.util import Finalize
+from itertools import izip
+from random import shuffle
+from StringIO import StringIO
+
+from lettuce import fixtures
+from lettuce.core import Feature, FeatureResult, ScenarioResult
+from lettuce.registry import CALLBACK_REGISTRY, call_hook
+from lettuce.exceptions import LettuceSyntaxError
+from lettuce.history import longest_first, makespan
+from lettuce.plugins import xunit_output
+from lettuce.plugins.reporter import Reporter
+
+# set by the main process right before forking workers, which inherit
+# it: (runner, feature files, features already parsed or None)
+current = None
+
+# the scenarios selected to run in each feature, when splitting features
+# by scenario
+selections = None
+
+# the index of the feature whose before.each_feature hooks ran last
+# within a worker
+running = None
+
+
+class StepReport(object):
+    """What the output plugins and TotalResult need to know about a step
+    that ran in another process"""
+    def __init__(self, step):
+        self.sentence = step.sentence
+        self.original_sentence = step.original_sentence
+        self.proposed_sentence = step.proposed_sentence
+        self.proposed_method_name = step.proposed_method_name
+        self.described_at = step.described_at
+        self.ran = step.ran
+        self.passed = step.passed
+        self.failed = step.failed
+
+    def __repr__(self):
+        return u'<Step: "%s">' % self.sentence
+
+
+class ScenarioReport(object):
+    """What is known about a scenario that ran in another process"""
+    def __init__(self, scenario):
+        self.name = scenario.name
+        self.tags = scenario.tags
+        self.described_at = scenario.described_at
+
+    def __repr__(self):
+        return u'<Scenario: "%s">' % self.name
+
+
+class FeatureReport(object):
+    """What is known about a feature that ran in another process"""
+    def __init__(self, feature):
+        self.name = feature.name
+        self.tags = feature.tags
+        self.described_at = feature.described_at
+
+    def __repr__(self):
+        return u'<Feature: "%s">' % self.name
+
+
+def detach_scenario_result(result):
+    """Returns a picklable copy of a ScenarioResult"""
+    steps = lambda steps: [StepReport(step) for step in steps]
+    detached = ScenarioResult(ScenarioReport(result.scenario),
+                              steps(result.steps_passed),
+                              steps(result.steps_failed),
+                              steps(result.steps_skipped),
+                              steps(result.steps_undefined))
+    detached.duration = result.duration
+    detached.row = result.row
+    detached.cache_key = result.cache_key
+    detached.cached = result.cached
+    return detached
+
+
+def detach_result(result):
+    """Returns a picklable copy of a FeatureResult"""
+    return FeatureResult(
+        FeatureReport(result.feature),
+        *map(detach_scenario_result, result.scenario_results))
+
+
+def reporters():
+    """Returns the reporters of the output plugins whose hooks are
+    registered, in the order they were registered"""
+    found = []
+    for callback in CALLBACK_REGISTRY['all']['after']:
+        reporter = getattr(callback, 'im_self', None)
+        if isinstance(reporter, Reporter) and reporter not in found:
+            found.append(reporter)
+
+    return found
+
+
+def detach_reports():
+    """Returns what the output plugins of a worker reported so far,
+    forgetting it"""
+    return {
+        'failures': [reporter.detach_failures() for reporter in reporters()],
+        'testcases': xunit_output.detach_testcases(),
+    }
+
+
+def attach_reports(reports):
+    for reporter, failures in zip(reporters(), reports['failures']):
+        reporter.attach_failures(failures)
+
+    xunit_output.attach_testcases(reports['testcases'])
+
+
+def run_feature(index):
+    """Runs the feature at `index` within a worker. Returns a tuple
+    (printed output, detached result, reports, error), where error is a
+    tuple (kind, message) when running the feature blew up"""
+    runner, features_files, features, scenarios = current
+    captured = StringIO()
+    stdout, sys.stdout = sys.stdout, captured
+    result = error = None
+    try:
+        try:
+            if features is None:
+                feature = runner.load_feature(features_files[index])
+            else:
+                feature = features[index]
+
+            result = detach_result(
+                feature.run(scenarios,
+                            tags=runner.tags,
+                            random=runner.random,
+                            failfast=runner.failfast))
+        except LettuceSyntaxError, e:
+            error = ('syntax', e.msg)
+        except Exception, e:
+            error = ('died', (str(e), traceback.format_exc()))
+    finally:
+        sys.stdout = stdout
+
+    return (captured.getvalue(), result,
+            detach_reports(), error)
+
+
+def finish_feature():
+    """Calls the after.each_feature hooks of the feature whose scenarios
+    a worker was running, discarding what they print"""
+    global running
+    if running is None:
+        return
+
+    runner, features_files, features, scenarios = current
+    stdout, sys.stdout = sys.stdout, StringIO()
+    try:
+        call_hook('after_each', 'feature', features[running])
+    finally:
+        sys.stdout = stdout
+        running = None
+
+
+def start_worker():
+    Finalize(None, finish_feature, exitpriority=10)
+    Finalize(None, fixtures.leave, args=(fixtures.SESSION,), exitpriority=5)
+
+
+def run_scenario(unit):
+    """Runs a scenario within a worker, given a tuple (index of its
+    feature, position among the scenarios selected in that feature). The
+    feature hooks are called first unless this worker already ran a
+    scenario of that feature, or it is the first scenario of the
+    feature, and a position of None only calls them.
+
+    Returns a tuple (output of the feature hooks, output of the
+    scenario, detached results, reports, error), where error is a tuple
+    (message, traceback) when running the scenario blew up"""
+    global running
+    runner, features_files, features, scenarios = current
+    index, position = unit
+    feature = features[index]
+    header = StringIO()
+    captured = StringIO()
+    stdout = sys.stdout
+    results = error = None
+    try:
+        try:
+            if running != index or not position:
+                # the first scenario of a feature may not be the first
+                # one handed out, so the hooks run again to print the
+                # header of the feature along with it
+                finish_feature()
+                sys.stdout = header
+                call_hook('before_each', 'feature', feature)
+                running = index
+
+            sys.stdout = captured
+            results = []
+            if position is not None:
+                results = map(detach_scenario_result, feature.run_scenario(
+                    selections[index][position], failfast=runner.failfast))
+        except Exception, e:
+            error = (str(e), traceback.format_exc())
+    finally:
+        sys.stdout = stdout
+
+    return (header.getvalue(), captured.getvalue(), results,
+            detach_reports(), error)
+
+
+class WorkerFailed(Exception):
+    """Raised in the main process when a feature blew up in a worker,
+    holding the exception message and traceback"""
+    def __init__(self, message, traceback):
+        super(WorkerFailed, self).__init__(message)
+        self.traceback = traceback
+
+
+def schedule(runner, estimates, in_seconds, workers):
+    """Returns the order to hand out the units of the given `estimates`
+    in, longest first, noting on `runner` when the last of `workers`
+    should be done if the estimates are in seconds"""
+    if in_seconds:
+        runner.predicted_makespan = makespan(estimates, workers)
+
+    return longest_first(estimates)
+
+
+def in_order(order, outcomes):
+    """Yields `outcomes`, which come in the given `order` of indices, in
+    the order of the indices"""
+    pending = {}
+    following = 0
+    for index, outcome in izip(order, outcomes):
+        pending[index] = outcome
+        while following in pending:
+            yield pending.pop(following)
+            following += 1
+
+
+def run_features(runner, features_files, scenarios, features=None):
+    """Runs the given features in `runner.processes` worker processes,
+    yielding their results in the same order, each running the
+    scenarios at the 1-based indices `scenarios` (all when None). Raises
+    LettuceSyntaxError or WorkerFailed like running them in this process
+    would"""
+    global current
+    current = runner, features_files, features, scenarios
+    order = schedule(runner,
+                     *runner.history.estimate_files(features_files),
+                     workers=runner.processes)
+    pool = multiprocessing.Pool(runner.processes, start_worker)
+    finished = False
+    try:
+        for output, result, reports, error in in_order(
+                order, pool.imap(run_feature, order, 1)):
+            sys.stdout.write(output)
+            attach_reports(reports)
+            if error:
+                kind, message = error
+                if kind == 'syntax':
+                    failure = LettuceSyntaxError(None, '')
+                    failure.msg = message
+                    raise failure
+
+                raise WorkerFailed(*message)
+
+            yield result
+
+        finished = True
+    finally:
+        if finished:
+            # lets workers tear down their fixtures on their way out
+            pool.close()
+        else:
+            pool.terminate()
+
+        pool.join()
+        current = None
+
+
+def select_scenarios(runner, features, scenarios):
+    """Selects the scenarios to run in each feature, by their 1-based
+    indices `scenarios` (all when None) and by the tags of `runner`,
+    shuffling them first when running in random order. Returns a tuple (selected scenarios of
+    each feature, units), where each unit is a tuple (index of a feature,
+    position among its selected scenarios), or (index, None) for features
+    without any selected scenario, whose hooks run all the same. Each
+    feature keeps its selected scenarios as `scheduled`"""
+    if runner.random:
+        for feature in features:
+            shuffle(feature.scenarios)
+
+    selections = [feature.select_scenarios(scenarios, runner.tags)
+                  for feature in features]
+    # the isolators plan the scenarios scheduled with the one they run,
+    # and the background of this run is taken again
+    for feature, selected in zip(features, selections):
+        feature.scheduled = selected
+        feature.background_changes = None
+
+    units = [(index, position)
+             for index, selected in enumerate(selections)
+             for position in range(len(selected)) or [None]]
+    return selections, units
+
+
+def merge_scenarios(runner, features, selections, units, outcomes,
+                    attach=attach_reports, report=FeatureReport):
+    """Prints the outcome of each unit, as returned by `run_scenario`, in
+    order, yielding the result of each feature once all of its units ran.
+    Raises WorkerFailed like running them in this process would"""
+    for (index, position), (header, output, results, reports, error) in \
+            izip(units, outcomes):
+        if not position:
+            sys.stdout.write(header)
+            scenarios_ran = []
+            skipping = False
+
+        if not skipping:
+            sys.stdout.write(output)
+            attach(reports)
+            if error:
+                raise WorkerFailed(*error)
+
+            scenarios_ran.extend(results)
+            skipping = runner.failfast and \
+                any(result.steps_failed for result in results)
+
+        if position in (None, len(selections[index]) - 1):
+            yield FeatureResult(report(features[index]), *scenarios_ran)
+
+
+def run_scenarios(runner, features, scenarios):
+    """Runs the scenarios of the given features at the 1-based indices
+    `scenarios` (all when None) in `runner.processes` worker processes,
+    yielding the result of each feature in the same order. Raises
+    WorkerFailed like running them in this process would"""
+    global current, selections
+    features = list(features)
+    selections, units = select_scenarios(runner, features, scenarios)
+
+    current = runner, None, features, scenarios
+    order = schedule(runner,
+                     *runner.history.estimate_units(features, selections,
+                                                    units),
+                     workers=runner.processes)
+    pool = multiprocessing.Pool(runner.processes, start_worker)
+    finished = False
+    try:
+        outcomes = pool.imap(run_scenario, [units[i] for i in order], 1)
+        for result in merge_scenarios(runner, features, selections, units,
+                                      in_order(order, outcomes)):
+            yield result
+
+        finished = True
+    finally:
+        if finished:
+            # lets workers call the after.each_feature hooks on their way out
+            pool.close()
+        else:
+            pool.terminate()
+
+        pool.join()
+        current = selections = None
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+import difflib
+import warnings
+
+from lettuce import strings
+from lettuce.exceptions import LettuceSyntaxError, LettuceSyntaxWarning
+
+FEATURE = 'feature'
+BACKGROUND = 'background'
+SCENARIO = 'scenario'
+EXAMPLES = 'examples'
+TAGS = 'tags'
+TABLE = 'table'
+MULTILINE = 'multiline'
+TEXT = 'text'
+
+INLINE_COMMENT_1 = re.compile(ur'(^[^\'"]*)[#]([^\'"]*)$')
+INLINE_COMMENT_2 = re.compile(ur'(^[^\'"]+)[#](.*)$')
+TAG = re.compile(r'(?:(?:^|\s+)[@]([^@\s]+))')
+PLACEHOLDER = re.compile(ur'<([^<>\s](?:[^<>]*[^<>\s])?)>')
+
+
+class StepNode(object):
+    """A step as found on a feature file: its sentence, the lines of
+    its table or multiline string and the line it starts at"""
+    def __init__(self, sentence, lines, line):
+        self.sentence = sentence
+        self.lines = lines
+        self.line = line
+
+
+class BackgroundNode(object):
+    def __init__(self, line, steps):
+        self.line = line
+        self.steps = steps
+
+
+class ScenarioNode(object):
+    """A scenario as found on a feature file. `lines` holds the lines
+    of its body and `examples` the lines of its examples table"""
+    def __init__(self, name, line, tags, steps, lines, examples):
+        self.name = name
+        self.line = line
+        self.tags = tags
+        self.steps = steps
+        self.lines = lines
+        self.examples = examples
+
+
+class FeatureNode(object):
+    """The syntax tree of a feature file. `description` is a list of
+    (line, text) tuples, `tags` is None when the file has no tags at
+    all"""
+    def __init__(self, name, line, description, tags, background,
+                 scenarios, filename=None, language=None):
+        self.name = name
+        self.line = line
+        self.description = description
+        self.tags = tags
+        self.background = background
+        self.scenarios = scenarios
+        self.filename = filename
+        self.language = language
+
+
+class Lexer(object):
+    """Turns the text of a feature file into a list of (kind, line,
+    text, rest) tokens, one per meaningful line, where `rest` is what
+    follows the keyword of a header line"""
+    _instances = {}
+
+    def __init__(self, language):
+        self.language = language
+        self.feature = re.compile(u'(?:%s):(.*)' % language.feature, re.I)
+        self.feature_name = re.compile(
+            u'(?:%s):[ ]*\\w+' % language.feature, re.U)
+        self.background = re.compile(u'(?:%s):\\s*' % language.background)
+        self.scenario = re.compile(u'(?:%s|%s):' % (
+            language.scenario_separator,
+            language.first_of_scenario), re.I | re.U)
+        self.examples = re.compile(u'(?:%s):' % language.examples,
+                                   re.I | re.U)
+
+    @classmethod
+    def for_language(cls, language):
+        if language.code not in cls._instances:
+            cls._instances[language.code] = cls(language)
+
+        return cls._instances[language.code]
+
+    def tokenize(self, string):
+        """Returns a tuple (tokens, features) where `features` is how
+        many named features were found"""
+        tokens = []
+        features = 0
+        found_feature = False
+
+        for number, text in enumerate(unicode(string).splitlines()):
+            text = text.strip()
+            if not text or text.startswith('#'):
+                continue
+
+            line = number + 1
+            features += len(self.feature_name.findall(text))
+
+            if not found_feature:
+                matched = self.feature.search(text)
+                if matched:
+                    found_feature = True
+                    token = (FEATURE, line, text, matched.group(1).strip())
+                elif text.startswith('@'):
+                    token = (TAGS, line, text, None)
+                else:
+                    continue
+
+            elif text.startswith('|'):
+                token = (TABLE, line, text, None)
+            elif strings.wise_startswith(text, u'"""'):
+                token = (MULTILINE, line, text, None)
+            elif text.startswith('@'):
+                token = (TAGS, line, text, None)
+            else:
+                token = self.header(line, text)
+
+            tokens.append(token)
+
+        return tokens, features
+
+    def header(self, line, text):
+        for kind, regex in ((SCENARIO, self.scenario),
+                            (EXAMPLES, self.examples),
+                            (BACKGROUND, self.background)):
+            matched = regex.match(text)
+            if matched:
+                return kind, line, text, text[matched.end():].strip()
+
+        return TEXT, line, text, None
+
+
+class Parser(object):
+    """Builds a FeatureNode out of the tokens of a feature file in a
+    single pass"""
+    def __init__(self, language, filename=None):
+        self.language = language
+        self.filename = filename
+        self.lexer = Lexer.for_language(language)
+
+    def error(self, message, filename=None):
+        raise LettuceSyntaxError(filename, message)
+
+    def parse(self, string):
+        tokens, features = self.lexer.tokenize(string)
+        if features > 1:
+            self.error('A feature file must contain ONLY ONE feature!',
+                       self.filename)
+
+        elif features == 0:
+            self.error('Features must have a name. '
+                       'e.g: "Feature: This is my name"', self.filename)
+
+        position = 0
+        tags = []
+        while tokens[position][0] != FEATURE:
+            tags.extend(TAG.findall(tokens[position][2]))
+            position += 1
+
+        kind, line, text, name = tokens[position]
+        tokens = tokens[position + 1:]
+        self.check_scenario_names(name, tokens)
+
+        if not tokens:
+            self.error(u"Features must have scenarios.\n"
+                       "Please refer to the documentation available at "
+                       "http://lettuce.it for more information.",
+                       self.filename)
+
+        description = []
+        background = None
+        scenarios = []
+        pending_tags = []
+        section = description
+        current = None
+
+        for token in tokens:
+            kind = token[0]
+            if kind == TAGS:
+                pending_tags.extend(TAG.findall(token[2]))
+                continue
+
+            if kind == SCENARIO:
+                current = [token, pending_tags, [], []]
+                scenarios.append(current)
+                section = current[2]
+            elif kind == BACKGROUND and current is None and \
+                    background is None:
+                background = [token, []]
+                section = background[1]
+                if token[3]:
+                    section.append((TEXT, token[1], token[3], None))
+            elif kind == EXAMPLES and current is not None:
+                section = []
+                current[3].append(section)
+                if token[3]:
+                    section.append((TABLE, token[1], token[3], None))
+            else:
+                section.append(token)
+
+            pending_tags = []
+
+        return FeatureNode(
+            name=name,
+            line=line,
+            description=[(t[1], t[2]) for t in description],
+            tags=tags if '@' in string else None,
+            background=background and self.background(*background),
+            scenarios=[self.scenario(*s) for s in scenarios],
+            filename=self.filename,
+            language=self.language.code,
+        )
+
+    def check_scenario_names(self, feature_name, tokens):
+        empty_scenario = (u'%s:' % self.language.first_of_scenario).lower()
+        for token in tokens:
+            if token[2].lower() == empty_scenario:
+                self.error(
+                    'In the feature "%s", scenarios must have a name, '
+                    'make sure to declare a scenario like this: '
+                    '`Scenario: name of your scenario`' % feature_name,
+                    self.filename)
+
+    def background(self, header, tokens):
+        return BackgroundNode(header[1], self.steps(tokens))
+
+    def scenario(self, header, tags, tokens, blocks):
+        kind, line, text, name = header
+        examples = []
+        for index, block in enumerate(blocks):
+            # all the examples blocks of a scenario make up a single
+            # table, so only the head of the first one is kept
+            examples.extend([t[2] for t in block[index and 1 or 0:]])
+
+        if tokens and tokens[0][0] == TABLE:
+            self.error('\nInvalid step on scenario "%s".\n'
+                       'Maybe you killed the first step text of that '
+                       'scenario\n' % name, self.filename)
+
+        steps = self.steps(tokens)
+        if examples:
+            self.check_placeholders(name, steps, examples[0])
+
+        return ScenarioNode(
+            name=name,
+            line=line,
+            tags=tags,
+            steps=steps,
+            lines=[t[2] for t in tokens],
+            examples=examples,
+        )
+
+    def check_placeholders(self, scenario_name, steps, header):
+        """Warns about <placeholders> of outline steps, and of the values
+        of their tables, that are not columns of the examples but look
+        like a misspelled one. They are left as they are, like any other
+        text between angle brackets, such as markup"""
+        keys = set(strings.parse_hashes([header])[0])
+        for step in steps:
+            lines = [step.sentence]
+            if step.lines and \
+               not strings.wise_startswith(step.lines[0], u'"""'):
+                lines.extend(step.lines[1:])
+
+            for line in lines:
+                for placeholder in PLACEHOLDER.findall(line):
+                    if placeholder in keys:
+                        continue
+
+                    close = difflib.get_close_matches(placeholder, keys, 1)
+                    if close:
+                        warnings.warn(LettuceSyntaxWarning(
+                            'At %s, in the scenario "%s", the step "%s" '
+                            'uses <%s>, which is not a column of its '
+                            'examples. Did you mean <%s>?' % (
+                                self.filename, scenario_name, step.sentence,
+                                placeholder, close[0])))
+
+    def steps(self, tokens):
+        invalid_first_line_error = '\nFirst line of step "%s" is in %s form.'
+        if tokens and tokens[0][0] == TABLE:
+            self.error(invalid_first_line_error % (tokens[0][2], 'table'))
+
+        if tokens and tokens[0][0] == MULTILINE:
+            self.error(invalid_first_line_error % (tokens[0][2], 'multiline'))
+
+        steps = []
+        in_multiline = False
+        for kind, line, text, rest in tokens:
+            if kind == MULTILINE:
+                in_multiline = not in_multiline
+                steps[-1].lines.append(text)
+            elif kind == TABLE or in_multiline:
+                steps[-1].lines.append(text)
+            else:
+                if '#' in text:
+                    text = INLINE_COMMENT_1.sub(r'\g<1>\g<2>', text)
+                    text = INLINE_COMMENT_2.sub(r'\g<1>', text)
+
+                steps.append(StepNode(text.strip(), [], line))
+
+        return steps
+
+
+def scan_tags(string, language):
+    """Finds the tags of a feature file without parsing it. Returns a
+    tuple (feature tags, [tags of each scenario]), or None when no
+    feature header is found"""
+    tokens, features = Lexer.for_language(language).tokenize(string)
+    feature_tags = None
+    scenarios = []
+    pending_tags = []
+    for kind, line, text, rest in tokens:
+        if kind == TAGS:
+            pending_tags.extend(TAG.findall(text))
+            continue
+
+        if kind == FEATURE and feature_tags is None:
+            feature_tags = pending_tags
+        elif kind == SCENARIO and feature_tags is not None:
+            scenarios.append(pending_tags)
+
+        pending_tags = []
+
+    if feature_tags is None:
+        return None
+
+    return feature_tags, scenarios
+
+
+def parse(string, language, filename=None):
+    """Parses the text of a feature file into a FeatureNode"""
+    return Parser(language, filename).parse(string)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import sys
+
+from lettuce import core
+
+
+def wrt(what):
+    if isinstance(what, unicode):
+        what = what.encode('utf-8')
+    sys.stdout.write(what)
+
+
+def total_seconds(td):
+    return (td.microseconds + (td.seconds + td.days * 24 * 3600) * 1e6) / 1e6
+
+
+def where(step):
+    return u"# %s:%d" % (step.described_at.file, step.described_at.line)
+
+
+def print_undefined(total):
+    wrt(u"\nUndefined steps:\n")
+    for step in total.steps_undefined:
+        wrt(u"  %s %s\n" % (step.sentence, where(step)))
+
+
+def print_ambiguous(total):
+    wrt(u"\nAmbiguous steps:\n")
+    for step, definitions in total.steps_ambiguous:
+        wrt(u"  %s %s\n" % (step.sentence, where(step)))
+        for regex, function in definitions:
+            definition = core.StepDefinition(step, function)
+            wrt(u"    %r # %s:%d\n" % (regex, definition.file, definition.line))
+
+
+def print_end(total):
+    if total.steps_undefined:
+        print_undefined(total)
+
+    if total.steps_ambiguous:
+        print_ambiguous(total)
+
+    wrt("\n")
+    word = total.features > 1 and "features" or "feature"
+    wrt("%d %s bound\n" % (total.features, word))
+
+    word = total.scenarios > 1 and "scenarios" or "scenario"
+    wrt("%d %s bound\n" % (total.scenarios, word))
+
+    steps_details = []
+    for kind in "undefined", "ambiguous":
+        stotal = len(getattr(total, 'steps_%s' % kind))
+        if stotal:
+            steps_details.append("%d %s" % (stotal, kind))
+
+    steps_details.append(
+        "%d defined" % (total.steps - len(total.steps_undefined)))
+    word = total.steps > 1 and "steps" or "step"
+    wrt("%d %s (%s)\n" % (total.steps, word, ", ".join(steps_details)))
+
+    for phase, took in total.timings:
+        wrt("%s took %.3f seconds\n" % (phase, total_seconds(took)))
+
+    if total.proposed_definitions:
+        wrt("\nYou can implement step definitions for undefined steps with these snippets:\n\n")
+        wrt("# -*- coding: utf-8 -*-\n")
+        wrt("from lettuce import step\n\n")
+        for step in total.proposed_definitions:
+            method_name = step.proposed_method_name
+            wrt("@step(u'%s')\n" % step.proposed_sentence)
+            wrt("def %s:\n" % method_name)
+            wrt("    assert False, 'This step must be implemented'\n")
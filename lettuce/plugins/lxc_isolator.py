@@ -7,7 +7,7 @@ from time import sleep
 
 from lettuce import core
 from lettuce import world
-from lettuce.terrain import after
+from lettuce import isolation
 from lettuce.terrain import before
 
 
@@ -33,12 +33,13 @@ halt
 '''
 
 
-class LXCRunner(object):
+class LXCRunner(isolation.Isolator):
     """
     Encapsulates scenario run in LXC container.
     Performs container setup, scenario run and result displaying
     """
 
+    tag = LXC_RUNNER_TAG
     containers_path = '/var/lib/lxc/'
     default_container_name = os.environ.get('LETTUCE_LXC_DEFAULT', 'default')
     world_file_inner_path = '/root/world.dump'
@@ -63,7 +64,6 @@ class LXCRunner(object):
 
     def __init__(self):
         super(LXCRunner, self).__init__()
-        self.saved_runall = None
         self.container_name = None
         self.scenario = None
 
@@ -85,6 +85,24 @@ class LXCRunner(object):
         scenario_list = self.scenario.feature.scenarios
         return scenario_list.index(self.scenario) + 1
 
+    def run_all(self, scenario, steps, outline=None, run_callbacks=False,
+                ignore_case=True, failfast=False):
+        # if world dump file is presented, lettuce is runned in LXC
+        if os.path.exists(self.world_file_inner_path):
+            return core.Step.run_all(steps, outline, run_callbacks,
+                                     ignore_case, failfast)
+
+        for step in steps:
+            step.passed = True
+            step.ran = True
+
+        failed, skipped, passed = self.run_scenario(scenario)
+        return (steps,  # all
+                steps[:passed],  # passed
+                steps[passed:passed + failed],  # failed
+                [],  # undefined
+                [])  # reasons to fail
+
     def run_scenario(self, scenario):
         self.scenario = scenario
         self.setup_container()
@@ -216,37 +234,13 @@ class LXCRunner(object):
         print results
 
 
-lxc_runner = LXCRunner()
+lxc_runner = isolation.register(LXCRunner())
 
 
 @before.each_scenario
 def handle_lxc_tag_setup(scenario):
-    if LXC_RUNNER_TAG in scenario.tags:
+    if isolation.isolator_for(scenario) is lxc_runner:
         # if world dump file is presented, lettuce is runned in LXC
         # so we need to restore world
         if os.path.exists(lxc_runner.world_file_inner_path):
             lxc_runner.load_world(lxc_runner.world_file_inner_path)
-            return
-
-        for step in scenario.steps:
-            step.passed = True
-            step.run = lambda *args, **kwargs: True
-            step.ran = True
-
-        lxc_runner.saved_runall = core.Step.run_all
-
-        def run_all_mock(*args, **kwargs):
-            failed, skipped, passed = lxc_runner.run_scenario(scenario)
-            return (scenario.steps,  # all
-                    scenario.steps[:passed],  # passed
-                    scenario.steps[passed:passed + failed],  # failed
-                    [],              # undefined
-                    [])              # reasons to fail
-
-        core.Step.run_all = staticmethod(run_all_mock)
-
-
-@after.each_scenario
-def handle_lxc_tag_teardown(scenario):
-    if LXC_RUNNER_TAG in scenario.tags and not os.path.exists(lxc_runner.world_file_inner_path):
-        core.Step.run_all = staticmethod(lxc_runner.saved_runall)
@@ -57,3 +57,31 @@ class Reporter(object):
             total.steps,
             word,
             ", ".join(steps_details)))
+
+    def detach_failures(self):
+        """Forgets the failed scenarios stored so far, returning a
+        picklable list of (step, traceback) tuples describing them, so
+        that a process running features for a parallel run can hand them
+        over to the main process"""
+        failures = []
+        for scenario in self.failed_scenarios:
+            reason = self.scenarios_and_its_fails[scenario]
+            failures.append((reason.step.__repr__(), reason.traceback))
+
+        self.failed_scenarios = []
+        self.scenarios_and_its_fails = {}
+        return failures
+
+    def attach_failures(self, failures):
+        """Stores failures returned by detach_failures"""
+        for step, traceback in failures:
+            failure = DetachedFailure(step, traceback)
+            self.scenarios_and_its_fails[failure] = failure
+            self.failed_scenarios.append(failure)
+
+
+class DetachedFailure(object):
+    """A failed scenario, as reported by another process"""
+    def __init__(self, step, traceback):
+        self.step = step
+        self.traceback = traceback
@@ -39,10 +39,43 @@ def total_seconds(td):
     return (td.microseconds + (td.seconds + td.days * 24 * 3600) * 1e6) / 1e6
 
 
+# the <testsuite> element of the report being written
+testsuite = None
+
+
+def detach_testcases():
+    """Removes the test cases reported so far, returning them as XML
+    strings, so that a process running features for a parallel run can
+    hand them over to the main process"""
+    if testsuite is None:
+        return []
+
+    testcases = []
+    for testcase in list(testsuite.childNodes):
+        testcases.append(testcase.toxml())
+        testsuite.removeChild(testcase)
+
+    return testcases
+
+
+def attach_testcases(testcases):
+    """Appends test cases returned by detach_testcases to the report"""
+    if testsuite is None:
+        return
+
+    for testcase in testcases:
+        if isinstance(testcase, unicode):
+            testcase = testcase.encode('utf-8')
+
+        parsed = minidom.parseString(testcase).documentElement
+        testsuite.appendChild(testsuite.ownerDocument.importNode(parsed, True))
+
+
 def enable(filename=None):
+    global testsuite
 
     doc = minidom.Document()
-    root = doc.createElement("testsuite")
+    root = testsuite = doc.createElement("testsuite")
     root.setAttribute("name", "lettuce")
     root.setAttribute("hostname", "localhost")
     root.setAttribute("timestamp", datetime.now().strftime("%Y-%m-%dT%H:%M:%S"))
@@ -18,7 +18,21 @@ import os
 import threading
 import traceback
 
-world = threading.local()
+from lettuce import loop
+from lettuce import fixtures
+from lettuce.dispatch import StepIndex
+from lettuce.dispatch import compile_both
+
+class World(threading.local):
+    """Where steps and hooks keep what they share. Attributes it does not
+    have are looked up among the fixtures, see lettuce.fixtures"""
+    def __getattr__(self, name):
+        if name not in fixtures.FIXTURES:
+            raise AttributeError(name)
+
+        return fixtures.get(name)
+
+world = World()
 world._set = False
 
 
@@ -38,7 +52,87 @@ class CallbackDict(dict):
                 callback_list[:] = []
 
 
-STEP_REGISTRY = {}
+class StepDict(dict):
+    """Registry of step definitions, mapping regexes to functions.
+
+    Patterns are compiled as they are registered, and a dispatch index
+    is built over them the first time a sentence is matched after the
+    registry changed. Bindings of sentences to definitions are memoized
+    until then, so that each distinct sentence is resolved only once."""
+    def __init__(self, *args, **kw):
+        super(StepDict, self).__init__(*args, **kw)
+        self._compiled = {}
+        self._bindings = {}
+        self._index = None
+        for regex in self:
+            self._compile(regex)
+
+    def _compile(self, regex):
+        if regex not in self._compiled:
+            self._compiled[regex] = compile_both(regex)
+
+    def _changed(self):
+        self._index = None
+        self._bindings.clear()
+
+    def __setitem__(self, regex, func):
+        self._compile(regex)
+        super(StepDict, self).__setitem__(regex, func)
+        self._changed()
+
+    def __delitem__(self, regex):
+        super(StepDict, self).__delitem__(regex)
+        self._changed()
+
+    def update(self, *args, **kw):
+        for regex, func in dict(*args, **kw).items():
+            self[regex] = func
+
+    def setdefault(self, regex, func=None):
+        if regex not in self:
+            self[regex] = func
+
+        return self[regex]
+
+    def pop(self, *args):
+        self._changed()
+        return super(StepDict, self).pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super(StepDict, self).popitem()
+
+    def clear(self):
+        super(StepDict, self).clear()
+        self._compiled.clear()
+        self._changed()
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = StepIndex(self.items(), self._compiled)
+
+        return self._index
+
+    def match(self, sentence, ignore_case=True):
+        """Returns a tuple (matched, function) for the first step
+        definition whose regex is found on `sentence`, or (None, None)
+        """
+        key = (sentence, bool(ignore_case))
+        if key not in self._bindings:
+            self._bindings[key] = self.index.match(sentence, ignore_case)
+
+        return self._bindings[key]
+
+    def match_all(self, sentence, ignore_case=True):
+        """Returns a list of (regex, function) tuples for every step
+        definition whose regex is found on `sentence`, in the order
+        they would be tried"""
+        return [(regex, func) for matched, regex, func in
+                self.index.iter_matches(sentence, ignore_case)]
+
+
+STEP_REGISTRY = StepDict()
 CALLBACK_REGISTRY = CallbackDict(
     {
         'all': {
@@ -82,17 +176,55 @@ CALLBACK_REGISTRY = CallbackDict(
 )
 
 
+# set while scenarios run in many threads, so that the hooks they call
+# never run at once
+hooks_lock = None
+
+# a thread may set `dispatch.enter` and `dispatch.leave` to functions
+# called before and after each hook it dispatches, holding hooks_lock
+dispatch = threading.local()
+
+# the scope of fixtures ending with the hooks of each (kind, situation)
+ENDING_SCOPES = {
+    ('scenario', 'after_each'): fixtures.SCENARIO,
+    ('feature', 'after_each'): fixtures.FEATURE,
+    ('all', 'after'): fixtures.SESSION,
+}
+
+
 def call_hook(situation, kind, *args, **kw):
-    for callback in CALLBACK_REGISTRY[kind][situation]:
+    lock = hooks_lock
+    if lock:
+        lock.acquire()
+
+    try:
+        enter = getattr(dispatch, 'enter', None)
+        if enter:
+            enter()
+
         try:
-            callback(*args, **kw)
-        except Exception, e:
-            print "=" * 1000
-            traceback.print_exc(e)
-            print
-            raise
+            for callback in CALLBACK_REGISTRY[kind][situation]:
+                try:
+                    loop.complete(callback, callback(*args, **kw))
+                except Exception, e:
+                    print "=" * 1000
+                    traceback.print_exc(e)
+                    print
+                    raise
+        finally:
+            leave = getattr(dispatch, 'leave', None)
+            if leave:
+                leave()
+    finally:
+        if lock:
+            lock.release()
+
+        ending = ENDING_SCOPES.get((kind, situation))
+        if ending:
+            fixtures.leave(ending)
 
 
 def clear():
     STEP_REGISTRY.clear()
     CALLBACK_REGISTRY.clear()
+    fixtures.FIXTURES.clear()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Reusing the results of scenarios that passed.
+
+A scenario that passed is not run again while none of what it depends
+on changed: its own text, including the values of its examples, the
+background and the name and tags of its feature, the source of every
+module holding a step definition its steps match, and the source of the
+terrain. It is keyed by a digest of all of these, so any change to them
+runs it again. Scenarios tagged @nocache, or in a feature tagged so,
+always run.
+
+Lookups happen wherever scenarios run, from `current`, which the runner
+sets. The runner stores the scenarios that passed once the whole run is
+over, so that those that ran in other processes are stored too.
+"""
+import os
+import sys
+from copy import copy
+from itertools import chain
+
+import lettuce
+from lettuce.cache import Store, digest
+from lettuce.registry import STEP_REGISTRY
+
+NOCACHE = 'nocache'
+
+# the ResultCache to look scenarios up in, set by the runner
+current = None
+
+
+def source_filename(filename):
+    if filename.endswith(('.pyc', '.pyo')):
+        return filename[:-1]
+
+    return filename
+
+
+class ResultCache(Store):
+    """The results of the scenarios that passed, by path of feature file
+    and by scenario name, along with the key they passed with"""
+    filename = 'results.pickle'
+
+    def __init__(self, directory=None):
+        super(ResultCache, self).__init__(directory)
+        self.sources = {}
+
+    def source(self, filename):
+        """Returns the digest of the contents of `filename`, or None"""
+        filename = source_filename(os.path.abspath(filename))
+        if filename not in self.sources:
+            try:
+                stream = open(filename, 'rb')
+                try:
+                    self.sources[filename] = digest(stream.read())
+                finally:
+                    stream.close()
+            except IOError:
+                self.sources[filename] = None
+
+        return self.sources[filename]
+
+    def terrains(self):
+        """Returns the files of the terrain modules loaded so far"""
+        return [module.__file__ for name, module in sys.modules.items()
+                if module is not None and
+                name.split('.')[-1] == 'terrain' and
+                getattr(module, '__file__', None)]
+
+    def key(self, feature, scenario, ignore_case=True):
+        """Returns the key `scenario` of `feature` passes with, or None
+        when it has to run anyway"""
+        tags = list(feature.tags or []) + list(scenario.tags or [])
+        if NOCACHE in tags:
+            return None
+
+        steps = []
+        if feature.background:
+            steps.extend(feature.background.steps)
+
+        if scenario.outlines:
+            steps.extend(chain(*[solved for outline, solved
+                                 in scenario.evaluated]))
+        else:
+            steps.extend(scenario.steps)
+
+        text = [lettuce.version, feature.name, scenario.name] + tags
+        text.extend(scenario.remaining_lines or [])
+        text.extend([repr(sorted(outline.items()))
+                     for outline in scenario.outlines])
+
+        files = set(self.terrains())
+        for step in steps:
+            text.extend([step.sentence, repr(step.hashes), step.multiline])
+            matched, function = STEP_REGISTRY.match(step.sentence, ignore_case)
+            if function is None:
+                return None
+
+            files.add(function.func_code.co_filename)
+
+        for filename in sorted(files):
+            source = self.source(filename)
+            if source is None:
+                return None
+
+            text.extend([filename, source])
+
+        return digest(u'\0'.join(map(unicode, text)))
+
+    def get(self, feature, scenario, key):
+        """Returns copies of the results of `scenario` of `feature`, if it
+        passed with `key`, or None"""
+        passed = self.scenarios(feature.described_at.file).get(scenario.name)
+        if key is None or not passed or passed[0] != key:
+            return None
+
+        reused = []
+        for result in passed[1]:
+            result = copy(result)
+            result.cached = True
+            result.cache_key = key
+            reused.append(result)
+
+        return reused
+
+    def record(self, feature_results):
+        """Stores the results of the scenarios in `feature_results` that
+        ran and passed, replacing those of the same scenario"""
+        from lettuce.parallel import detach_scenario_result
+        if not self.path:
+            return
+
+        if self.entries is None:
+            self.load()
+
+        for feature_result in feature_results:
+            path = feature_result.feature.described_at.file
+            ran = {}
+            for result in feature_result.scenario_results:
+                if result.cache_key is not None and not result.cached:
+                    ran.setdefault((result.scenario.name, result.cache_key),
+                                   []).append(result)
+
+            scenarios = self.entries.setdefault(path, {})
+            for (name, key), results in ran.items():
+                if all(result.passed for result in results):
+                    detached = map(detach_scenario_result, results)
+                    for result in detached:
+                        result.duration = None
+
+                    scenarios[name] = (key, detached)
+                else:
+                    scenarios.pop(name, None)
+
+                self.changed = True
+
+        self.save()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Splitting a run across many independent invocations.
+
+`lettuce --shard K/N` runs the K-th of N shards of the selected
+scenarios. Every invocation computes the same split on its own: by a
+stable hash of the path of each feature file and of the name of each
+scenario, or, given the same durations file with --shard-durations, so
+that every shard should take about as long. Durations recorded in the
+cache of each machine are never used, as they may differ between them,
+which would have shards run some scenarios twice and others never. Each
+shard may save its results with
+`--results-file`, and `lettuce merge-results` sums them up into a single
+summary and xunit report.
+"""
+import os
+import cPickle as pickle
+
+import lettuce
+from lettuce.cache import digest
+from lettuce.history import History
+from lettuce.core import FeatureResult, TotalResult
+from lettuce.registry import call_hook
+from lettuce.parallel import detach_result, detach_reports, attach_reports
+
+
+def parse_shard(string):
+    """Returns a tuple (number, count) from a string 'K/N', where K is
+    the number of a shard, from 1 to N. Raises ValueError"""
+    number, count = map(int, string.split('/'))
+    if not 0 < number <= count:
+        raise ValueError('the shard %s is not one of 1/%d to %d/%d' % (
+            string, count, count, count))
+
+    return number, count
+
+
+def stable_hash(path, name):
+    return int(digest(u'%s\0%s' % (path, name))[:8], 16)
+
+
+def partition(keys, count, estimates=None):
+    """Returns the shard, from 0 to `count` - 1, of each of `keys`, which
+    are tuples (path of a feature file, name of a scenario). Given how
+    long each one should take, they go longest first to the shard with
+    the least to do so far, or else by stable hash"""
+    if estimates is None:
+        return [stable_hash(*key) % count for key in keys]
+
+    shards = [None] * len(keys)
+    loads = [0.0] * count
+    for number in sorted(range(len(keys)),
+                         key=lambda number: (-estimates[number], keys[number])):
+        shard = min(range(count), key=lambda shard: (loads[shard], shard))
+        shards[number] = shard
+        loads[shard] += estimates[number]
+
+    return shards
+
+
+def shared_history(filename):
+    """Returns the History of durations kept in `filename`, such as a
+    copy of .lettuce_cache/durations.pickle shared by every shard"""
+    filename = os.path.abspath(filename)
+    history = History(os.path.dirname(filename))
+    history.filename = os.path.basename(filename)
+    return history
+
+
+def select_shard(runner, features_files, features):
+    """Keeps the scenarios of `features` in the shard `runner.shard`
+    among those selected by `runner.scenarios` and `runner.tags`,
+    dropping the features with none. Features without any selected
+    scenario, whose hooks run all the same, go to a single shard.
+
+    Returns the feature files and the features of that shard"""
+    number, count = runner.shard
+    features = list(features)
+    selections = [feature.select_scenarios(runner.scenarios, runner.tags)
+                  for feature in features]
+
+    base_dir = runner.loader.base_dir
+    keys = []
+    for filename, selected in zip(features_files, selections):
+        path = os.path.relpath(os.path.abspath(filename), base_dir)
+        keys.extend([(path, scenario.name) for scenario in selected] or
+                    [(path, u'')])
+
+    estimates = None
+    history = runner.shard_durations and \
+        shared_history(runner.shard_durations)
+    per_step = history and history.seconds_per_step()
+    if per_step is not None:
+        estimates = []
+        for feature, selected in zip(features, selections):
+            estimates.extend([history.estimate(feature, scenario, per_step)
+                              for scenario in selected] or [0.0])
+
+    shards = iter(partition(keys, count, estimates))
+    kept_files = []
+    kept = []
+    for filename, feature, selected in zip(features_files, features,
+                                           selections):
+        if selected:
+            feature.scenarios = [scenario for scenario in selected
+                                 if shards.next() == number - 1]
+            keep = bool(feature.scenarios)
+        else:
+            keep = shards.next() == number - 1
+
+        if keep:
+            kept_files.append(filename)
+            kept.append(feature)
+
+    return kept_files, kept
+
+
+def save_results(filename, results):
+    """Writes the results of each feature and what the output plugins
+    reported about them to `filename`"""
+    stream = open(filename, 'wb')
+    try:
+        pickle.dump((lettuce.version, map(detach_result, results),
+                     detach_reports()), stream, pickle.HIGHEST_PROTOCOL)
+    finally:
+        stream.close()
+
+
+def load_results(filename):
+    """Returns a tuple (results, reports) written by `save_results`.
+    Raises ValueError when written by another version of lettuce"""
+    stream = open(filename, 'rb')
+    try:
+        version, results, reports = pickle.load(stream)
+    finally:
+        stream.close()
+
+    if version != lettuce.version:
+        raise ValueError('%s was written by lettuce %s, not %s' % (
+            filename, version, lettuce.version))
+
+    return results, reports
+
+
+def merge_results(filenames, stores=()):
+    """Hands the results saved in `filenames` over to the output plugins
+    registered so far, as if they came from a single run, and returns
+    their TotalResult. The scenarios a feature ran in many shards are
+    put back together, in the order they are written in, and recorded
+    in each of `stores`, such as the History of durations"""
+    features = {}
+    for filename in filenames:
+        results, reports = load_results(filename)
+        attach_reports(reports)
+        for result in results:
+            path = result.feature.described_at.file
+            if path not in features:
+                features[path] = (result.feature, [])
+
+            features[path][1].extend(result.scenario_results)
+
+    merged = []
+    for path in sorted(features):
+        feature, scenario_results = features[path]
+        scenario_results.sort(
+            key=lambda result: result.scenario.described_at.line)
+        merged.append(FeatureResult(feature, *scenario_results))
+
+    for store in stores:
+        store.record(merged)
+
+    total = TotalResult(merged)
+    call_hook('after', 'all', total)
+    return total
@@ -184,3 +184,27 @@ def parse_multiline(lines):
                 line = line[:-1]
             multilines.append(line)
     return u'\n'.join(multilines)
+
+
+def compile_template(string, keys):
+    """Splits `string` on the <placeholders> named after `keys`, into a
+    list alternating literal text and placeholder names, so that it can
+    be rendered by render_template with a single join"""
+    if not keys or u'<' not in string:
+        return [string]
+
+    names = sorted(keys, key=len, reverse=True)
+    regex = u'<(%s)>' % u'|'.join([re.escape(unicode(k)) for k in names])
+    return re.split(regex, unicode(string))
+
+
+def render_template(template, data):
+    if len(template) == 1:
+        return template[0]
+
+    parts = template[:]
+    for index in range(1, len(parts), 2):
+        key = parts[index]
+        parts[index] = unicode(data.get(key, u'<%s>' % key))
+
+    return u''.join(parts)
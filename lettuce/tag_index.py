@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import codecs
+
+from lettuce import cache
+from lettuce import parser
+from lettuce.core import Language, matches_tags
+
+
+class TagIndex(cache.Store):
+    """Index of the tags of each scenario of a suite.
+
+    The tags of a feature file are found by a scan of its header lines,
+    much cheaper than parsing it, and persisted under the cache
+    directory, so that a feature file is only opened again once its
+    size or modification time change.
+    """
+    filename = 'tags.pickle'
+
+    def scenarios_tags(self, filename):
+        """Returns the tags of each scenario of `filename`, including
+        those inherited from its feature, or None if they could not be
+        found"""
+        if self.entries is None:
+            self.load()
+
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        # what the scan finds changes along with the parser
+        key = (stat.st_size, stat.st_mtime, cache.FORMAT)
+
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != key:
+            f = codecs.open(filename, "r", "utf-8")
+            string = f.read()
+            f.close()
+
+            language = Language.guess_from_string(string)
+            entry = (key, parser.scan_tags(string, language))
+            self.entries[path] = entry
+            self.changed = True
+
+        scanned = entry[1]
+        if scanned is None:
+            return None
+
+        feature_tags, scenarios = scanned
+        return [scenario_tags + feature_tags for scenario_tags in scenarios]
+
+    def select(self, filenames, tags):
+        """Returns the feature files in `filenames` that have scenarios
+        selected by `tags`. Files whose tags are unknown are kept, so
+        that parsing them reports what is wrong with them"""
+        selected = []
+        for filename in filenames:
+            found = self.scenarios_tags(filename)
+            if found is None or \
+               any([matches_tags(scenario_tags, tags)
+                    for scenario_tags in found]):
+                selected.append(filename)
+
+        self.save()
+        return selected
+
+    def tagged(self, filenames):
+        """Returns a dict mapping each tag to a list of (filename,
+        position) tuples, one per scenario tagged with it, where
+        `position` is the 1-based index of the scenario within its
+        feature, as given to `-s`"""
+        found = {}
+        for filename in filenames:
+            for index, scenario_tags in enumerate(
+                    self.scenarios_tags(filename) or []):
+                for tag in set(scenario_tags):
+                    found.setdefault(tag, []).append((filename, index + 1))
+
+        self.save()
+        return found
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running scenarios in many threads.
+
+Meant for scenarios that mostly wait on the network or on other
+processes: they run at once in a pool of threads within this process,
+instead of forking a process for each worker. Each thread gets its own
+`world`, starting as a copy of the one the terrain set up, and runs the
+feature hooks the first time it gets a scenario of a feature, like the
+processes of `parallel.run_scenarios` do.
+
+While the threads run, hooks are called one at a time, and what each
+scenario prints and reports is kept aside, then handed over in the order
+of the features and scenarios, as if they ran one after another.
+"""
+import sys
+import Queue
+import traceback
+import threading
+from StringIO import StringIO
+
+from lettuce import registry
+from lettuce.registry import world, call_hook
+from lettuce.parallel import reporters, select_scenarios, merge_scenarios, \
+    schedule
+from lettuce.plugins import xunit_output
+
+
+class ThreadOutput(object):
+    """Stands for sys.stdout, sending what each thread prints to the
+    buffer it is capturing into, if any"""
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def __getattr__(self, attr):
+        return getattr(self.stdout, attr)
+
+    def capture(self, buffer):
+        self.local.buffer = buffer
+
+    def write(self, string):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            buffer = self.stdout
+
+        buffer.write(string)
+
+
+class Reports(object):
+    """What the output plugins reported while running a scenario in a
+    thread, kept apart from what they reported about other scenarios.
+
+    The failures stored by each reporter are swapped in while the thread
+    dispatches a hook, and swapped out afterwards, along with the test
+    cases that hook added to the xunit report."""
+    def __init__(self, reporters):
+        self.reporters = reporters
+        self.failures = [([], {}) for reporter in reporters]
+        self.testcases = []
+
+    def swap(self, failures):
+        previous = []
+        for reporter, (failed, fails) in zip(self.reporters, failures):
+            previous.append((reporter.failed_scenarios,
+                             reporter.scenarios_and_its_fails))
+            reporter.failed_scenarios = failed
+            reporter.scenarios_and_its_fails = fails
+
+        return previous
+
+    def enter(self):
+        self.saved = self.swap(self.failures)
+        if xunit_output.testsuite is not None:
+            self.reported = len(xunit_output.testsuite.childNodes)
+
+    def leave(self):
+        self.failures = self.swap(self.saved)
+        testsuite = xunit_output.testsuite
+        if testsuite is not None:
+            for testcase in testsuite.childNodes[self.reported:]:
+                testsuite.removeChild(testcase)
+                self.testcases.append(testcase)
+
+    def attach(self):
+        """Hands these reports over to the output plugins"""
+        for reporter, (failed, fails) in zip(self.reporters, self.failures):
+            reporter.failed_scenarios.extend(failed)
+            reporter.scenarios_and_its_fails.update(fails)
+
+        for testcase in self.testcases:
+            xunit_output.testsuite.appendChild(testcase)
+
+
+class ScenarioThreads(object):
+    """Runs the scenarios of `features` at the 1-based indices
+    `scenarios` (all when None) in `runner.threads` threads"""
+    def __init__(self, runner, features, scenarios):
+        self.runner = runner
+        self.features = list(features)
+        self.selections, self.units = select_scenarios(
+            runner, self.features, scenarios)
+
+        self.local = threading.local()
+        self.stopped = threading.Event()
+        self.queue = Queue.Queue()
+        for position in schedule(
+                runner, *runner.history.estimate_units(
+                    self.features, self.selections, self.units),
+                workers=min(runner.threads, len(self.units))):
+            self.queue.put(position)
+
+        died = ('', '', [], Reports([]), ('Died in a thread', ''))
+        self.results = [died] * len(self.units)
+        self.done = [threading.Event() for unit in self.units]
+
+    def enter(self):
+        self.local.reports.enter()
+
+    def leave(self):
+        self.local.reports.leave()
+
+    def finish_feature(self):
+        """Calls the after.each_feature hooks of the feature whose
+        scenarios this thread was running, discarding what they print"""
+        running = getattr(self.local, 'running', None)
+        if running is None:
+            return
+
+        self.local.running = None
+        self.local.reports = Reports(self.reporters)
+        self.output.capture(StringIO())
+        try:
+            call_hook('after_each', 'feature', self.features[running])
+        finally:
+            self.output.capture(None)
+
+    def run_unit(self, unit):
+        """Runs a scenario in this thread, given a tuple (index of its
+        feature, position among the scenarios selected in that
+        feature), calling the feature hooks first unless this thread
+        already ran a scenario of that feature and it is not the first
+        one of the feature. A position of None only calls them.
+
+        Returns a tuple (output of the feature hooks, output of the
+        scenario, results, reports, error), where error is a tuple
+        (message, traceback) when running the scenario blew up"""
+        index, position = unit
+        feature = self.features[index]
+        header = StringIO()
+        captured = StringIO()
+        reports = Reports(self.reporters)
+        results = error = None
+        try:
+            starting = getattr(self.local, 'running', None) != index or \
+                not position
+            if starting:
+                self.finish_feature()
+
+            self.local.reports = reports
+            if starting:
+                self.output.capture(header)
+                call_hook('before_each', 'feature', feature)
+                self.local.running = index
+                # background steps hold how they ran, so each thread
+                # runs its own copy of them
+                self.local.background = \
+                    feature.background and feature.background.clone()
+
+            self.output.capture(captured)
+            results = []
+            if position is not None:
+                scenario = self.selections[index][position]
+                scenario.background = self.local.background
+                results = feature.run_scenario(
+                    scenario, failfast=self.runner.failfast,
+                    background=scenario.background)
+        except Exception, e:
+            error = (str(e), traceback.format_exc())
+        finally:
+            self.output.capture(None)
+
+        return header.getvalue(), captured.getvalue(), results, reports, error
+
+    def work(self):
+        world.__dict__.update(self.world)
+        registry.dispatch.enter = self.enter
+        registry.dispatch.leave = self.leave
+        try:
+            while not self.stopped.is_set():
+                try:
+                    position = self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+
+                try:
+                    self.results[position] = self.run_unit(
+                        self.units[position])
+                finally:
+                    self.done[position].set()
+        finally:
+            self.finish_feature()
+            registry.dispatch.enter = registry.dispatch.leave = None
+
+    def attach(self, reports):
+        registry.hooks_lock.acquire()
+        try:
+            reports.attach()
+        finally:
+            registry.hooks_lock.release()
+
+    def wait(self, position):
+        # waiting with a timeout lets KeyboardInterrupt through
+        while not self.done[position].wait(0.5):
+            pass
+
+        return self.results[position]
+
+    def run(self):
+        """Yields the result of each feature, in order. Raises
+        WorkerFailed like running them in this thread would"""
+        self.world = dict(world.__dict__)
+        self.reporters = reporters()
+        self.output = sys.stdout = ThreadOutput(sys.stdout)
+        registry.hooks_lock = threading.RLock()
+        threads = [threading.Thread(target=self.work)
+                   for count in range(min(self.runner.threads,
+                                          len(self.units)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            outcomes = (self.wait(count) for count in range(len(self.units)))
+            for result in merge_scenarios(self.runner, self.features,
+                                          self.selections, self.units,
+                                          outcomes, attach=self.attach,
+                                          report=lambda feature: feature):
+                yield result
+        finally:
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+            sys.stdout = self.output.stdout
+            registry.hooks_lock = None
+
+
+def run_scenarios(runner, features, scenarios):
+    """Runs the scenarios of the given features in `runner.threads`
+    threads, yielding the result of each feature in the same order"""
+    return ScenarioThreads(runner, features, scenarios).run()
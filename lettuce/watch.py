@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Running features again as they, or their step definitions, change.
+
+The step definitions are loaded once and kept loaded. The feature files
+and the step definition modules are polled for changes, and only the
+modules that changed are loaded again, after their step definitions and
+hooks are taken out of the registries. Then only the features that
+changed, and those with a step bound to a module that changed, before
+or after loading it again, are run again. A change to a module holding
+hooks, like the terrain, runs every feature again.
+"""
+import os
+import sys
+import time
+import traceback
+
+from lettuce.core import Feature
+from lettuce.registry import STEP_REGISTRY, CALLBACK_REGISTRY
+from lettuce.result_cache import source_filename
+
+
+def module_filename(function):
+    """Returns the source file `function` was defined in, or None"""
+    code = getattr(function, 'func_code', None)
+    if code is None:
+        return None
+
+    return source_filename(os.path.abspath(code.co_filename))
+
+
+def callbacks():
+    for actions in CALLBACK_REGISTRY.values():
+        for functions in actions.values():
+            yield functions
+
+
+def has_hooks(filename):
+    """Tells whether a hook defined in `filename` is registered"""
+    return any(module_filename(function) == filename
+               for functions in callbacks() for function in functions)
+
+
+def forget(filename):
+    """Takes the step definitions and hooks defined in `filename` out of
+    the registries"""
+    for regex, function in STEP_REGISTRY.items():
+        if module_filename(function) == filename:
+            del STEP_REGISTRY[regex]
+
+    for functions in callbacks():
+        functions[:] = [function for function in functions
+                        if module_filename(function) != filename]
+
+
+def stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+
+    return stat.st_mtime, stat.st_size
+
+
+class Watcher(object):
+    """Runs the features of `runner` again whenever they, or the step
+    definitions they use, change, checking every `interval` seconds"""
+    def __init__(self, runner, interval=1.0):
+        self.runner = runner
+        self.interval = interval
+        self.stamps = {}
+
+    def features_files(self):
+        return self.runner.find_feature_files()
+
+    def modules_files(self):
+        return [source_filename(os.path.abspath(filename))
+                for filename in self.runner.loader.find_step_definitions()]
+
+    def snapshot(self):
+        """Returns the feature files and modules that changed, appeared
+        or went away since the last call"""
+        features = []
+        modules = []
+        found = [(filename, features) for filename in self.features_files()]
+        found += [(filename, modules) for filename in self.modules_files()]
+
+        stamps = {}
+        for filename, changed in found:
+            stamps[filename] = stamp(filename)
+            if self.stamps.get(filename) != stamps[filename]:
+                changed.append(filename)
+
+        modules.extend([filename for filename in self.stamps
+                        if filename not in stamps and
+                        filename.endswith('.py')])
+        self.stamps = stamps
+        return features, modules
+
+    def bindings(self, features_files):
+        """Returns the modules each of the given feature files has a step
+        bound to, by feature file"""
+        bound = {}
+        for filename in features_files:
+            try:
+                feature = Feature.from_file(filename,
+                                            cache=self.runner.parse_cache)
+            except Exception:
+                # it will be run again, to report what is wrong with it
+                bound[filename] = None
+                continue
+
+            steps = []
+            if feature.background:
+                steps.extend(feature.background.steps)
+
+            for scenario in feature.scenarios:
+                if scenario.outlines:
+                    for outline, solved in scenario.evaluated:
+                        steps.extend(solved)
+                else:
+                    steps.extend(scenario.steps)
+
+            bound[filename] = set()
+            for step in steps:
+                matched, function = STEP_REGISTRY.match(step.sentence)
+                if function is not None:
+                    bound[filename].add(module_filename(function))
+
+        return bound
+
+    def reload(self, modules):
+        """Loads the given modules again, or forgets those that went away,
+        returning False if any of them could not be loaded"""
+        loaded = True
+        for filename in modules:
+            forget(filename)
+            if not os.path.exists(filename):
+                continue
+
+            try:
+                self.runner.loader.load_step_definitions(filename)
+            except Exception:
+                print "Error loading step definitions:\n"
+                traceback.print_exc()
+                loaded = False
+
+        return loaded
+
+    def affected(self, features, modules):
+        """Loads the changed `modules` again, and returns the feature files
+        to run again, in order: those in `features` and those with a step
+        bound to any of `modules`. Returns None if any of `modules` could
+        not be loaded"""
+        features_files = self.features_files()
+        if not modules:
+            return [filename for filename in features_files
+                    if filename in features]
+
+        everything = any(has_hooks(filename) for filename in modules)
+        before = self.bindings(features_files)
+        if not self.reload(modules):
+            return None
+
+        everything = everything or \
+            any(has_hooks(filename) for filename in modules)
+        if everything:
+            return features_files
+
+        after = self.bindings(features_files)
+        modules = set(modules)
+
+        def changed(filename):
+            if filename in features:
+                return True
+
+            bound = (before[filename] or set()) | (after[filename] or set())
+            return before[filename] is None or bool(bound & modules)
+
+        return filter(changed, features_files)
+
+    def run(self, features_files=None):
+        if features_files is not False:
+            try:
+                self.runner.run(features_files, load_steps=False)
+            except SystemExit:
+                pass
+
+        print
+        print "(watching for changes, press Ctrl-C to stop)"
+
+    def watch(self):
+        """Runs every feature, then runs again those affected by each
+        change, until interrupted"""
+        self.snapshot()
+        try:
+            loaded = self.reload(self.modules_files())
+            self.run(None if loaded else False)
+            while True:
+                time.sleep(self.interval)
+                features, modules = self.snapshot()
+                if not features and not modules:
+                    continue
+
+                features_files = self.affected(features, modules)
+                if features_files is None:
+                    self.run(False)
+                elif features_files:
+                    self.run(features_files)
+        except KeyboardInterrupt:
+            print
+            sys.exit(0)
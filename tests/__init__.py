@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import tempfile
+
+# what the runs of the tests cache, like the durations of their
+# scenarios, goes to a temporary directory instead of the working one
+cache_directory = []
+
+
+def setup_package():
+    cache_directory.append(tempfile.mkdtemp())
+    os.environ['LETTUCE_CACHE_DIR'] = cache_directory[-1]
+
+
+def teardown_package():
+    del os.environ['LETTUCE_CACHE_DIR']
+    shutil.rmtree(cache_directory.pop(), ignore_errors=True)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures how long a feature with a slow background takes to run.
+
+Usage::
+
+    python tests/benchmarks/background_once.py [scenarios ...]
+
+For each size it generates a feature with that many scenarios, and a
+background taking a tenth of a second, and prints the time taken to run
+it as usual, next to the time taken when it is tagged @background_once,
+so that its background only runs for the first scenario.
+"""
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from lettuce import step, world
+from lettuce.core import Feature
+
+SCENARIO = u'''
+  Scenario: Ordering item %(index)d
+    When I order item %(index)d
+    Then I have 1 order
+'''
+
+
+@step(u'a catalog that takes a while to set up')
+def set_up_catalog(step):
+    time.sleep(0.1)
+    world.orders = []
+
+
+@step(u'I order item (\d+)')
+def order(step, index):
+    world.orders.append(index)
+
+
+@step(u'I have (\d+) orders?')
+def count_orders(step, count):
+    assert len(world.orders) == int(count), world.orders
+
+
+def generate(scenarios, tags=u''):
+    parts = [u'%s\n'
+             u'Feature: A generated feature with a slow background\n'
+             u'\n'
+             u'  Background:\n'
+             u'    Given a catalog that takes a while to set up\n' % tags]
+    for index in range(scenarios):
+        parts.append(SCENARIO % {'index': index})
+
+    return u''.join(parts)
+
+
+def measure(string):
+    feature = Feature.from_string(string)
+    started = time.time()
+    result = feature.run()
+    took = time.time() - started
+    assert result.passed
+    return took
+
+
+def main(sizes):
+    print '%10s %12s %12s' % ('scenarios', 'always (s)', 'once (s)')
+    for size in sizes:
+        always_took = measure(generate(size))
+        once_took = measure(generate(size, u'@background_once'))
+        print '%10d %12.3f %12.3f' % (size, always_took, once_took)
+
+
+if __name__ == '__main__':
+    main(map(int, sys.argv[1:]) or [5, 20, 80])
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures the time and memory taken to expand big scenario outlines.
+
+Usage::
+
+    python tests/benchmarks/expand_outlines.py [rows ...]
+
+For each size it builds a scenario outline with that many rows of
+examples, expands every step of every row the way running it does, and
+prints the time taken and how much the resident memory grew, next to
+the same figures for a copy.deepcopy of each step, which is how
+outlines used to be expanded (leaving out the copy of the whole
+scenario each step used to carry along).
+
+Each measure runs in a forked process, so that memory freed by a
+previous one does not hide what the next one takes.
+"""
+import os
+import sys
+import time
+from copy import deepcopy
+
+sys.path.insert(0, '.')
+
+from lettuce.core import Feature
+
+OUTLINE = u'''
+Feature: A big generated outline
+  Scenario Outline: Registering user <name>
+    Given I have the following users:
+      | name   | email           | role   |
+      | <name> | <name>@mail.com | admin  |
+      | other  | other@mail.com  | <role> |
+    When I register <name> as <role>
+    Then I see <name> on the list of <role> users
+
+  Examples:
+    | name | role |
+'''
+
+
+def generate(rows):
+    return OUTLINE + u''.join([u'    | user%d | role%d |\n' % (row, row % 7)
+                               for row in range(rows)])
+
+
+def clone_with_deepcopy(step, data):
+    sentence = step.sentence
+    hashes = step.hashes[:]
+    for k, v in data.items():
+
+        def evaluate(stuff):
+            return stuff.replace(u'<%s>' % unicode(k), unicode(v))
+
+        def evaluate_hash_value(hash_row):
+            new_row = {}
+            for rkey, rvalue in hash_row.items():
+                new_row[rkey] = evaluate(rvalue)
+            return new_row
+
+        sentence = evaluate(sentence)
+        hashes = map(evaluate_hash_value, hashes)
+
+    # leaving the scenario out of the copy, or each step would carry a
+    # copy of every row of the outline
+    new = deepcopy(step, {id(step.scenario): step.scenario})
+    new.sentence = sentence
+    new.hashes = hashes
+    return new
+
+
+def expand(scenario, clone):
+    return [clone(step, outline)
+            for outline in scenario.outlines
+            for step in scenario.steps]
+
+
+def resident_memory():
+    statm = open('/proc/self/statm')
+    pages = int(statm.read().split()[1])
+    statm.close()
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(scenario, clone):
+    reading, writing = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(reading)
+        before = resident_memory()
+        started = time.time()
+        expanded = expand(scenario, clone)
+        took = time.time() - started
+        grown = resident_memory() - before
+        os.write(writing, '%f %d' % (took, grown))
+        os._exit(0)
+
+    os.close(writing)
+    took, grown = os.read(reading, 100).split()
+    os.close(reading)
+    os.waitpid(pid, 0)
+    return float(took), int(grown) / 1024.0 / 1024
+
+
+def main(sizes):
+    print '%8s %12s %12s %14s %14s' % (
+        'rows', 'views (s)', 'views (MB)', 'deepcopy (s)', 'deepcopy (MB)')
+    for size in sizes:
+        scenario = Feature.from_string(generate(size)).scenarios[0]
+        scenario.steps, scenario.outlines
+        views = measure(scenario, lambda step, data: step.solve_and_clone(data))
+        copies = measure(scenario, clone_with_deepcopy)
+        print '%8d %12.3f %12.1f %14.3f %14.1f' % ((size,) + views + copies)
+
+
+if __name__ == '__main__':
+    main(map(int, sys.argv[1:]) or [100, 1000, 10000])
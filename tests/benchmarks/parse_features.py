@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures how long lettuce takes to parse big feature files.
+
+Usage::
+
+    python tests/benchmarks/parse_features.py [scenarios ...]
+
+For each size it generates a feature with that many scenarios (steps,
+tables, multiline strings, tags and outlines included) and prints the
+time taken by the line-oriented parser used by Feature.from_string,
+next to the time taken by the previous, regex based, parsing that is
+still done when a Feature is built from its remaining lines.
+"""
+import re
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from lettuce import strings
+from lettuce.core import Feature, Language
+
+SCENARIO = u'''
+  @tag%(index)d @slow
+  Scenario: Doing thing number %(index)d
+    Given I have %(index)d items in my shelf:
+      | name  | description        |
+      | Glass | a glass %(index)d  |
+      | Pasta | a pasta %(index)d  |
+    When I read the following text:
+      """
+      some text for scenario %(index)d
+      """
+    Then I see %(index)d items # a comment
+    And I see it all
+
+  Scenario Outline: Adding <a> and <b> %(index)d
+    Given I have entered <a> into the calculator
+    And I have entered <b> into the calculator
+    When I press add
+    Then the result should be <c> on the screen
+
+  Examples:
+    | a | b | c  |
+    | 1 | 2 | 3  |
+    | 4 | 5 | 9  |
+'''
+
+
+def generate(scenarios):
+    parts = [u'Feature: A big generated feature\n'
+             u'  In order to measure the parser\n'
+             u'  As a lettuce developer\n'
+             u'  I want a very big feature\n'
+             u'\n'
+             u'  Background:\n'
+             u'    Given the database is clean\n']
+    for index in range(scenarios / 2):
+        parts.append(SCENARIO % {'index': index})
+
+    return u''.join(parts)
+
+
+def parse_with_regexes(string, filename):
+    language = Language()
+    lines = strings.get_stripped_lines(string, ignore_lines_starting_with='#')
+    while not re.search(r'(?:%s):(.*)' % language.feature, lines[0], re.I):
+        lines.pop(0)
+
+    name = re.search(r'(?:%s):(.*)' % language.feature, lines[0], re.I)
+    return Feature(name=name.group(1).strip(),
+                   remaining_lines=lines,
+                   with_file=filename,
+                   original_string=string,
+                   language=language)
+
+
+def measure(function, *args):
+    started = time.time()
+    function(*args)
+    return time.time() - started
+
+
+def main(sizes):
+    filename = 'generated.feature'
+    print '%10s %10s %12s %12s' % ('scenarios', 'lines', 'parser (s)',
+                                   'regexes (s)')
+    for size in sizes:
+        string = generate(size)
+        parser_took = measure(Feature.from_string, string, filename)
+        regexes_took = measure(parse_with_regexes, string, filename)
+        print '%10d %10d %12.3f %12.3f' % (
+            size, len(string.splitlines()), parser_took, regexes_took)
+
+
+if __name__ == '__main__':
+    main(map(int, sys.argv[1:]) or [100, 400, 1600])
@@ -0,0 +1,16 @@
+@share_prefixes
+Feature: Shared steps in threads
+  Scenario: Pay by card
+    Given I fill a cart
+    When I pay by card
+    Then the cart is paid
+
+  Scenario: Pay on delivery
+    Given I fill a cart
+    When I pay on delivery
+    Then the cart is paid
+
+  Scenario: Pay later
+    Given I fill a cart
+    When I pay later
+    Then the cart is paid
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import os
+from lettuce import step, world
+
+@step(u'I fill a cart')
+def fill_cart(step):
+    with open(os.environ['LETTUCE_SHARED_STEPS'], 'a') as ran:
+        ran.write('%s\n' % step.sentence)
+    world.cart = 'full'
+
+@step(u'I pay (.+)')
+def pay(step, how):
+    assert world.cart == 'full'
+    world.paid = how
+
+@step(u'the cart is paid')
+def cart_is_paid(step):
+    assert world.paid
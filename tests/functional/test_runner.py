@@ -15,7 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import re
+import sys
 import random
+import shutil
+import socket
+import tempfile
+import subprocess
 import lettuce
 from mock import Mock, patch
 from sure import expect
@@ -26,6 +32,8 @@ from lettuce.fs import FeatureLoader
 from lettuce.core import Feature, fs, StepDefinition
 from lettuce.terrain import world
 from lettuce import Runner
+from lettuce import sharding
+from lettuce.history import History
 
 from tests.asserts import assert_lines
 from tests.asserts import prepare_stderr
@@ -1112,6 +1120,259 @@ def test_run_only_fast_tests():
     )
 
 
+@with_setup(prepare_stdout)
+def test_processes_run_features_like_a_single_process():
+    "Running features in many processes prints and totals the same"
+
+    def run(processes):
+        prepare_stdout()
+        runner = Runner(ojoin(), verbosity=3, processes=processes)
+        total = runner.run()
+        output = sys.stdout.getvalue()
+        return re.sub(r'[(](finished|predicted) .*[)]\n', '', output), total
+
+    serial_output, serial = run(1)
+    parallel_output, parallel = run(3)
+
+    assert_lines(parallel_output, serial_output)
+    for attribute in ['features_ran', 'features_passed', 'scenarios_ran',
+                      'scenarios_passed', 'steps', 'steps_passed',
+                      'steps_failed', 'steps_skipped', 'steps_undefined']:
+        assert_equals(getattr(parallel, attribute),
+                      getattr(serial, attribute))
+
+    assert_equals(
+        [step.proposed_sentence for step in parallel.proposed_definitions],
+        [step.proposed_sentence for step in serial.proposed_definitions])
+
+
+def test_processes_by_scenario_run_features_like_a_single_process():
+    "Running the scenarios of features in many processes prints and totals the same"
+
+    def run(**kw):
+        prepare_stdout()
+        runner = Runner(ojoin('many_successful_scenarios'), verbosity=3, **kw)
+        total = runner.run()
+        output = sys.stdout.getvalue()
+        return re.sub(r'[(](finished|predicted) .*[)]\n', '', output), total
+
+    serial_output, serial = run()
+    parallel_output, parallel = run(processes=3, by_scenario=True)
+
+    assert_lines(parallel_output, serial_output)
+    assert_equals(
+        [scenario_result.scenario.name
+         for scenario_result in parallel.feature_results[0].scenario_results],
+        [scenario_result.scenario.name
+         for scenario_result in serial.feature_results[0].scenario_results])
+    for attribute in ['features_ran', 'features_passed', 'scenarios_ran',
+                      'scenarios_passed', 'steps', 'steps_passed']:
+        assert_equals(getattr(parallel, attribute),
+                      getattr(serial, attribute))
+
+
+def test_threads_run_features_like_a_single_thread():
+    "Running the scenarios of features in many threads prints and totals the same"
+
+    def run(threads):
+        prepare_stdout()
+        runner = Runner(ojoin('many_successful_scenarios'), verbosity=3,
+                        threads=threads)
+        total = runner.run()
+        output = sys.stdout.getvalue()
+        return re.sub(r'[(](finished|predicted) .*[)]\n', '', output), total
+
+    serial_output, serial = run(1)
+    threaded_output, threaded = run(3)
+
+    assert_lines(threaded_output, serial_output)
+    assert_equals(
+        [scenario_result.scenario.name
+         for scenario_result in threaded.feature_results[0].scenario_results],
+        [scenario_result.scenario.name
+         for scenario_result in serial.feature_results[0].scenario_results])
+    for attribute in ['features_ran', 'features_passed', 'scenarios_ran',
+                      'scenarios_passed', 'steps', 'steps_passed']:
+        assert_equals(getattr(threaded, attribute),
+                      getattr(serial, attribute))
+
+
+def test_threads_share_the_first_steps_of_the_scenarios_they_run():
+    "Scenarios tagged @share_prefixes share their first steps in threads too"
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+    os.environ['LETTUCE_SHARED_STEPS'] = filename
+    try:
+        prepare_stdout()
+        runner = Runner(ojoin('shared_prefixes'), verbosity=1, threads=2)
+        total = runner.run()
+        with open(filename) as ran:
+            sentences = ran.read().splitlines()
+    finally:
+        del os.environ['LETTUCE_SHARED_STEPS']
+        os.remove(filename)
+
+    assert_equals(total.scenarios_passed, 3)
+    assert_equals(sentences, ['Given I fill a cart'])
+
+
+def test_coordinator_prints_and_totals_what_workers_ran():
+    "Scenarios handed out to workers on localhost print and total the same"
+
+    listening = socket.socket()
+    listening.bind(('localhost', 0))
+    port = listening.getsockname()[1]
+    listening.close()
+
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(
+        [dirname(lettuce_dir)] + sys.path)
+    workers = [subprocess.Popen(
+        [sys.executable, '-c', 'from lettuce import bin; bin.main()',
+         '--worker', 'localhost:%d' % port,
+         ojoin('many_successful_scenarios')],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=environment)
+        for count in range(2)]
+
+    def run(**kw):
+        prepare_stdout()
+        runner = Runner(ojoin('many_successful_scenarios'), verbosity=3, **kw)
+        total = runner.run()
+        output = sys.stdout.getvalue()
+        return re.sub(r'[(](finished|predicted) .*[)]\n', '', output), total
+
+    serial_output, serial = run()
+    coordinated_output, coordinated = run(coordinator=('localhost', port))
+    for worker in workers:
+        worker.communicate()
+        assert_equals(worker.returncode, 0)
+
+    assert_lines(coordinated_output, serial_output)
+    for attribute in ['features_ran', 'features_passed', 'scenarios_ran',
+                      'scenarios_passed', 'steps', 'steps_passed']:
+        assert_equals(getattr(coordinated, attribute),
+                      getattr(serial, attribute))
+
+
+def test_shards_run_each_scenario_once_and_merge_like_a_single_run():
+    "Shards run every scenario once, and their merged results total the same"
+
+    directory = tempfile.mkdtemp()
+    try:
+        prepare_stdout()
+        serial = Runner(ojoin(), verbosity=3).run()
+
+        ran = []
+        filenames = []
+        for number in 1, 2, 3:
+            prepare_stdout()
+            filename = join(directory, 'shard-%d.results' % number)
+            shard = Runner(ojoin(), verbosity=3, shard=(number, 3),
+                           results_file=filename).run()
+            filenames.append(filename)
+            ran.extend([(result.feature.name, scenario_result.scenario.name)
+                        for result in shard.feature_results
+                        for scenario_result in result.scenario_results])
+
+        assert_equals(sorted(ran), sorted(
+            [(result.feature.name, scenario_result.scenario.name)
+             for result in serial.feature_results
+             for scenario_result in result.scenario_results]))
+
+        prepare_stdout()
+        Runner(ojoin(), verbosity=3)
+        merged = sharding.merge_results(filenames)
+        for attribute in ['features_ran', 'features_passed', 'scenarios_ran',
+                          'scenarios_passed', 'steps', 'steps_passed',
+                          'steps_undefined']:
+            assert_equals(getattr(merged, attribute),
+                          getattr(serial, attribute))
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_runs_again_keep_the_scenarios_asked_for():
+    "A runner picking a shard still runs only the scenarios asked for when run again"
+
+    runner = Runner(ojoin('many_successful_scenarios'), scenarios='2',
+                    shard=(1, 1), history=False)
+    for run in 1, 2:
+        prepare_stdout()
+        total = runner.run()
+        assert_equals(
+            [scenario_result.scenario.name
+             for scenario_result in total.feature_results[0].scenario_results],
+            ['Do nothing (again)'])
+
+
+def test_shards_ignore_the_durations_each_machine_recorded():
+    "Shards with different recorded durations still run each scenario once"
+
+    prepare_stdout()
+    serial = Runner(ojoin(), verbosity=3, history=False).run()
+    expected = sorted([(result.feature.name, scenario_result.scenario.name)
+                       for result in serial.feature_results
+                       for scenario_result in result.scenario_results])
+
+    directories = [tempfile.mkdtemp() for number in 1, 2]
+    try:
+        ran = []
+        for number, directory in zip((1, 2), directories):
+            prepare_stdout()
+            runner = Runner(ojoin(), verbosity=3, shard=(number, 2))
+            runner.history = History(directory)
+            runner.history.entries = {}
+            for index, result in enumerate(serial.feature_results):
+                path = result.feature.described_at.file
+                seconds = number == 1 and index + 1.0 or 100.0 / (index + 1)
+                runner.history.entries[path] = dict(
+                    (scenario_result.scenario.name, (seconds, 1))
+                    for scenario_result in result.scenario_results)
+
+            shard = runner.run()
+            ran.extend([(result.feature.name, scenario_result.scenario.name)
+                        for result in shard.feature_results
+                        for scenario_result in result.scenario_results])
+
+        assert_equals(sorted(ran), expected)
+
+        # a shared durations file balances the shards the same way for all
+        shared = sharding.shared_history(join(directories[0], 'shared.pickle'))
+        shared.entries = runner.history.entries
+        shared.changed = True
+        shared.save()
+        ran = []
+        for number in 1, 2:
+            prepare_stdout()
+            shard = Runner(ojoin(), verbosity=3, shard=(number, 2),
+                           shard_durations=shared.path).run()
+            ran.extend([(result.feature.name, scenario_result.scenario.name)
+                        for result in shard.feature_results
+                        for scenario_result in result.scenario_results])
+
+        assert_equals(sorted(ran), expected)
+    finally:
+        for directory in directories:
+            shutil.rmtree(directory)
+
+
+@with_setup(prepare_stdout)
+def test_list_tags():
+    "Runner.list_tags prints how many scenarios are tagged with each tag"
+
+    runner = Runner(tjoin(), verbosity=1)
+    tagged = runner.list_tags()
+
+    assert_equals(tagged, {
+        'fast-ish': [(tag_feature_name('timebound'), 2)],
+        'slow-ish': [(tag_feature_name('timebound'), 1)],
+    })
+    assert_stdout_lines(
+        "@fast-ish: 1 scenario in 1 feature\n"
+        "@slow-ish: 1 scenario in 1 feature\n"
+    )
+
+
 def test_run_random():
     "Randomise the feature order"
 
@@ -1368,6 +1629,23 @@ def test_feature_missing_scenarios():
         "available at http://lettuce.it for more information.\n" % filename
     )
 
+@with_setup(prepare_stderr)
+def test_parse_processes_report_every_syntax_error():
+    "syntax checking: Parsing features up front reports all syntax errors"
+
+    runner = Runner(sjoin(), parse_processes=2)
+
+    assert_raises(SystemExit, runner.run)
+
+    errors = sys.stderr.getvalue()
+    for name in ['many_features_a_file',
+                 'feature_without_name',
+                 'feature_missing_scenarios']:
+        assert 'Syntax error at: %s\n' % syntax_feature_name(name) in errors
+
+    assert_equals(errors.count('Syntax error at: '), 3)
+
+
 @with_setup(prepare_stdout)
 def test_output_with_undefined_steps_colorful():
     "With colored output, an undefined step should be printed in sequence."
@@ -1386,7 +1664,7 @@ def test_output_with_undefined_steps_colorful():
         '\n'
         '\x1b[1;37m  Scenario Outline: Outline scenario with general undefined step \x1b[1;30m# tests/functional/output_features/undefined_steps/undefined_steps.feature:7\x1b[0m\n'
         '\x1b[0;36m    Given this test step passes                                  \x1b[1;30m# tests/functional/output_features/undefined_steps/undefined_steps.py:4\x1b[0m\n'
-        '\x1b[0;33m    When this test step is undefined                             \x1b[1;30m# tests/functional/output_features/undefined_steps/undefined_steps.feature:5\x1b[0m\n'
+        '\x1b[0;33m    When this test step is undefined                             \x1b[1;30m# tests/functional/output_features/undefined_steps/undefined_steps.feature:9\x1b[0m\n'
         '\x1b[0;36m    Then <in> squared is <out>                                   \x1b[1;30m# tests/functional/output_features/undefined_steps/undefined_steps.py:8\x1b[0m\n'
         '\n'
         '\x1b[1;37m  Examples:\x1b[0m\n'
@@ -1407,4 +1685,37 @@ def test_output_with_undefined_steps_colorful():
         'def when_this_test_step_is_undefined(step):\n'
         "    assert False, 'This step must be implemented'\x1b[0m\n"
     )
-    
\ No newline at end of file
+    
+
+@with_setup(prepare_stdout)
+def test_dry_run_binds_steps_without_running_them():
+    "A dry run reports undefined steps without calling any hook or step definition"
+
+    called = []
+
+    @lettuce.before.each_scenario
+    def record_scenario_hook(scenario):
+        called.append(scenario)
+
+    runner = Runner(feature_name('undefined_steps'), verbosity=3, dry_run=True)
+    total = runner.run()
+
+    assert_equals(called, [])
+    assert_equals(total.features, 1)
+    assert_equals(total.scenarios, 2)
+    assert_equals(total.steps, 8)
+    assert_equals(total.steps_ambiguous, [])
+    assert_equals(
+        [step.sentence for step in total.steps_undefined],
+        ['When this test step is undefined'] * 3)
+    assert not total.passed
+    assert_equals(
+        [phase for phase, took in total.timings],
+        ['loading step definitions', 'parsing features', 'binding steps'])
+
+    output = lettuce.sys.stdout.getvalue()
+    assert 'When this test step is undefined ' \
+        '# tests/functional/output_features/undefined_steps/' \
+        'undefined_steps.feature:5\n' in output
+    assert '8 steps (3 undefined, 5 defined)\n' in output
+    assert "@step(u'When this test step is undefined')\n" in output
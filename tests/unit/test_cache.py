@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+from mock import patch
+from nose.tools import assert_equals, with_setup
+
+from lettuce import cache
+from lettuce import registry
+from lettuce import parser
+from lettuce.core import Feature
+
+from tests.workdir import workdir, setup_workdir, teardown_workdir, write
+
+FEATURE = u'''
+Feature: Cache parsed features
+  Scenario: Reuse the syntax tree
+    Given I parse this feature once
+    Then the next run reads it from the cache
+'''
+
+def new_cache():
+    return cache.ParseCache(os.path.join(workdir[-1], '.lettuce_cache'))
+
+
+def parse_count(filename, parse_cache):
+    with patch.object(parser, 'parse', wraps=parser.parse) as parse:
+        feature = Feature.from_file(filename, cache=parse_cache)
+
+    return feature, parse.call_count
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_unchanged_feature_is_parsed_once():
+    "Feature.from_file parses an unchanged feature file only once"
+    filename = write('some.feature', FEATURE)
+    parse_cache = new_cache()
+
+    first, first_count = parse_count(filename, parse_cache)
+    second, second_count = parse_count(filename, parse_cache)
+
+    assert_equals(first_count, 1)
+    assert_equals(second_count, 0)
+    assert_equals(second.name, first.name)
+    assert_equals(second.described_at.file, first.described_at.file)
+    assert_equals(
+        [step.sentence for step in second.scenarios[0].steps],
+        [step.sentence for step in first.scenarios[0].steps],
+    )
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_changed_feature_is_parsed_again():
+    "Feature.from_file parses a feature file again once it changes"
+    filename = write('some.feature', FEATURE)
+    parse_cache = new_cache()
+    parse_count(filename, parse_cache)
+
+    write('some.feature', FEATURE.replace('once', 'twice'))
+    feature, count = parse_count(filename, parse_cache)
+
+    assert_equals(count, 1)
+    assert_equals(feature.scenarios[0].steps[0].sentence,
+                  u'Given I parse this feature twice')
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_cache_is_tied_to_lettuce_version():
+    "The parse cache is not reused across lettuce versions"
+    filename = write('some.feature', FEATURE)
+    parse_cache = new_cache()
+    parse_count(filename, parse_cache)
+
+    with patch('lettuce.version', 'another'):
+        feature, count = parse_count(filename, parse_cache)
+
+    assert_equals(count, 1)
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_broken_cache_entries_are_ignored():
+    "A corrupted parse cache entry is parsed again"
+    filename = write('some.feature', FEATURE)
+    parse_cache = new_cache()
+    parse_count(filename, parse_cache)
+
+    f = open(parse_cache.path_for(filename), 'wb')
+    f.write('garbage')
+    f.close()
+
+    feature, count = parse_count(filename, parse_cache)
+    assert_equals(count, 1)
+    assert_equals(feature.name, u'Cache parsed features')
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_feature_files_are_only_cached_when_asked_to():
+    "Feature.from_file and Runner leave the cache alone unless told to use it"
+    from lettuce import Runner
+    filename = write('some.feature', FEATURE)
+    directory = os.path.join(workdir[-1], '.lettuce_cache')
+
+    with patch.dict(os.environ, {'LETTUCE_CACHE_DIR': directory}):
+        parse_count(filename, None)
+        assert not os.path.exists(directory)
+
+        try:
+            assert Runner(workdir[-1]).parse_cache is None
+            parse_cache = Runner(workdir[-1], parse_cache=True).parse_cache
+        finally:
+            registry.clear()
+
+        assert_equals(parse_cache.directory, directory)
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_parse_cache_can_be_disabled_and_cleared():
+    "Feature.from_file skips the cache with cache=False, and it can be cleared"
+    filename = write('some.feature', FEATURE)
+    parse_cache = new_cache()
+
+    parse_count(filename, False)
+    assert not os.path.exists(parse_cache.directory)
+
+    parse_count(filename, parse_cache)
+    assert os.path.exists(parse_cache.path_for(filename))
+    assert parse_cache.clear()
+    assert not os.path.exists(parse_cache.directory)
+    assert not parse_cache.clear()
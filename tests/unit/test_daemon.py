@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import sys
+import time
+import signal
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from nose.tools import assert_equals
+
+from lettuce import daemon
+
+ran = []
+
+
+class Loader(object):
+    def find_and_load_step_definitions(self):
+        ran.append('loaded')
+
+
+def main(args):
+    ran.append(args)
+    print "ran %s %d time(s) in %s" % (" ".join(args), len(ran),
+                                      os.getcwd())
+    sys.stderr.write("from %s\n" % os.environ['LETTUCE_DAEMON_TEST'])
+    raise SystemExit(len(args))
+
+
+def test_runs_are_forked_from_the_daemon_and_printed_by_the_client():
+    "Each run asked to the daemon starts from the state it was loaded in"
+    directory = os.path.realpath(tempfile.mkdtemp())
+    address = os.path.join(directory, 'daemon.sock')
+    pid = os.fork()
+    if pid == 0:
+        try:
+            sys.stdout = StringIO()
+            daemon.serve(address, Loader(), main)
+        finally:
+            os._exit(0)
+
+    cwd = os.getcwd()
+    stdout, stderr = sys.stdout, sys.stderr
+    try:
+        while not os.path.exists(address):
+            time.sleep(0.05)
+
+        os.chdir(directory)
+        os.environ['LETTUCE_DAEMON_TEST'] = 'the client'
+        statuses = []
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        statuses.append(daemon.ask(address, ['one']))
+        statuses.append(daemon.ask(address, ['one', 'two']))
+        printed, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+        del os.environ['LETTUCE_DAEMON_TEST']
+        os.kill(pid, signal.SIGINT)
+        os.waitpid(pid, 0)
+        shutil.rmtree(directory)
+
+    assert_equals(statuses, [1, 2])
+    assert_equals(printed, "ran one 2 time(s) in %s\n"
+                  "ran one two 2 time(s) in %s\n" % (directory, directory))
+    assert_equals(errors, "from the client\nfrom the client\n")
+    assert_equals(ran, [])
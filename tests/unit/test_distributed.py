@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+from nose.tools import assert_equals, assert_raises
+
+from lettuce.distributed import StealingQueue, parse_address, \
+    check_address, UnsafeAddress
+
+
+def test_parse_address():
+    "Addresses are given as HOST:PORT, HOST or PORT"
+    assert_equals(parse_address('ci-1:9000'), ('ci-1', 9000))
+    assert_equals(parse_address('ci-1'), ('ci-1', 7788))
+    assert_equals(parse_address('9000'), ('localhost', 9000))
+    assert_equals(parse_address(':9000', host='0.0.0.0'), ('0.0.0.0', 9000))
+
+
+def test_only_loopback_addresses_go_without_a_key():
+    "Addresses other machines may reach need LETTUCE_AUTHKEY to be set"
+    saved = os.environ.pop('LETTUCE_AUTHKEY', None)
+    try:
+        check_address(('localhost', 7788))
+        check_address(('127.0.0.1', 7788))
+        assert_raises(UnsafeAddress, check_address, ('0.0.0.0', 7788))
+        assert_raises(UnsafeAddress, check_address, ('', 7788))
+        assert_raises(UnsafeAddress, check_address, ('10.1.2.3', 7788))
+
+        os.environ['LETTUCE_AUTHKEY'] = 'a secret'
+        check_address(('0.0.0.0', 7788))
+    finally:
+        os.environ.pop('LETTUCE_AUTHKEY', None)
+        if saved is not None:
+            os.environ['LETTUCE_AUTHKEY'] = saved
+
+
+def test_workers_keep_to_their_feature_then_steal_from_the_busiest():
+    "Workers take the scenarios of their feature, then of new ones, then steal"
+    units = [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (2, None)]
+    queue = StealingQueue(units)
+
+    assert_equals(queue.take(None), 0)
+    assert_equals(queue.take(None), 4)
+    assert_equals(queue.take(0), 1)
+    assert_equals(queue.take(1), 5)
+    assert_equals(queue.take(2), 3)
+    assert_equals(queue.take(0), 2)
+
+
+def test_longest_features_and_scenarios_are_handed_out_first():
+    "Given estimates, features and their scenarios start longest first"
+    units = [(0, 0), (0, 1), (1, 0), (1, 1), (1, 2)]
+    queue = StealingQueue(units, [1.0, 4.0, 2.0, 3.0, 2.0])
+
+    assert_equals(queue.take(None), 3)
+    assert_equals(queue.take(None), 1)
+    assert_equals(queue.take(1), 2)
+    assert_equals(queue.take(0), 0)
+    assert_equals(queue.take(1), 4)
+
+
+def test_units_of_workers_that_went_away_are_queued_again():
+    "A unit given back is the next one taken from its feature"
+    queue = StealingQueue([(0, 0), (0, 1)])
+
+    assert_equals(queue.take(None), 0)
+    queue.give_back(0, 0)
+    assert_equals(queue.take(0), 0)
+    assert_equals(queue.take(0), 1)
+    queue.finish(2)
+    assert_equals(queue.take(0), None)
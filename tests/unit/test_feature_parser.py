@@ -14,6 +14,9 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import threading
+
 from sure import expect
 from sure.old import that
 from lettuce import step
@@ -857,3 +860,65 @@ def test_feature_first_scenario_tags_extraction():
 
     assert that(feature.scenarios[0].tags).deep_equals([
         'onetag', 'another', '$%^&even-weird_chars'])
+
+
+FEATURE_WITH_FILTERED_SCENARIOS = """
+Feature: Filter scenarios
+  @selected
+  Scenario: The selected one
+    Given I run this scenario
+
+  @skipped
+  Scenario Outline: The skipped one
+    Given I skip <this> scenario
+
+  Examples:
+    | this  |
+    | one   |
+"""
+
+
+def test_scenario_bodies_are_built_only_when_selected():
+    ("Scenarios left out by tags or by index never build their steps "
+     "nor expand their outlines")
+
+    feature = Feature.from_string(FEATURE_WITH_FILTERED_SCENARIOS)
+    selected, skipped = feature.scenarios
+
+    feature.bind(tags=['selected'])
+    feature.run(scenarios=[1])
+
+    assert 'steps' in selected.__dict__
+    assert 'steps' not in skipped.__dict__
+    assert 'outlines' not in skipped.__dict__
+    assert_equals(skipped.tags, ['skipped'])
+
+    assert_equals([step.sentence for step in skipped.solved_steps],
+                  [u'Given I skip one scenario'])
+
+
+def test_scenario_bodies_are_built_once_across_threads():
+    "Scenarios asked for their steps by many threads at once build them once"
+
+    feature = Feature.from_string(FEATURE_WITH_FILTERED_SCENARIOS)
+    scenario = feature.scenarios[1]
+    body = scenario._body
+    built = []
+
+    def slow_body():
+        built.append(threading.current_thread())
+        time.sleep(0.1)
+        return body()
+
+    scenario._body = slow_body
+    found = []
+    threads = [threading.Thread(target=lambda: found.append(scenario.steps))
+               for count in range(2)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert_equals(len(built), 1)
+    assert found[0] is found[1]
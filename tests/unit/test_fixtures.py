@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+import tempfile
+import threading
+
+from nose.tools import assert_equals, assert_raises, with_setup
+
+from lettuce import step, world, fixture, registry, fixtures
+from lettuce.core import Feature
+
+FEATURE = u'''
+Feature: Fixtures
+  Scenario: Everything
+    Given I use the schema, the client and the user
+    And I use the user
+
+  Scenario: Nothing
+    Given I use nothing
+
+  Scenario: Only the user
+    Given I use the user
+'''
+
+events = []
+
+
+def fixture_of(name, scope):
+    def function():
+        events.append('up %s' % name)
+        yield name
+        events.append('down %s' % name)
+
+    function.__name__ = name
+    return fixture(scope=scope)(function)
+
+
+def setup_fixtures():
+    registry.clear()
+    del events[:]
+    fixture_of('schema', 'session')
+    fixture_of('client', 'feature')
+    fixture_of('user', 'scenario')
+
+    @step(u'I use the schema, the client and the user')
+    def use_all(step):
+        assert_equals((world.schema, world.client, world.user),
+                      ('schema', 'client', 'user'))
+
+    @step(u'I use the user')
+    def use_user(step):
+        assert_equals(world.user, 'user')
+
+    @step(u'I use nothing')
+    def use_nothing(step):
+        events.append('nothing')
+
+
+def teardown_fixtures():
+    fixtures.leave(fixtures.SESSION)
+    registry.clear()
+
+
+@with_setup(setup_fixtures, teardown_fixtures)
+def test_fixtures_are_set_up_on_first_use_and_torn_down_with_their_scope():
+    "Fixtures are set up once per scope and torn down latest first"
+    result = Feature.from_string(FEATURE).run()
+    assert result.passed
+    assert_equals(events, [
+        'up schema', 'up client', 'up user', 'down user',
+        'nothing',
+        'up user', 'down user',
+        'down client',
+    ])
+
+    registry.call_hook('after', 'all', None)
+    assert_equals(events[-1], 'down schema')
+
+
+@with_setup(setup_fixtures, teardown_fixtures)
+def test_fixtures_of_a_session_are_set_up_once_for_all_threads():
+    "Threads share the fixtures of a session, and set them up only once"
+    @fixture(scope='session')
+    def slow():
+        time.sleep(0.1)
+        events.append('slow')
+        return object()
+
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(world.slow))
+               for index in range(4)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert_equals(events, ['slow'])
+    assert_equals(len(set(map(id, got))), 1)
+
+
+@with_setup(setup_fixtures, teardown_fixtures)
+def test_attributes_of_world_win_over_fixtures():
+    "Attributes set on world are not looked up among fixtures"
+    world.user = 'someone'
+    try:
+        assert_equals(world.user, 'someone')
+    finally:
+        del world.user
+
+    assert_equals(events, [])
+    assert not hasattr(world, 'nobody')
+
+
+def test_fixtures_only_have_known_scopes():
+    "A fixture of an unknown scope is refused"
+    assert_raises(ValueError, fixture, scope='module')
+
+
+@with_setup(setup_fixtures, teardown_fixtures)
+def test_scopes_can_be_given_first():
+    "@fixture('feature') decorates with the scope given first"
+    @fixture('feature')
+    def tab():
+        return 'tab'
+
+    assert_equals(fixtures.FIXTURES['tab'].scope, 'feature')
+    assert_raises(ValueError, fixture, 'module')
+
+
+@with_setup(setup_fixtures, teardown_fixtures)
+def test_fixtures_set_up_by_forked_steps_are_torn_down_there():
+    "Fixtures first set up in a child running @fork steps are torn down there"
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+
+    @fixture
+    def opened_file():
+        yield 'file'
+        with open(filename, 'a') as torn:
+            torn.write('down %d\n' % os.getpid())
+
+    @step(u'I use the file')
+    def use_file(step):
+        assert_equals(world.opened_file, 'file')
+
+    try:
+        assert Feature.from_string(u'''
+Feature: Fixtures in a child
+  @fork
+  Scenario: Forked
+    Given I use the file
+''').run().passed
+        with open(filename) as torn:
+            downs = torn.read().splitlines()
+    finally:
+        os.remove(filename)
+
+    assert_equals(len(downs), 1)
+    assert downs[0] != 'down %d' % os.getpid()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from nose.tools import assert_equals, with_setup
+
+from lettuce.core import Feature, FeatureResult, ScenarioResult
+from lettuce.history import History, Outcomes, longest_first, makespan
+
+from tests.workdir import workdir, setup_workdir, teardown_workdir, write
+
+FEATURE = u'''
+Feature: Durations
+  Background:
+    Given I log in
+
+  Scenario: Quick
+    Given I do nothing
+
+  Scenario: Slow
+    Given I do something
+    And I do something else
+    And I do yet another thing
+
+  Scenario Outline: Rows
+    Given I do <what>
+
+  Examples:
+    | what |
+    | this |
+    | that |
+'''
+
+def load_feature():
+    return Feature.from_file(write('durations.feature', FEATURE))
+
+
+def ran(feature, **durations):
+    results = []
+    for scenario in feature.scenarios:
+        if scenario.name in durations:
+            result = ScenarioResult(scenario, scenario.steps, [], [], [])
+            result.duration = durations[scenario.name]
+            results.append(result)
+
+    return FeatureResult(feature, *results)
+
+
+def test_longest_first():
+    "Units are handed out longest first, ties in order"
+    assert_equals(longest_first([1, 5, 3, 5]), [1, 3, 2, 0])
+
+
+def test_makespan():
+    "The makespan is when the last worker is done with its units"
+    assert_equals(makespan([5, 4, 3, 3, 3], 2), 10)
+    assert_equals(makespan([5, 4, 3], 1), 12)
+    assert_equals(makespan([], 3), 0)
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_history_estimates_in_steps_until_anything_ran():
+    "Before any run, scenarios are estimated by their number of steps"
+    feature = load_feature()
+    history = History(workdir[-1])
+    estimates, in_seconds = history.estimate_units(
+        [feature], [feature.scenarios], [(0, 0), (0, 1)])
+
+    assert_equals(estimates, [2, 4])
+    assert not in_seconds
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_history_estimates_from_past_runs():
+    "Scenarios that ran take as long as last time, others as long per step"
+    feature = load_feature()
+    History(workdir[-1]).record([ran(feature, Quick=3.0)])
+
+    history = History(workdir[-1])
+    estimates, in_seconds = history.estimate_units(
+        [feature], [feature.scenarios], [(0, 0), (0, 1), (0, None)])
+
+    assert_equals(estimates, [3.0, 12.0, 0.0])
+    assert in_seconds
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_history_keeps_scenarios_that_did_not_run():
+    "Each run only replaces the durations of the scenarios it ran"
+    feature = load_feature()
+    History(workdir[-1]).record([ran(feature, Quick=1.0, Slow=2.0)])
+    History(workdir[-1]).record([ran(feature, Slow=5.0)])
+
+    path = feature.described_at.file
+    assert_equals(History(workdir[-1]).scenarios(path),
+                  {u'Quick': (1.0, 1), u'Slow': (5.0, 3)})
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_disabled_history_records_nothing():
+    "A history without directory neither loads nor saves anything"
+    feature = load_feature()
+    history = History(False)
+    history.record([ran(feature, Quick=1.0)])
+
+    assert_equals(history.entries, None)
+    assert_equals(history.seconds_per_step(), None)
+
+
+def outcome(feature, name, passed, row=None):
+    scenario = [scenario for scenario in feature.scenarios
+                if scenario.name == name][0]
+    steps = scenario.steps
+    result = ScenarioResult(scenario, passed and steps or [],
+                            not passed and steps or [], [], [])
+    result.row = row
+    return result
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_outcomes_put_failed_scenarios_first():
+    "Scenarios that failed last time come first, or alone"
+    feature = load_feature()
+    Outcomes(workdir[-1]).record([FeatureResult(
+        feature,
+        outcome(feature, u'Quick', True),
+        outcome(feature, u'Slow', False))])
+
+    outcomes = Outcomes(workdir[-1])
+    assert_equals([scenario.name for scenario in outcomes.select(feature)],
+                  [u'Slow', u'Quick', u'Rows'])
+    assert_equals([scenario.name
+                   for scenario in outcomes.select(feature, True)],
+                  [u'Slow'])
+    assert_equals(outcomes.order(['other.feature',
+                                  feature.described_at.file]),
+                  [feature.described_at.file, 'other.feature'])
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_outcomes_keep_the_failed_examples_of_outlines():
+    "Only the examples of an outline that failed last time run again"
+    feature = load_feature()
+    rows = feature.scenarios[2]
+    that = ((u'what', u'that'),)
+    Outcomes(workdir[-1]).record([FeatureResult(
+        feature,
+        outcome(feature, u'Rows', True, ((u'what', u'this'),)),
+        outcome(feature, u'Rows', False, that))])
+
+    assert_equals(Outcomes(workdir[-1]).select(feature, True), [rows])
+    assert_equals(rows.outlines, [{u'what': u'that'}])
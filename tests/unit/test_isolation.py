@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+import tempfile
+import threading
+
+from nose.tools import assert_equals, with_setup
+
+from lettuce import step, world, registry, before
+from lettuce.core import Feature
+from lettuce.isolation import isolator_for, in_child, ISOLATORS, FORK
+
+FEATURE = u'''
+Feature: Isolated
+  @fork
+  Scenario: Forked
+    Given I count 5 in the process
+    And I count 7 in the world
+    Then the world counted 7
+    And the world counted 8
+    And I count 9 in the world
+
+  Scenario: Not forked
+    Given the process counted 0
+    Then the world counted 7
+
+  @fork
+  Scenario Outline: Rows
+    Given I count <number> in the world
+    And I do something undefined
+
+  Examples:
+    | number |
+    | 1      |
+    | 2      |
+'''
+
+counted = []
+
+
+def setup_steps():
+    registry.clear()
+    del counted[:]
+    world.count = 0
+
+    @step(u'I count (\d+) in the process')
+    def count_in_process(step, number):
+        counted.append(int(number))
+
+    @step(u'the process counted (\d+)')
+    def process_counted(step, number):
+        assert_equals(sum(counted), int(number))
+
+    @step(u'I count (\d+) in the world')
+    def count_in_world(step, number):
+        world.count = int(number)
+
+    @step(u'the world counted (\d+)')
+    def world_counted(step, number):
+        assert_equals(world.count, int(number))
+
+
+def teardown_steps():
+    registry.clear()
+    for name in ('count', 'holder', 'current'):
+        if hasattr(world, name):
+            delattr(world, name)
+
+
+def test_isolators_are_picked_by_tag():
+    "The isolator of a scenario is the one registered for any of its tags"
+    feature = Feature.from_string(FEATURE)
+    forked, shared, rows = feature.scenarios
+    assert_equals(isolator_for(forked), ISOLATORS[FORK])
+    assert_equals(isolator_for(shared), None)
+    assert_equals(isolator_for(rows), ISOLATORS[FORK])
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_forked_steps_only_send_back_their_outcome_and_world():
+    "Steps run in a child process, only changing world in the runner"
+    feature = Feature.from_string(FEATURE)
+    forked, shared = feature.run().scenario_results[:2]
+
+    assert_equals(len(forked.steps_passed), 3)
+    assert_equals(len(forked.steps_failed), 1)
+    assert_equals(len(forked.steps_skipped), 1)
+    reason = forked.steps_failed[0].why
+    assert reason.step is forked.steps_failed[0]
+    assert 'AssertionError' in reason.traceback
+
+    assert shared.passed
+    assert_equals(counted, [])
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_forked_outlines_run_each_example_apart():
+    "Each example of a forked outline runs in a child of its own"
+    feature = Feature.from_string(FEATURE)
+    results = feature.run().scenario_results[2:]
+
+    assert_equals([result.steps_passed[0].sentence for result in results],
+                  [u'Given I count 1 in the world',
+                   u'Given I count 2 in the world'])
+    assert_equals([len(result.steps_undefined) for result in results],
+                  [1, 1])
+    assert_equals(world.count, 2)
+
+
+def hooks_lock_is_free():
+    free = registry.hooks_lock.acquire(False)
+    if free:
+        registry.hooks_lock.release()
+
+    return free
+
+
+def test_forks_wait_for_hooks_other_threads_are_running():
+    "Children are not forked while another thread holds the hooks lock"
+    registry.hooks_lock = threading.RLock()
+    holding = threading.Event()
+
+    def run_hook():
+        with registry.hooks_lock:
+            holding.set()
+            time.sleep(0.2)
+
+    thread = threading.Thread(target=run_hook)
+    thread.start()
+    try:
+        holding.wait()
+        assert in_child('the lock check', hooks_lock_is_free)
+    finally:
+        thread.join()
+        registry.hooks_lock = None
+
+
+BACKGROUND_ONCE = u'''
+@background_once
+Feature: Set up once
+  Background:
+    Given the background counts 1
+
+  Scenario: First
+    Given I count 2 in the world
+    Then the world counted 2
+
+  Scenario Outline: Rows
+    Then the world counted 1
+    And I count <number> in the world
+
+  Examples:
+    | number |
+    | 3      |
+    | 4      |
+'''
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_backgrounds_run_once_restore_the_world_they_left():
+    "Features tagged @background_once start each scenario from one world"
+    backgrounds = []
+
+    @step(u'the background counts 1')
+    def count_background(step):
+        backgrounds.append(step)
+        world.count = 1
+        world.holder = {step.background: step.background.feature}
+
+    feature = Feature.from_string(BACKGROUND_ONCE)
+    result = feature.run()
+
+    assert result.passed
+    assert_equals(len(backgrounds), 1)
+    assert_equals(world.count, 4)
+    assert_equals(world.holder.keys(), [feature.background])
+    assert world.holder[feature.background] is feature
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_backgrounds_run_once_only_once_they_passed():
+    "Features tagged @background_once run a failing background again"
+    backgrounds = []
+
+    @step(u'the background counts 1')
+    def count_background(step):
+        backgrounds.append(step)
+        world.count = 1
+        assert len(backgrounds) > 1, 'the first background fails'
+
+    feature = Feature.from_string(BACKGROUND_ONCE)
+    result = feature.run()
+
+    assert_equals([scenario.passed for scenario in result.scenario_results],
+                  [True, True, True])
+    assert_equals(len(backgrounds), 2)
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_backgrounds_run_once_for_each_run_of_the_feature():
+    "Features tagged @background_once run the background again when run again"
+    backgrounds = []
+
+    @step(u'the background counts 1')
+    def count_background(step):
+        backgrounds.append(step)
+        world.count = 1
+
+    feature = Feature.from_string(BACKGROUND_ONCE)
+    feature.run()
+    world.count = 0
+    assert feature.run().passed
+
+    assert_equals(len(backgrounds), 2)
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_backgrounds_run_once_leave_what_scenario_hooks_set():
+    "Features tagged @background_once keep what before.each_scenario set"
+    @before.each_scenario
+    def name_scenario(scenario):
+        world.current = scenario.name
+
+    @step(u'the background counts 1')
+    def count_background(step):
+        world.count = 1
+
+    @step(u'this is the scenario (.+)')
+    def is_the_scenario(step, name):
+        assert_equals(world.current, name)
+
+    feature = Feature.from_string(u'''
+@background_once
+Feature: Set up once, named by hooks
+  Background:
+    Given the background counts 1
+
+  Scenario: One
+    Given this is the scenario One
+    And I count 2 in the world
+
+  Scenario: Two
+    Given this is the scenario Two
+    Then the world counted 1
+''')
+    result = feature.run()
+
+    assert_equals([scenario.passed for scenario in result.scenario_results],
+                  [True, True])
+
+
+SHARE_PREFIXES = u'''
+@share_prefixes
+Feature: Shared steps
+  Scenario: Two
+    Given I count 1 in the world
+    And I add 1 in the world
+    Then the world counted 2
+
+  Scenario: Three
+    Given I count 1 in the world
+    And I add 1 in the world
+    And I add 1 in the world
+    Then the world counted 3
+
+  Scenario: Broken
+    Given I count 1 in the world
+    And I add 1 in the world
+    Then the world counted 5
+    And I add 1 in the world
+
+  Scenario Outline: Rows
+    Given I count 1 in the world
+    And I add <number> in the world
+    Then the world counted <total>
+
+  Examples:
+    | number | total |
+    | 1      | 2     |
+    | 5      | 6     |
+'''
+
+
+@with_setup(setup_steps, teardown_steps)
+def test_steps_scenarios_begin_with_run_once_for_all_of_them():
+    "Features tagged @share_prefixes run the steps scenarios share once"
+    handle, filename = tempfile.mkstemp()
+    os.close(handle)
+
+    @step(u'I add (\d+) in the world')
+    def add_in_world(step, number):
+        with open(filename, 'a') as ran:
+            ran.write('%s\n' % step.sentence)
+
+        world.count += int(number)
+
+    feature = Feature.from_string(SHARE_PREFIXES)
+    try:
+        results = feature.run().scenario_results
+        with open(filename) as ran:
+            sentences = ran.read().splitlines()
+    finally:
+        os.remove(filename)
+
+    assert_equals([result.passed for result in results],
+                  [True, True, False, True, True])
+    assert_equals(sentences, ['And I add 1 in the world'] * 2 +
+                  ['And I add 5 in the world'])
+    assert_equals([len(result.steps_passed) for result in results],
+                  [3, 4, 2, 3, 3])
+
+    broken = results[2]
+    assert_equals(len(broken.steps_skipped), 1)
+    assert broken.steps_failed[0].why.step is broken.steps_failed[0]
+    assert 'AssertionError' in broken.steps_failed[0].why.traceback
+    assert_equals(world.count, 6)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+
+from nose.tools import assert_equals, assert_raises
+
+from lettuce import loop
+from lettuce.registry import world
+
+
+def test_in_world_resumes_with_the_given_world():
+    "A coroutine driven by in_world sees and changes the given world"
+    def coroutine():
+        world.seen = world.given
+        value = yield 'waiting'
+        world.value = value
+
+    state = {'given': 'theirs'}
+    world.given = 'mine'
+    driven = loop.in_world(coroutine(), state)
+
+    assert_equals(driven.next(), 'waiting')
+    assert_equals(world.given, 'mine')
+    assert not hasattr(world, 'seen')
+    assert_raises(StopIteration, driven.send, 42)
+    assert_equals(state, {'given': 'theirs', 'seen': 'theirs', 'value': 42})
+    del world.given
+
+
+def test_complete_returns_what_plain_functions_returned():
+    "Only the results of coroutine functions are run on the loop"
+    function = lambda: 'done'
+    assert_equals(loop.complete(function, function()), 'done')
+
+
+def test_event_loop_runs_coroutines_from_many_threads():
+    "Coroutines run by many threads wait on the loop at once"
+    if loop.asyncio is None:
+        return
+
+    asyncio = loop.asyncio
+    event_loop = loop.EventLoop()
+    started = []
+
+    @asyncio.coroutine
+    def wait(name):
+        started.append(name)
+        while len(started) < 2:
+            yield asyncio.sleep(0.01)
+
+        world.waited = name
+        raise asyncio.Return(name)
+
+    results = {}
+
+    def run(name):
+        results[name] = event_loop.run(wait(name))
+        results[name + ' world'] = world.waited
+
+    threads = [threading.Thread(target=run, args=(name,))
+               for name in ('one', 'two')]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        event_loop.close()
+
+    assert_equals(results, {'one': 'one', 'one world': 'one',
+                            'two': 'two', 'two world': 'two'})
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import warnings
+
+from nose.tools import assert_equals
+
+from lettuce import parser
+from lettuce.core import Feature, Language
+from lettuce.exceptions import LettuceSyntaxWarning
+
+FEATURE = u'''
+# a comment before everything
+@feature-tag
+Feature: Parse in one pass
+  In order to parse big features
+  As a lettuce user
+
+  Background:
+    Given I am logged in
+
+  @first @tagged
+  Scenario: Do something
+    Given I have the following items:
+      | name  | price |
+      | Glass | 10    |
+    Then I see it
+
+  Scenario Outline: Do something else
+    Given I have <count> items
+    Then I see it
+
+  Examples:
+    | count |
+    | 1     |
+
+  Examples:
+    | count |
+    | 2     |
+'''
+
+
+def test_parser_keeps_track_of_line_numbers():
+    "lettuce.parser.parse() records the line of each node it emits"
+
+    node = parser.parse(FEATURE, Language(), 'some.feature')
+
+    assert_equals(node.line, 4)
+    assert_equals(node.description, [
+        (5, u'In order to parse big features'),
+        (6, u'As a lettuce user'),
+    ])
+    assert_equals(node.background.line, 8)
+    assert_equals([s.line for s in node.background.steps], [9])
+
+    first, second = node.scenarios
+    assert_equals((first.line, second.line), (12, 18))
+    assert_equals([s.line for s in first.steps], [13, 16])
+    assert_equals([s.line for s in second.steps], [19, 20])
+
+
+def test_parser_extracts_tags_steps_and_examples():
+    "lettuce.parser.parse() finds tags, step tables and examples"
+
+    node = parser.parse(FEATURE, Language())
+
+    assert_equals(node.tags, [u'feature-tag'])
+    first, second = node.scenarios
+    assert_equals(first.tags, [u'first', u'tagged'])
+    assert_equals(second.tags, [])
+
+    assert_equals(first.steps[0].sentence, u'Given I have the following items:')
+    assert_equals(first.steps[0].lines, [
+        u'| name  | price |',
+        u'| Glass | 10    |',
+    ])
+    assert_equals(first.steps[1].sentence, u'Then I see it')
+    assert_equals(second.examples, [u'| count |', u'| 1     |', u'| 2     |'])
+
+
+def test_feature_steps_know_their_own_line():
+    "Steps with the same sentence are described at their own line"
+
+    feature = Feature.from_string(FEATURE, with_file='some.feature')
+    first, second = feature.scenarios
+
+    assert_equals(first.steps[1].sentence, second.steps[1].sentence)
+    assert_equals(first.steps[1].described_at.line, 16)
+    assert_equals(second.steps[1].described_at.line, 20)
+    assert_equals(feature.described_at.description_at, (5, 6))
+
+
+def test_misspelled_placeholders_are_warned_about():
+    "Outline steps using a placeholder close to a column are warned about"
+
+    string = u'''
+Feature: Placeholders
+  Scenario Outline: Use a misspelled placeholder
+    Given I have <count> items:
+      | name   | price   |
+      | <nmae> | <price> |
+
+  Examples:
+    | count | name  | price |
+    | 1     | Glass | 10    |
+'''
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        feature = parser.parse(string, Language(), 'some.feature')
+
+    assert_equals(len(caught), 1)
+    assert issubclass(caught[0].category, LettuceSyntaxWarning)
+    assert 'uses <nmae>, which is not a column of its examples. ' \
+        'Did you mean <name>?' in str(caught[0].message)
+
+    known = string.replace(u'<nmae>', u'<name>')
+    scenario = Feature.from_string(known).scenarios[0]
+    assert_equals(scenario.solved_steps[0].hashes,
+                  [{u'name': u'Glass', u'price': u'10'}])
+
+
+def test_markup_in_outline_steps_is_left_as_it_is():
+    "Angle brackets that are not examples columns stay in outline steps"
+
+    string = u'''
+Feature: Markup
+  Scenario Outline: Show markup
+    Given I write "<text>"
+    Then the page shows "<b><text></b>"
+
+  Examples:
+    | text |
+    | bold |
+'''
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        scenario = Feature.from_string(string).scenarios[0]
+
+    assert_equals(caught, [])
+    assert_equals(scenario.solved_steps[1].sentence,
+                  u'Then the page shows "<b>bold</b>"')
@@ -32,3 +32,165 @@ def test_function_matches_compares_with_abs_path():
 
     assert _function_matches(fakecallback1, fakecallback2), \
         'the callbacks should have matched'
+
+
+def _linear_match(registry, sentence, ignore_case):
+    import re
+    for regex, func in registry.items():
+        matched = re.search(regex, sentence, ignore_case and re.I or 0)
+        if matched:
+            return matched, func
+
+    return None, None
+
+
+def test_step_dict_matches_like_a_linear_scan():
+    u"lettuce.registry.StepDict.match() should pick the same definition a linear scan of the registry would"
+    from lettuce.registry import StepDict
+
+    registry = StepDict()
+    regexes = [
+        r'I have a defined step',
+        r'^Given I have (\d+) cucumbers$',
+        r'I have (\d+) cucumbers',
+        r'have (?P<count>\d+) .*',
+        r'(?:Given|When) I do it',
+        r'I do it|something else',
+        r'foo.?bar',
+        r'Then (?i)SHOUT',
+        u'ação',
+        r'^a$',
+        r'\bword\b',
+    ]
+    for number, regex in enumerate(regexes):
+        registry[regex] = number
+
+    sentences = [
+        u'Given I have a defined step',
+        u'Given I have 10 cucumbers',
+        u'Then I have 10 cucumbers and more',
+        u'And I have 2 tomatoes',
+        u'When I do it',
+        u'And something else',
+        u'foobar',
+        u'foo-bar',
+        u'Then shout',
+        u'Given an ação',
+        u'GIVEN AN AÇÃO',
+        u'a',
+        u'A',
+        u'a word',
+        u'Given I have a DEFINED step',
+        u'nothing at all',
+    ]
+    for sentence in sentences:
+        for ignore_case in (True, False):
+            matched, func = registry.match(sentence, ignore_case)
+            expected, expected_func = _linear_match(
+                registry, sentence, ignore_case)
+
+            assert func == expected_func, \
+                '%r (ignore_case=%s) matched %r instead of %r' % (
+                    sentence, ignore_case, func, expected_func)
+            if expected:
+                assert matched.groups() == expected.groups()
+                assert matched.groupdict() == expected.groupdict()
+
+
+def test_step_dict_is_reindexed_when_changed():
+    u"lettuce.registry.StepDict should rebuild its index when definitions change"
+    from lettuce.registry import StepDict
+
+    registry = StepDict()
+    registry['I have a defined step'] = 'first'
+    assert registry.match(u'Given I have a defined step')[1] == 'first'
+
+    registry['I have a defined step'] = 'second'
+    assert registry.match(u'Given I have a defined step')[1] == 'second'
+
+    del registry['I have a defined step']
+    assert registry.match(u'Given I have a defined step') == (None, None)
+
+    registry.update({'defined step': 'third'})
+    assert registry.match(u'Given I have a defined step')[1] == 'third'
+
+    registry.clear()
+    assert registry.match(u'Given I have a defined step') == (None, None)
+
+
+def test_step_dict_memoizes_bindings_until_changed():
+    u"lettuce.registry.StepDict should resolve each sentence only once until definitions change"
+    from lettuce.registry import StepDict
+
+    registry = StepDict()
+    registry[r'I have (\d+) cucumbers'] = 'cucumbers'
+
+    resolved = []
+    index = registry.index
+    original_match = index.match
+
+    def counting_match(sentence, ignore_case):
+        resolved.append((sentence, ignore_case))
+        return original_match(sentence, ignore_case)
+
+    index.match = counting_match
+
+    first = registry.match(u'Given I have 10 cucumbers')
+    second = registry.match(u'Given I have 10 cucumbers')
+    registry.match(u'Given I have 10 cucumbers', ignore_case=False)
+
+    assert first is second
+    assert first[0].groups() == ('10', )
+    assert resolved == [
+        (u'Given I have 10 cucumbers', True),
+        (u'Given I have 10 cucumbers', False),
+    ]
+
+    registry[r'I have (\d+) tomatoes'] = 'tomatoes'
+    assert registry.index is not index
+    assert registry.match(u'Given I have 10 cucumbers')[1] == 'cucumbers'
+    assert len(resolved) == 2
+
+
+
+def test_steps_are_resolved_once_per_run():
+    u"Running scenarios and backgrounds resolves each of their steps only once"
+    from lettuce import step, registry
+    from lettuce.core import Feature, Step
+
+    registry.clear()
+    resolved = []
+    original_pre_run = Step.pre_run
+
+    def counting_pre_run(self, *args, **kw):
+        resolved.append(self.sentence)
+        return original_pre_run(self, *args, **kw)
+
+    @step(u'I have (\d+) cucumbers')
+    def have_cucumbers(step, count):
+        pass
+
+    scenario = Feature.from_string(u'''
+Feature: Cucumbers
+  Scenario: Count them
+    Given I have 1 cucumbers
+    And I have 2 cucumbers
+''')
+    background = Feature.from_string(u'''
+Feature: Cucumbers in the background
+  Background:
+    Given I have 3 cucumbers
+
+  Scenario: Count nothing
+''').background
+    Step.pre_run = counting_pre_run
+    try:
+        assert scenario.run().passed
+        assert background.run(True) == [True]
+    finally:
+        Step.pre_run = original_pre_run
+        registry.clear()
+
+    assert resolved == [u'Given I have 1 cucumbers',
+                        u'And I have 2 cucumbers',
+                        u'Given I have 3 cucumbers']
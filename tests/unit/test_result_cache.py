@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from nose.tools import assert_equals, with_setup
+
+from lettuce.core import Feature, FeatureResult
+from lettuce.result_cache import ResultCache
+
+from tests.workdir import workdir, setup_workdir, teardown_workdir, write
+
+FEATURE = u'''
+Feature: Cached
+  Scenario: Reusable
+    Given I wait a little
+
+  @nocache
+  Scenario: Always run
+    Given I wait a little
+'''
+
+STEPS = '''
+from lettuce import step
+
+@step(u'I wait a little')
+def wait_a_little(step):
+    pass
+'''
+
+def load():
+    filename = write('steps.py', STEPS)
+    execfile(filename, {'__file__': filename})
+    return Feature.from_file(write('cached.feature', FEATURE))
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_scenarios_that_passed_are_reused_while_unchanged():
+    "A scenario that passed is reused while it and its steps are the same"
+    feature = load()
+    reusable = feature.scenarios[0]
+    cache = ResultCache(workdir[-1])
+    key = cache.key(feature, reusable)
+    results = feature.run_scenario(reusable)
+    for result in results:
+        result.cache_key = key
+
+    cache.record([FeatureResult(feature, *results)])
+
+    cache = ResultCache(workdir[-1])
+    reused = cache.get(feature, reusable, cache.key(feature, reusable))
+    assert_equals(len(reused), 1)
+    assert reused[0].cached
+    assert reused[0].passed
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_changing_a_step_definition_module_changes_the_key():
+    "Editing the module of a step definition runs its scenarios again"
+    feature = load()
+    key = ResultCache(workdir[-1]).key(feature, feature.scenarios[0])
+    write('steps.py', STEPS + '\n# edited\n')
+
+    assert ResultCache(workdir[-1]).key(feature, feature.scenarios[0]) != key
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_scenarios_tagged_nocache_always_run():
+    "Scenarios tagged @nocache have no key"
+    feature = load()
+
+    assert_equals(ResultCache(workdir[-1]).key(feature, feature.scenarios[1]),
+                  None)
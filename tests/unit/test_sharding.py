@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from nose.tools import assert_equals, assert_raises
+
+from lettuce.sharding import parse_shard, partition
+
+
+def test_parse_shard():
+    "Shards are given as K/N, from 1/N to N/N"
+    assert_equals(parse_shard('2/3'), (2, 3))
+    assert_raises(ValueError, parse_shard, '0/3')
+    assert_raises(ValueError, parse_shard, '4/3')
+    assert_raises(ValueError, parse_shard, 'first')
+
+
+def test_partition_by_hash_is_stable():
+    "Without durations, each scenario goes to the same shard whatever else there is"
+    keys = [('a.feature', u'one'), ('a.feature', u'two'), ('b.feature', u'')]
+    shards = partition(keys, 4)
+
+    assert_equals(partition(list(reversed(keys)), 4), list(reversed(shards)))
+    assert_equals(partition(keys[:1], 4), shards[:1])
+    for shard in shards:
+        assert 0 <= shard < 4
+
+
+def test_partition_by_durations_balances_shards():
+    "Given durations, scenarios go longest first to the least busy shard"
+    keys = [('a.feature', name) for name in u'abcde']
+    shards = partition(keys, 2, [1.0, 4.0, 2.0, 2.0, 1.0])
+
+    assert_equals(shards, [0, 0, 1, 1, 1])
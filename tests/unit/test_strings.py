@@ -327,3 +327,19 @@ def test_parse_hashes_allow_empty():
 
     assert_equals(keys, got_keys)
     assert_equals(dicts, got_dicts)
+
+
+def test_compile_and_render_template():
+    "strings.compile_template splits placeholders once, render_template fills them"
+
+    template = strings.compile_template(
+        u"I fill <field> with <value> and <unknown>", ["field", "value"])
+
+    assert_equals(template,
+                  [u"I fill ", u"field", u" with ", u"value",
+                   u" and <unknown>"])
+    assert_equals(
+        strings.render_template(template, {"field": "name", "value": "<field>"}),
+        u"I fill name with <field> and <unknown>")
+    assert_equals(strings.compile_template(u"no placeholders", ["field"]),
+                  [u"no placeholders"])
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+from mock import patch
+from nose.tools import assert_equals, with_setup
+
+from lettuce import parser, registry, Runner
+from lettuce.tag_index import TagIndex
+
+from tests.workdir import workdir, setup_workdir, teardown_workdir, write
+
+SMOKE = u'''
+@web
+Feature: Smoke tests
+  @smoke
+  Scenario: Open the home page
+    Given I open the home page
+
+  Scenario: Open the about page
+    Given I open the about page
+'''
+
+SLOW = u'''
+Feature: Slow tests
+  @slow @nightly
+  Scenario: Rebuild the search index
+    Given I rebuild the search index
+'''
+
+def new_index():
+    return TagIndex(os.path.join(workdir[-1], '.lettuce_cache'))
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_select_only_feature_files_that_can_match():
+    "TagIndex.select keeps only the feature files with matching scenarios"
+    smoke = write('smoke.feature', SMOKE)
+    slow = write('slow.feature', SLOW)
+    index = new_index()
+
+    assert_equals(index.select([smoke, slow], ['smoke']), [smoke])
+    assert_equals(index.select([smoke, slow], ['nightly']), [slow])
+    assert_equals(index.select([smoke, slow], ['web']), [smoke])
+    assert_equals(index.select([smoke, slow], ['-slow']), [smoke])
+    assert_equals(index.select([smoke, slow], ['~nightli']), [slow])
+    assert_equals(index.select([smoke, slow], ['unknown']), [])
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_tagged_maps_tags_to_scenario_positions():
+    "TagIndex.tagged maps each tag to the positions of its scenarios"
+    smoke = write('smoke.feature', SMOKE)
+    slow = write('slow.feature', SLOW)
+
+    assert_equals(new_index().tagged([smoke, slow]), {
+        'web': [(smoke, 1), (smoke, 2)],
+        'smoke': [(smoke, 1)],
+        'slow': [(slow, 1)],
+        'nightly': [(slow, 1)],
+    })
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_persisted_index_is_reused_until_files_change():
+    "The persisted tag index only scans feature files again once they change"
+    smoke = write('smoke.feature', SMOKE)
+    slow = write('slow.feature', SLOW)
+    new_index().select([smoke, slow], ['smoke'])
+
+    with patch.object(parser, 'scan_tags', wraps=parser.scan_tags) as scan:
+        assert_equals(new_index().select([smoke, slow], ['smoke']), [smoke])
+        assert_equals(scan.call_count, 0)
+
+        write('slow.feature', SLOW.replace('@slow', '@smoke'))
+        os.utime(slow, (0, 0))
+        assert_equals(new_index().select([smoke, slow], ['smoke']),
+                      [smoke, slow])
+        assert_equals(scan.call_count, 1)
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_files_without_feature_are_kept():
+    "TagIndex.select keeps files it can not scan, so that parsing reports them"
+    broken = write('broken.feature', u'@smoke\nnot a feature\n')
+
+    assert_equals(new_index().select([broken], ['other']), [broken])
+
+
+@with_setup(setup_workdir, teardown_workdir)
+def test_runners_load_the_index_earlier_runners_saved():
+    "A runner with the parse cache on reuses the tag index a previous one saved"
+    write('smoke.feature', SMOKE)
+    write('slow.feature', SLOW)
+    directory = os.path.join(workdir[-1], '.lettuce_cache')
+
+    with patch.dict(os.environ, {'LETTUCE_CACHE_DIR': directory}):
+        try:
+            Runner(workdir[-1], parse_cache=True).list_tags()
+            assert os.path.exists(os.path.join(directory, 'tags.pickle'))
+
+            with patch.object(parser, 'scan_tags',
+                              wraps=parser.scan_tags) as scan:
+                Runner(workdir[-1], parse_cache=True).list_tags()
+        finally:
+            registry.clear()
+
+    assert_equals(scan.call_count, 0)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+from StringIO import StringIO
+
+from nose.tools import assert_equals
+
+from lettuce.threads import ThreadOutput, Reports
+from lettuce.plugins.reporter import Reporter
+
+
+def test_thread_output_captures_each_thread_apart():
+    "ThreadOutput sends what each thread prints to its own buffer"
+    stdout = StringIO()
+    output = ThreadOutput(stdout)
+    buffers = {}
+
+    def write(name):
+        buffers[name] = StringIO()
+        output.capture(buffers[name])
+        output.write(name)
+        output.capture(None)
+        output.write('.')
+
+    threads = [threading.Thread(target=write, args=(name,))
+               for name in ('one', 'two')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    output.write('main')
+    assert_equals(buffers['one'].getvalue(), 'one')
+    assert_equals(buffers['two'].getvalue(), 'two')
+    assert_equals(stdout.getvalue(), '..main')
+
+
+def test_reports_keep_failures_apart_until_attached():
+    "Reports swap the failures of a scenario in and out of each reporter"
+    reporter = Reporter()
+    reporter.failed_scenarios.append('earlier')
+    reports = Reports([reporter])
+
+    reports.enter()
+    assert_equals(reporter.failed_scenarios, [])
+    reporter.failed_scenarios.append('scenario')
+    reporter.scenarios_and_its_fails['scenario'] = 'why'
+    reports.leave()
+
+    assert_equals(reporter.failed_scenarios, ['earlier'])
+    reports.attach()
+    assert_equals(reporter.failed_scenarios, ['earlier', 'scenario'])
+    assert_equals(reporter.scenarios_and_its_fails, {'scenario': 'why'})
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import sys
+from StringIO import StringIO
+
+from nose.tools import assert_equals, with_setup
+
+from lettuce import registry, Runner
+from lettuce.watch import Watcher
+
+from tests.workdir import workdir, setup_workdir, teardown_workdir
+from tests.workdir import write as write_file
+
+STEPS = '''
+from lettuce import step
+
+@step(u'%s holds')
+def holds(step):
+    pass
+'''
+
+FAILING = '''
+from lettuce import step
+
+@step(u'it blows up')
+def blows_up(step):
+    raise RuntimeError('boom')
+'''
+
+HOOKS = '''
+from lettuce import before
+
+@before.each_scenario
+def prepare(scenario):
+    pass
+'''
+
+
+def teardown_modules():
+    for name in ('watched_alpha', 'watched_beta', 'watched_hooks',
+                 'watched_failing'):
+        sys.modules.pop(name, None)
+
+    teardown_workdir()
+
+
+def write(name, string):
+    filename = write_file(name, string)
+    # make sure the change is seen, however coarse the clock is
+    stamp = os.stat(filename).st_mtime + len(string)
+    os.utime(filename, (stamp, stamp))
+    return filename
+
+
+def watching():
+    features = []
+    for name in ('alpha', 'beta'):
+        features.append(write('%s.feature' % name, (
+            'Feature: %s\n'
+            '  Scenario: %s\n'
+            '    Given %s holds\n' % (name, name, name))))
+        write('watched_%s.py' % name, STEPS % name)
+
+    watcher = Watcher(Runner(workdir[-1], parse_cache=False))
+    watcher.reload(watcher.modules_files())
+    watcher.snapshot()
+    return watcher, features
+
+
+@with_setup(setup_workdir, teardown_modules)
+def test_changed_features_run_again():
+    "Only the features that changed run again"
+    watcher, (alpha, beta) = watching()
+    write('beta.feature', open(beta).read() + '    And beta holds\n')
+
+    features, modules = watcher.snapshot()
+    assert_equals(features, [beta])
+    assert_equals(modules, [])
+    assert_equals(watcher.affected(features, modules), [beta])
+
+
+@with_setup(setup_workdir, teardown_modules)
+def test_features_bound_to_changed_modules_run_again():
+    "The features with a step bound to a module that changed run again"
+    watcher, (alpha, beta) = watching()
+    module = write('watched_alpha.py', STEPS % 'alpha' + '\n\n')
+
+    features, modules = watcher.snapshot()
+    assert_equals(features, [])
+    assert_equals(modules, [module])
+    assert_equals(watcher.affected(features, modules), [alpha])
+
+
+@with_setup(setup_workdir, teardown_modules)
+def test_steps_moved_to_another_module_are_followed():
+    "Changed modules are loaded again, so steps may move between them"
+    watcher, (alpha, beta) = watching()
+    os.remove(os.path.join(workdir[-1], 'watched_alpha.py'))
+    write('watched_beta.py', STEPS % 'beta' +
+          STEPS.replace('def holds', 'def also_holds') % 'alpha')
+
+    features, modules = watcher.snapshot()
+    assert_equals(watcher.affected(features, modules), [alpha, beta])
+    matched, function = registry.STEP_REGISTRY.match('Given alpha holds')
+    assert_equals(function.__name__, 'also_holds')
+
+
+@with_setup(setup_workdir, teardown_modules)
+def test_changed_hooks_run_every_feature_again():
+    "A change to a module holding hooks runs every feature again"
+    watcher, features = watching()
+    write('watched_hooks.py', HOOKS)
+
+    changed, modules = watcher.snapshot()
+    assert_equals(watcher.affected(changed, modules), features)
+    hooks = registry.CALLBACK_REGISTRY['scenario']['before_each']
+    assert_equals([hook.__name__ for hook in hooks].count('prepare'), 1)
+
+
+@with_setup(setup_workdir, teardown_modules)
+def test_failures_are_only_reported_by_the_run_they_happened_in():
+    "Running a failing feature again reports its failure once"
+    write('failing.feature', 'Feature: failing\n'
+          '  Scenario: failing\n'
+          '    Given it blows up\n')
+    write('watched_failing.py', FAILING)
+    watcher = Watcher(Runner(workdir[-1], verbosity=1, parse_cache=False))
+    watcher.reload(watcher.modules_files())
+
+    printed = []
+    stdout = sys.stdout
+    try:
+        for run in range(2):
+            sys.stdout = StringIO()
+            watcher.run()
+            printed.append(sys.stdout.getvalue())
+    finally:
+        sys.stdout = stdout
+
+    assert_equals([output.count('RuntimeError: boom') for output in printed],
+                  [1, 1])
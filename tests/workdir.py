@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# <Lettuce - Behaviour Driven Development for python>
+# Copyright (C) <2010-2012>  Gabriel Falcão <gabriel@nacaolivre.org>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import tempfile
+
+from lettuce import registry
+
+# the temporary directories of the running tests, the current one last
+workdir = []
+
+
+def setup_workdir():
+    workdir.append(tempfile.mkdtemp())
+    registry.clear()
+
+
+def teardown_workdir():
+    registry.clear()
+    shutil.rmtree(workdir.pop())
+
+
+def write(name, string):
+    """Writes `string` to the file `name` of the current workdir,
+    returning its path"""
+    filename = os.path.join(workdir[-1], name)
+    f = open(filename, 'w')
+    if isinstance(string, unicode):
+        string = string.encode('utf-8')
+
+    f.write(string)
+    f.close()
+    return filename